@@ -1,6 +1,6 @@
 # encoding=UTF-8
 
-# Copyright © 2011-2018 Jakub Wilk <jwilk@jwilk.net>
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
 #
 # This file is part of scanhelper.
 #
@@ -13,20 +13,8 @@
 # FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
 # more details.
 
-'''direct access to some functions from GNU libc'''
-
-import ctypes
-
-libc = ctypes.CDLL(None)
-
-def sprintf(fmt, *args):
-    string = ctypes.c_char_p()
-    libc.asprintf(ctypes.byref(string), fmt, *args)
-    try:
-        return string.value
-    finally:
-        libc.free(string)
-
-__all__ = ['sprintf']
+'''
+scanhelper's benchmark suite
+'''
 
 # vim:ts=4 sts=4 sw=4 et
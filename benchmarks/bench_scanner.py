@@ -0,0 +1,126 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+device discovery and scan loop overhead
+'''
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+
+from .tools import (
+    benchmark,
+    import_lib,
+    interim_environ,
+    sane_test_environ,
+    temporary_directory,
+)
+
+n_pages = 1000
+
+fake_scanimage = '''\
+#!/bin/sh
+if [ "$1" = --version ]
+then
+    echo 'scanimage (sane-backends) 1.0.31; backend version 1.0.31'
+    exit 0
+fi
+n=0
+while [ $n -lt {n} ]
+do
+    n=$((n + 1))
+    echo "Scanning page $n"
+    echo "Scanned page $n. (scanner status = 5)"
+done
+echo 'Batch terminated, {n} pages scanned'
+exit 7
+'''
+
+@contextlib.contextmanager
+def fake_scanimage_environ(tmpdir, n):
+    bindir = os.path.join(tmpdir, 'bin')
+    os.mkdir(bindir)
+    path = os.path.join(bindir, 'scanimage')
+    with open(path, 'wt', encoding='ASCII') as file:
+        file.write(fake_scanimage.format(n=n))
+    os.chmod(path, 0o700)
+    with interim_environ(PATH=str.join(os.pathsep, [bindir, os.environ['PATH']])):
+        yield
+
+@benchmark('scanner.get-devices')
+def get_devices():
+    with sane_test_environ():
+        scanner = import_lib('scanner')
+        scanner.get_devices()
+        yield scanner.get_devices, 1
+
+@benchmark('scanner.get-device')
+def get_device():
+    with sane_test_environ():
+        session = import_lib('session')
+        options = argparse.Namespace(device='test:0', player=None, recorder=None)
+        def func():
+            session.get_device(options).close()
+        yield func, 1
+
+@benchmark('scan.loop', unit='page', repeat=3)
+def scan_loop():
+    with sane_test_environ() as tmpdir:
+        cli = import_lib('cli')
+        cmdline = import_lib('cmdline')
+        if cli.logger is None:
+            cli.setup_logging()
+        with fake_scanimage_environ(tmpdir, n_pages):
+            parser = cmdline.ArgumentParser()
+            options = parser.parse_args([
+                '-d', 'test:0',
+                '--target-directory', tmpdir,
+                '--page-count', str(n_pages),
+            ])
+            cwd = os.getcwd()
+            def func():
+                stdio = dict(
+                    stdin=io.StringIO('\n'),
+                    stdout=io.StringIO(),
+                )
+                saved = {key: getattr(sys, key) for key in stdio}
+                for key, value in stdio.items():
+                    setattr(sys, key, value)
+                try:
+                    cli.scan(options)
+                finally:
+                    for key, value in saved.items():
+                        setattr(sys, key, value)
+                    os.chdir(cwd)
+            yield func, n_pages
+
+@benchmark('scan.single-batch', unit='page', repeat=3)
+def scan_single_batch():
+    with sane_test_environ() as tmpdir:
+        orchestrator = import_lib('orchestrator')
+        session = import_lib('session')
+        scanimage = import_lib('scanimage')
+        with fake_scanimage_environ(tmpdir, n_pages), temporary_directory() as target:
+            options = session.get_options(device='test:0', target_directory=target)
+            device = session.get_device(options)
+            def func():
+                for page in orchestrator.iterate(scanimage.scan_batch(options, device)):
+                    del page
+            yield func, n_pages
+
+# vim:ts=4 sts=4 sw=4 et
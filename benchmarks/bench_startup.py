@@ -0,0 +1,57 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+startup time of the scanhelper executable, per action
+'''
+
+import os
+import subprocess
+import sys
+
+from .tools import (
+    basedir,
+    benchmark,
+    require_command,
+    sane_test_environ,
+)
+
+executable = os.path.join(basedir, 'scanhelper')
+
+def run_scanhelper(*args):
+    subprocess.run(
+        [sys.executable, executable, *args],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+
+def _startup(*args):
+    def setup():
+        require_command('scanimage')
+        with sane_test_environ():
+            run_scanhelper(*args)  # warm up the page cache
+            yield (lambda: run_scanhelper(*args)), 1
+    return setup
+
+benchmark('startup.version')(_startup('--version'))
+benchmark('startup.help')(_startup('--help'))
+benchmark('startup.help-device')(_startup('-d', 'test:0', '--help'))
+benchmark('startup.list-devices')(_startup('--list-devices'))
+benchmark('startup.list-buttons')(_startup('-d', 'test:0', '--list-buttons'))
+benchmark('startup.show-config')(_startup('--show-config'))
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,43 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+filename generation
+'''
+
+from .tools import (
+    benchmark,
+    import_lib,
+)
+
+@benchmark('template.format', unit='filename')
+def format_():
+    template = import_lib('template')
+    n = 100_000
+    def func():
+        tmpl = template.parse('p%04d.png')
+        for i in range(n):
+            tmpl.format(i)
+    yield func, n
+
+@benchmark('template.format_batch', unit='filename')
+def format_batch():
+    template = import_lib('template')
+    n = 100_000
+    def func():
+        template.parse('p%04d.png').format_batch(0, n)
+    yield func, n
+
+# vim:ts=4 sts=4 sw=4 et
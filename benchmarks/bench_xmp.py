@@ -0,0 +1,105 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+XMP generation
+'''
+
+import io
+import os
+
+from .tools import (
+    benchmark,
+    import_lib,
+    sane_test_environ,
+    temporary_directory,
+)
+
+class device:
+    vendor = 'Noname'
+    model = 'Frobnicator'
+
+def create_image(path, size=(2480, 3508)):
+    PIL = import_lib('xmp').PIL
+    with PIL.Image.new('L', size, 0xFF) as image:
+        image.save(path, dpi=(300, 300))
+
+def create_images(directory, n):
+    template = os.path.join(directory, 'template.png')
+    create_image(template, size=(1, 1))
+    with open(template, 'rb') as file:
+        data = file.read()
+    os.unlink(template)
+    paths = []
+    for i in range(n):
+        path = os.path.join(directory, f'p{i:06d}.png')
+        with open(path, 'wb') as file:
+            file.write(data)
+        paths += [path]
+    return paths
+
+@benchmark('xmp.write', unit='sidecar', repeat=5)
+def xmp_write():
+    xmp = import_lib('xmp')
+    n = 200
+    with temporary_directory() as tmpdir:
+        path = os.path.join(tmpdir, 'p0001.png')
+        create_image(path)
+        def func():
+            for i in range(n):
+                del i
+                xmp.write(io.BytesIO(), path, device, {})
+        yield func, n
+
+def _embed(ext):
+    def setup():
+        xmp = import_lib('xmp')
+        PIL = xmp.PIL
+        n = 5
+        with temporary_directory() as tmpdir:
+            path = os.path.join(tmpdir, f'p0001.{ext}')
+            # noise doesn't compress well, so the file is large:
+            with PIL.Image.effect_noise((2480, 3508), 64) as image:
+                image.save(path, dpi=(300, 300))
+            (xmp_data, _) = xmp.render(path, device, {})
+            def func():
+                for i in range(n):
+                    del i
+                    xmp.embed(path, xmp_data)
+            yield func, n
+    return setup
+
+benchmark('xmp.embed.png', unit='image')(_embed('png'))
+benchmark('xmp.embed.tiff', unit='image')(_embed('tif'))
+
+def _reconstruct_xmp(n):
+    def setup():
+        with sane_test_environ():
+            cli = import_lib('cli')
+            cmdline = import_lib('cmdline')
+            with temporary_directory() as tmpdir:
+                paths = create_images(tmpdir, n)
+                parser = cmdline.ArgumentParser()
+                options = parser.parse_args([
+                    '--reconstruct-xmp', *paths,
+                    '--override-xmp', 'device_vendor=Noname', 'device_model=Frobnicator',
+                ])
+                yield (lambda: cli.reconstruct_xmp(options)), n
+    return setup
+
+benchmark('reconstruct-xmp.10k', unit='image', repeat=1)(_reconstruct_xmp(10_000))
+benchmark('reconstruct-xmp.100k', unit='image', repeat=1, large=True)(_reconstruct_xmp(100_000))
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,210 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import contextlib
+import json
+import os
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+here = os.path.dirname(__file__)
+basedir = os.path.join(here, os.pardir)
+baseline_dir = os.path.join(here, 'baselines')
+
+class SkipBenchmark(Exception):
+    pass
+
+class Benchmark:
+
+    def __init__(self, name, setup, unit, repeat, large):
+        self.name = name
+        self.setup = setup
+        self.unit = unit
+        self.repeat = repeat
+        self.large = large
+
+    def run(self, repeat=None):
+        if repeat is None:
+            repeat = self.repeat
+        timings = []
+        with self.setup() as (func, n):
+            for i in range(repeat):
+                del i
+                start = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - start) / n)
+        return Result(self, min(timings), statistics.median(timings))
+
+class Result:
+
+    def __init__(self, bench, best, median):
+        self.benchmark = bench
+        self.best = best
+        self.median = median
+
+    def as_json(self):
+        return dict(
+            unit=self.benchmark.unit,
+            best=self.best,
+            median=self.median,
+        )
+
+registry = []
+
+def benchmark(name, unit='run', repeat=5, large=False):
+    '''
+    register a benchmark
+
+    The decorated function is turned into a context manager.
+    It should yield (func, n), where func() performs n units of work.
+    '''
+    def decorator(f):
+        setup = contextlib.contextmanager(f)
+        registry.append(Benchmark(name, setup, unit, repeat, large))
+        return setup
+    return decorator
+
+def format_time(t):
+    for unit, scale in [('s', 1), ('ms', 1e-3), ('µs', 1e-6)]:
+        if t >= scale:
+            break
+    return f'{t / scale:.3f} {unit}'
+
+# baselines
+# =========
+
+def default_baseline_path():
+    hostname = socket.gethostname() or 'localhost'
+    return os.path.join(baseline_dir, hostname + '.json')
+
+def load_baseline(path):
+    try:
+        file = open(path, 'rt', encoding='UTF-8')  # pylint: disable=consider-using-with
+    except FileNotFoundError:
+        return {}
+    with file:
+        return json.load(file)
+
+def save_baseline(path, results):
+    data = load_baseline(path)
+    for result in results:
+        data[result.benchmark.name] = result.as_json()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wt', encoding='UTF-8') as file:
+        json.dump(data, file, indent=4, sort_keys=True)
+        print(file=file)
+    os.rename(path + '.tmp', path)
+
+def compare(results, baseline, threshold, file=sys.stdout):
+    '''
+    print comparison report; return the number of regressions
+    '''
+    regressions = 0
+    name_maxlen = max((len(r.benchmark.name) for r in results), default=0)
+    for result in results:
+        name = result.benchmark.name
+        unit = result.benchmark.unit
+        line = f'{name:{name_maxlen}}  {format_time(result.best):>11}/{unit}'
+        try:
+            old = baseline[name]['best']
+        except LookupError:
+            status = '(no baseline)'
+        else:
+            ratio = result.best / old
+            if ratio > 1 + threshold:
+                status = 'REGRESSION'
+                regressions += 1
+            elif ratio < 1 - threshold:
+                status = 'improvement'
+            else:
+                status = 'ok'
+            status = f'{ratio:6.2f}x  {status}'
+        print(f'{line}  {status}', file=file)
+    return regressions
+
+# environment
+# ===========
+
+@contextlib.contextmanager
+def interim_environ(**override):
+    copy = dict(os.environ)
+    os.environ.update(override)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(copy)
+
+@contextlib.contextmanager
+def temporary_directory():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper-bench.')
+    try:
+        yield tmpdir
+    finally:
+        shutil.rmtree(tmpdir)
+
+@contextlib.contextmanager
+def sane_test_environ():
+    '''
+    use the SANE test backend and ignore user configuration
+    '''
+    with temporary_directory() as tmpdir:
+        path = os.path.join(tmpdir, 'dll.conf')
+        with open(path, 'wt', encoding='ASCII') as file:
+            file.write('test')
+        with interim_environ(
+            SANE_CONFIG_DIR=tmpdir,
+            XDG_CONFIG_HOME=tmpdir,
+            XDG_CONFIG_DIRS=tmpdir,
+        ):
+            yield tmpdir
+
+def import_lib(name):
+    '''
+    import lib.<name>, or skip the benchmark if dependencies are missing
+    '''
+    if basedir not in sys.path:
+        sys.path[:0] = [basedir]
+    try:
+        module = __import__('lib.' + name, fromlist=[name])
+    except ImportError as exc:
+        raise SkipBenchmark(exc) from exc
+    return module
+
+def require_command(command):
+    if shutil.which(command) is None:
+        raise SkipBenchmark(f'{command} not found')
+
+__all__ = [
+    'SkipBenchmark',
+    'basedir',
+    'benchmark',
+    'compare',
+    'default_baseline_path',
+    'import_lib',
+    'interim_environ',
+    'load_baseline',
+    'registry',
+    'require_command',
+    'sane_test_environ',
+    'save_baseline',
+    'temporary_directory',
+]
+
+# vim:ts=4 sts=4 sw=4 et
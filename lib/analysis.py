@@ -0,0 +1,292 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''page image analysis'''
+
+from . import utils
+
+try:
+    import numpy
+except ImportError as ex:
+    utils.enhance_import_error(ex, 'NumPy', 'python3-numpy', 'https://pypi.org/project/numpy/')
+    raise
+
+try:
+    import PIL.Image
+except ImportError as ex:
+    utils.enhance_import_error(ex, 'Pillow', 'python3-pil', 'https://pypi.org/project/Pillow/')
+    raise
+
+color_modes = ('color', 'gray', 'bilevel')
+
+# length of the longer side of the downsampled copy, in pixels:
+sample_size = 1000
+
+# A pixel is coloured if its RGB components differ by more than this:
+chroma_threshold = 48
+# A page is coloured if the fraction of coloured pixels exceeds this:
+color_fraction = 0.001
+# A page is bilevel if the fraction of mid-tone pixels is below this:
+midtone_fraction = 0.05
+midtones = (64, 192)
+
+# fraction of each side that is ignored by blank page detection
+# (edge shadows, punch holes):
+blank_margin = 0.05
+# A pixel is ink if it is darker than the paper by more than this:
+ink_contrast = 64
+
+# A preview pixel belongs to the content if it differs from the background
+# (the scanner lid) by more than this:
+content_contrast = 24
+# A preview row or column contains content if the fraction of its content
+# pixels exceeds this:
+content_fraction = 0.01
+
+# length of the longer side of the item detection mask, in pixels:
+item_mask_size = 200
+# minimum item area, as a fraction of the whole scan:
+min_item_fraction = 0.005
+# Items that are skewed by less than this (in degrees) are not rotated:
+min_skew = 0.2
+
+def get_sample(image, resample=PIL.Image.Resampling.NEAREST, size=sample_size):
+    '''
+    return downsampled copy of the image, as a NumPy array
+
+    Nearest-neighbour sampling is used by default,
+    so that no new colours or mid-tones are introduced.
+    '''
+    scale = max(image.size) / size
+    if scale > 1:
+        if image.mode == '1' and resample != PIL.Image.Resampling.NEAREST:
+            # Pillow can't resample bilevel images otherwise.
+            image = image.convert('L')
+        size = (max(1, round(image.width / scale)), max(1, round(image.height / scale)))
+        image = image.resize(size, resample)
+    image = utils.to_8bit(image)
+    if image.mode not in {'L', 'RGB'}:
+        image = image.convert('L' if image.mode == '1' else 'RGB')
+    return numpy.asarray(image)
+
+def to_gray(sample):
+    if sample.ndim == 3:
+        sample = sample.mean(axis=2).astype(numpy.uint8)
+    return sample
+
+def classify(image):
+    '''
+    return the smallest colour mode that is appropriate for the image:
+    'color', 'gray' or 'bilevel'
+    '''
+    sample = get_sample(image)
+    if sample.ndim == 3:
+        channels = sample.astype(numpy.int16)
+        chroma = channels.max(axis=2) - channels.min(axis=2)
+        if numpy.mean(chroma > chroma_threshold) > color_fraction:
+            return 'color'
+    sample = to_gray(sample)
+    (low, high) = midtones
+    if numpy.mean((sample > low) & (sample < high)) < midtone_fraction:
+        return 'bilevel'
+    return 'gray'
+
+def get_ink_coverage(image):
+    '''
+    return the fraction of ink pixels in the image, ignoring the margins
+
+    The image is box-downsampled, so that dust and scanner noise
+    blend into the paper.
+    '''
+    sample = to_gray(get_sample(image, PIL.Image.Resampling.BOX))
+    (height, width) = sample.shape
+    (dy, dx) = (int(height * blank_margin), int(width * blank_margin))
+    sample = sample[dy:height - dy, dx:width - dx]
+    if sample.size == 0:
+        return 0.0
+    paper = numpy.percentile(sample, 95)
+    return float(numpy.mean(sample < paper - ink_contrast))
+
+def is_blank(image, threshold):
+    '''
+    return whether at most threshold percent of the image is covered with ink
+    '''
+    return get_ink_coverage(image) * 100 <= threshold
+
+def get_content_box(image):
+    '''
+    return bounding box (left, upper, right, lower) of the content of the
+    preview image, or None if there is no content
+
+    The background colour is estimated from the edges of the image.
+    Rows and columns with only a few content pixels (dust, scratches on
+    the glass) are ignored.
+    '''
+    mask = get_content_mask(get_sample(image))
+    rows = numpy.flatnonzero(mask.mean(axis=1) > content_fraction)
+    columns = numpy.flatnonzero(mask.mean(axis=0) > content_fraction)
+    if rows.size == 0 or columns.size == 0:
+        return None
+    (height, width) = mask.shape
+    (x_scale, y_scale) = (image.width / width, image.height / height)
+    return (
+        int(columns[0] * x_scale),
+        int(rows[0] * y_scale),
+        min(image.width, round((columns[-1] + 1) * x_scale)),
+        min(image.height, round((rows[-1] + 1) * y_scale)),
+    )
+
+def get_content_mask(sample):
+    '''
+    return mask of pixels of the sample that differ from the background
+
+    The background colour is estimated from the edges of the sample.
+    '''
+    sample = to_gray(sample).astype(numpy.int16)
+    edges = numpy.concatenate([sample[0], sample[-1], sample[:, 0], sample[:, -1]])
+    background = numpy.median(edges)
+    return numpy.abs(sample - background) > content_contrast
+
+def label(mask):
+    '''
+    label 4-connected components of the mask;
+    return array of labels, with mask.size for background pixels
+
+    Labels are propagated in whole-array steps until they are stable.
+    '''
+    background = mask.size
+    labels = numpy.where(mask, numpy.arange(mask.size).reshape(mask.shape), background)
+    while True:
+        new_labels = labels.copy()
+        numpy.minimum(new_labels[1:], labels[:-1], out=new_labels[1:])
+        numpy.minimum(new_labels[:-1], labels[1:], out=new_labels[:-1])
+        numpy.minimum(new_labels[:, 1:], labels[:, :-1], out=new_labels[:, 1:])
+        numpy.minimum(new_labels[:, :-1], labels[:, 1:], out=new_labels[:, :-1])
+        new_labels[~mask] = background
+        if numpy.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+def get_skew(ys, xs):
+    '''
+    return orientation (in degrees, between -45 and 45) of the component
+    with the given pixel coordinates, i.e. rotation of its minimum-area bounding rectangle
+
+    (Second moments don't determine orientation of square items.)
+    '''
+    def get_area(angle):
+        (cos, sin) = (numpy.cos(numpy.radians(angle)), numpy.sin(numpy.radians(angle)))
+        return numpy.ptp(xs * cos + ys * sin) * numpy.ptp(ys * cos - xs * sin)
+    angle = min(numpy.arange(-45, 45, 1.0), key=get_area)
+    angle = min(angle + numpy.arange(-1, 1, 0.05), key=get_area)
+    return float((angle + 45) % 90 - 45)
+
+def find_items(image):
+    '''
+    find separate items (e.g. photos laid on a flatbed) in the image;
+    return list of (box, skew) pairs, in the reading order
+
+    Items are connected components of a small, dilated content mask.
+    '''
+    sample = get_sample(image, PIL.Image.Resampling.BOX, size=item_mask_size)
+    mask = get_content_mask(sample)
+    # Close small gaps (e.g. light areas at the edge of a photo):
+    dilated = mask.copy()
+    dilated[1:] |= mask[:-1]
+    dilated[:-1] |= mask[1:]
+    dilated[:, 1:] |= mask[:, :-1]
+    dilated[:, :-1] |= mask[:, 1:]
+    labels = label(dilated)
+    (height, width) = mask.shape
+    (x_scale, y_scale) = (image.width / width, image.height / height)
+    items = []
+    for n in numpy.unique(labels[labels < labels.size]):
+        (ys, xs) = numpy.nonzero((labels == n) & mask)
+        if ys.size < min_item_fraction * mask.size:
+            continue
+        box = (
+            int(xs.min() * x_scale),
+            int(ys.min() * y_scale),
+            min(image.width, round((xs.max() + 1) * x_scale)),
+            min(image.height, round((ys.max() + 1) * y_scale)),
+        )
+        items += [(box, get_skew(ys * y_scale, xs * x_scale))]
+    items.sort(key=lambda item: (item[0][1] // (image.height / 8), item[0][0]))
+    return items
+
+def split_items(image, deskew=False):
+    '''
+    return list of images of separate items found in the image;
+    if there are none, return the whole image
+
+    If deskew is true, skewed items are rotated and cropped again.
+    '''
+    result = []
+    for box, skew in find_items(image):
+        item = image.crop(box)
+        if deskew and abs(skew) >= min_skew:
+            fill = 'white' if item.mode in {'1', 'L', 'RGB'} else None
+            item = item.rotate(skew, PIL.Image.Resampling.BICUBIC, expand=True, fillcolor=fill)
+            box = get_content_box(item)
+            if box is not None:
+                item = item.crop(box)
+        result += [item]
+    return result or [image]
+
+def get_threshold(sample):
+    '''
+    return the bilevel threshold for the grayscale sample (Otsu's method)
+    '''
+    histogram = numpy.bincount(sample.ravel(), minlength=256).astype(numpy.float64)
+    weights = histogram.cumsum()
+    sums = (histogram * numpy.arange(256)).cumsum()
+    (total_weight, total_sum) = (weights[-1], sums[-1])
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        variance = (total_sum * weights - sums * total_weight) ** 2 / (weights * (total_weight - weights))
+    return int(numpy.argmax(numpy.nan_to_num(variance)))
+
+def convert(image, color_mode):
+    '''
+    convert the image to the colour mode
+    '''
+    image = utils.to_8bit(image)
+    if color_mode == 'color':
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return image
+    gray = image if image.mode == 'L' else image.convert('L')
+    if color_mode == 'gray':
+        return gray
+    threshold = get_threshold(to_gray(get_sample(gray)))
+    table = [0] * (threshold + 1) + [255] * (255 - threshold)
+    return gray.point(table, '1')
+
+__all__ = [
+    'classify',
+    'color_modes',
+    'convert',
+    'find_items',
+    'get_content_box',
+    'get_content_mask',
+    'get_ink_coverage',
+    'get_sample',
+    'get_threshold',
+    'get_skew',
+    'is_blank',
+    'label',
+    'split_items',
+]
+
+# vim:ts=4 sts=4 sw=4 et
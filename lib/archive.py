@@ -0,0 +1,210 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+per-session archive containers
+'''
+
+import hashlib
+import os
+import tarfile
+import time
+import zipfile
+
+formats = ('tar', 'zip')
+
+def get_archive_name(format_):
+    return f'pages.{format_}'
+
+def get_index_path(path):
+    return path + '.idx'
+
+class HashingReader:
+
+    def __init__(self, file):
+        self._file = file
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        self.digest.update(data)
+        return data
+
+class Archive:
+
+    '''
+    store-only archive, to which files are appended as they are complete
+
+    For each member, the offset and size of its data are appended to the
+    index (ARCHIVE.idx), so that single members can be read without
+    parsing the whole archive.
+
+    Tar archives are valid after each added file;
+    zip archives are valid after each flush().
+    '''
+
+    def __init__(self, path, format_):
+        if format_ not in formats:
+            raise ValueError(f'unknown archive format: {format_!r}')
+        self.path = path
+        self.index_path = get_index_path(path)
+        self.format = format_
+        self._tar = self._zip = self._zip_file = None
+        self._index = open(self.index_path, 'at', encoding='UTF-8')  # pylint: disable=consider-using-with
+
+    # pylint: disable=consider-using-with
+
+    def _open(self):
+        if self.format == 'tar' and self._tar is None:
+            self._tar = tarfile.open(self.path, 'a', format=tarfile.PAX_FORMAT)
+        elif self.format == 'zip' and self._zip is None:
+            mode = 'r+b' if os.path.exists(self.path) else 'w+b'
+            self._zip_file = open(self.path, mode)
+            self._zip = zipfile.ZipFile(self._zip_file, 'a')
+
+    # pylint: enable=consider-using-with
+
+    def add(self, filename):
+        '''
+        add the file to the archive, and remove it from the file system;
+        return its SHA-256 digest
+        '''
+        self._open()
+        with open(filename, 'rb') as file:
+            reader = HashingReader(file)
+            if self._tar is not None:
+                offset, size = self._add_tar(filename, file, reader)
+            else:
+                offset, size = self._add_zip(filename, reader)
+        self._index.write(f'{filename}\t{offset}\t{size}\n')
+        self._index.flush()
+        os.unlink(filename)
+        return reader.digest.hexdigest()
+
+    def _add_tar(self, filename, file, reader):
+        tar = self._tar
+        tarinfo = tar.gettarinfo(filename, arcname=filename, fileobj=file)
+        tar.addfile(tarinfo, reader)
+        blocks = -(-tarinfo.size // tarfile.BLOCKSIZE)
+        offset = tar.offset - blocks * tarfile.BLOCKSIZE
+        # Write the end-of-archive marker, so that the archive is valid
+        # even if we crash; it will be overwritten by the next member.
+        tar.fileobj.write(tarfile.NUL * (2 * tarfile.BLOCKSIZE))
+        tar.fileobj.seek(tar.offset)
+        tar.fileobj.flush()
+        return offset, tarinfo.size
+
+    def _add_zip(self, filename, reader):
+        zinfo = zipfile.ZipInfo.from_file(filename, arcname=filename)
+        zinfo.compress_type = zipfile.ZIP_STORED
+        with self._zip.open(zinfo, 'w') as member:
+            while True:
+                block = reader.read(1 << 20)
+                if not block:
+                    break
+                member.write(block)
+        offset = self._zip_file.tell() - zinfo.compress_size
+        return offset, zinfo.file_size
+
+    def flush(self):
+        '''
+        make the archive valid, and flush it to the OS
+        '''
+        if self._tar is not None:
+            self._tar.fileobj.flush()
+        if self._zip is not None:
+            self._zip.close()
+            self._zip_file.close()
+            self._zip = None
+
+    def close(self):
+        self.flush()
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        self._index.close()
+
+def read_index(path):
+    '''
+    return {member name: (data offset, size)}
+    '''
+    result = {}
+    with open(get_index_path(path), 'rt', encoding='UTF-8') as file:
+        for line in file:
+            name, offset, size = line.rstrip('\n').rsplit('\t', 2)
+            result[name] = (int(offset), int(size))
+    return result
+
+def read_member(path, name, index=None):
+    '''
+    read a single member, using the index
+    '''
+    if index is None:
+        index = read_index(path)
+    offset, size = index[name]
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        return file.read(size)
+
+def _check_member_name(name):
+    parts = name.split('/')
+    if name.startswith('/') or '..' in parts:
+        raise ValueError(f'unsafe member name: {name!r}')
+
+def extract(path, directory):
+    '''
+    extract all the members into the directory;
+    yield their names
+    '''
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for zinfo in archive.infolist():
+                name = zinfo.filename
+                _check_member_name(name)
+                mtime = time.mktime(zinfo.date_time + (0, 0, -1))
+                with archive.open(zinfo) as member:
+                    _extract_member(member, directory, name, mtime)
+                yield name
+    else:
+        with tarfile.open(path) as archive:
+            for tarinfo in archive:
+                if not tarinfo.isfile():
+                    continue
+                _check_member_name(tarinfo.name)
+                with archive.extractfile(tarinfo) as member:
+                    _extract_member(member, directory, tarinfo.name, tarinfo.mtime)
+                yield tarinfo.name
+
+def _extract_member(member, directory, name, mtime):
+    target = os.path.join(directory, name)
+    os.makedirs(os.path.dirname(target) or os.curdir, exist_ok=True)
+    with open(target, 'xb') as file:
+        while True:
+            block = member.read(1 << 20)
+            if not block:
+                break
+            file.write(block)
+    os.utime(target, (mtime, mtime))
+
+__all__ = [
+    'Archive',
+    'extract',
+    'formats',
+    'get_archive_name',
+    'read_index',
+    'read_member',
+]
+
+# vim:ts=4 sts=4 sw=4 et
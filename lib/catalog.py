@@ -0,0 +1,179 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+SQLite catalog of scan sessions and pages
+'''
+
+import os
+import sqlite3
+import time
+
+schema = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    directory TEXT NOT NULL,
+    device TEXT,
+    vendor TEXT,
+    model TEXT,
+    profile TEXT,
+    options TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_device ON sessions (device, started);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    session INTEGER NOT NULL REFERENCES sessions (id),
+    filename TEXT NOT NULL,
+    size INTEGER,
+    sha256 TEXT,
+    width INTEGER,
+    height INTEGER,
+    dpi INTEGER,
+    created REAL,
+    cataloged REAL,
+    document_id TEXT,
+    instance_id TEXT
+);
+CREATE INDEX IF NOT EXISTS pages_session ON pages (session, created);
+CREATE INDEX IF NOT EXISTS pages_created ON pages (created);
+CREATE TABLE IF NOT EXISTS derivatives (
+    session INTEGER NOT NULL REFERENCES sessions (id),
+    page_filename TEXT NOT NULL,
+    name TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER
+);
+CREATE INDEX IF NOT EXISTS derivatives_page ON derivatives (session, page_filename);
+'''
+
+class Catalog:
+
+    '''
+    catalog of scan sessions and pages
+
+    Pages are buffered and inserted in batches of batch_size;
+    call flush() at the end of each scanner batch, and close() at the end.
+    The catalog can be used from different threads, but not concurrently.
+    '''
+
+    def __init__(self, path, batch_size=100):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode = WAL')
+        self._db.execute('PRAGMA synchronous = NORMAL')
+        self._db.executescript(schema)
+        self._batch_size = batch_size
+        self._pending = []
+        self._pending_derivatives = []
+        self._session = None
+
+    def begin_session(self, directory, device, profile=None, options=None):
+        self.flush()
+        with self._db:
+            cursor = self._db.execute(
+                'INSERT INTO sessions (started, directory, device, vendor, model, profile, options) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (time.time(), directory, device.name, device.vendor, device.model, profile, options)
+            )
+        self._session = cursor.lastrowid
+
+    def add_page(self, filename, parameters, digest, xmp_ids=False):
+        '''
+        add page described by XMP parameters (see xmp.get_parameters())
+        and its SHA-256 digest (see checksum.hash_file())
+
+        Unless xmp_ids is true, the XMP document and instance IDs are not
+        recorded, as there is no XMP metadata that would use them.
+        Derivatives listed in parameters are recorded, too.
+        '''
+        assert self._session is not None
+        stat = os.stat(filename)
+        document_id = instance_id = None
+        if xmp_ids:
+            document_id = parameters['document_id']
+            instance_id = parameters['instance_id']
+        self._pending += [(
+            self._session,
+            filename,
+            stat.st_size,
+            digest,
+            parameters['width'],
+            parameters['height'],
+            parameters['dpi'],
+            stat.st_mtime,
+            time.time(),
+            document_id,
+            instance_id,
+        )]
+        self._pending_derivatives += [
+            (self._session, filename, d['name'], d['filename'], d['width'], d['height'])
+            for d in parameters.get('derivatives', ())
+        ]
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        with self._db:
+            self._db.executemany(
+                'INSERT INTO pages (session, filename, size, sha256, width, height, dpi, '
+                'created, cataloged, document_id, instance_id) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                self._pending
+            )
+            self._db.executemany(
+                'INSERT INTO derivatives (session, page_filename, name, filename, width, height) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                self._pending_derivatives
+            )
+        self._pending = []
+        self._pending_derivatives = []
+
+    def query(self, device=None, since=None, until=None):
+        '''
+        yield (created, device, path) for matching pages
+        '''
+        conditions = []
+        args = []
+        if device is not None:
+            conditions += ['sessions.device = ?']
+            args += [device]
+        if since is not None:
+            conditions += ['pages.created >= ?']
+            args += [since]
+        if until is not None:
+            conditions += ['pages.created < ?']
+            args += [until]
+        query = (
+            'SELECT pages.created, sessions.device, sessions.directory, pages.filename '
+            'FROM pages JOIN sessions ON pages.session = sessions.id'
+        )
+        if conditions:
+            query += ' WHERE ' + str.join(' AND ', conditions)
+        query += ' ORDER BY pages.created'
+        for created, device_name, directory, filename in self._db.execute(query, args):
+            yield created, device_name, os.path.join(directory, filename)
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+__all__ = [
+    'Catalog',
+]
+
+# vim:ts=4 sts=4 sw=4 et
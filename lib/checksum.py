@@ -0,0 +1,207 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+SHA-256 checksum manifests
+'''
+
+import collections
+import concurrent.futures
+import hashlib
+import os
+import queue
+import re
+import threading
+
+manifest_name = 'SHA256SUMS'
+progress_name = manifest_name + '.progress'
+
+block_size = 4 << 20
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb', buffering=0) as file:
+        try:
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except (AttributeError, OSError):  # no coverage
+            pass
+        buffer = bytearray(block_size)
+        view = memoryview(buffer)
+        while True:
+            n = file.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+_escapes = {'\\': '\\\\', '\n': '\\n', '\r': '\\r'}
+_unescapes = {value: key for key, value in _escapes.items()}
+
+def format_line(filename, digest):
+    '''
+    return manifest line (without the trailing newline) in the sha256sum format
+
+    As in sha256sum, names with backslashes or newlines are escaped,
+    and the line is then prefixed with a backslash.
+    '''
+    escaped = re.sub(r'[\\\n\r]', lambda match: _escapes[match.group()], filename)
+    prefix = '\\' if escaped != filename else ''
+    return f'{prefix}{digest}  {escaped}'
+
+def parse_line(line):
+    '''
+    return (filename, digest) for the manifest line (without the trailing newline)
+
+    Lines written by sha256sum in the binary mode ("*" before the name) are accepted, too.
+    '''
+    escaped = line.startswith('\\')
+    if escaped:
+        line = line[1:]
+    (digest, _, rest) = line.partition(' ')
+    if rest[:1] not in {' ', '*'}:
+        raise ValueError(f'malformed manifest line: {line!r}')
+    filename = rest[1:]
+    if escaped:
+        try:
+            filename = re.sub(r'\\.', lambda match: _unescapes[match.group()], filename)
+        except KeyError:
+            raise ValueError(f'malformed manifest line: {line!r}') from None
+    return (filename, digest)
+
+class Manifest:
+
+    '''
+    SHA256SUMS-style manifest, computed in a background thread
+
+    Files passed to add() are hashed in the order they were added,
+    and each line is appended to the manifest as soon as it's known.
+    '''
+
+    def __init__(self, path):
+        self._file = open(path, 'at', encoding='UTF-8')  # pylint: disable=consider-using-with
+        self._queue = queue.Queue()
+        self._exception = None
+        self._thread = threading.Thread(target=self._run, name='manifest')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            filename, digest = item
+            try:
+                if digest is None:
+                    digest = hash_file(filename)
+                self._file.write(format_line(filename, digest) + '\n')
+                self._file.flush()
+            except OSError as exc:
+                self._exception = exc
+
+    def add(self, filename):
+        self._queue.put((filename, None))
+
+    def record(self, filename, digest):
+        '''
+        add a file whose digest is already known
+        '''
+        self._queue.put((filename, digest))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        if self._exception is not None:
+            raise self._exception
+
+def read_manifest(path):
+    with open(path, 'rt', encoding='UTF-8') as file:
+        for line in file:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            yield parse_line(line)
+
+def rewrite_manifest(path, entries):
+    with open(path + '.tmp', 'wt', encoding='UTF-8') as file:
+        for filename, digest in entries:
+            file.write(format_line(filename, digest) + '\n')
+    os.rename(path + '.tmp', path)
+
+def _map(executor, func, items, window):
+    '''
+    like executor.map(), but yield (item, result) pairs,
+    and keep at most window items in flight
+    '''
+    in_flight = collections.deque()
+    for item in items:
+        in_flight.append((item, executor.submit(func, item)))
+        if len(in_flight) >= window:
+            (item, future) = in_flight.popleft()
+            yield (item, future.result())
+    for (item, future) in in_flight:
+        yield (item, future.result())
+
+def verify(directory, jobs=None):
+    '''
+    verify files listed in the manifest of the directory
+
+    Yield (filename, ok) for each file, in the manifest order.
+
+    Progress is saved in a side file, so that interrupted verification
+    can be resumed; the side file is removed once all files are verified.
+    '''
+    manifest_path = os.path.join(directory, manifest_name)
+    progress_path = os.path.join(directory, progress_name)
+    done = set()
+    if os.path.exists(progress_path):
+        done = {filename for filename, _ in read_manifest(progress_path)}
+    pending = (
+        (filename, digest)
+        for filename, digest in read_manifest(manifest_path)
+        if filename not in done
+    )
+    def check(item):
+        filename, digest = item
+        try:
+            return hash_file(os.path.join(directory, filename)) == digest
+        except FileNotFoundError:
+            return False
+    jobs = jobs or os.cpu_count() or 1
+    failed = False
+    with open(progress_path, 'at', encoding='UTF-8') as progress:
+        with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+            for (filename, digest), ok in _map(executor, check, pending, window=2 * jobs):
+                if ok:
+                    progress.write(format_line(filename, digest) + '\n')
+                    progress.flush()
+                else:
+                    failed = True
+                yield filename, ok
+    if not failed:
+        os.unlink(progress_path)
+
+__all__ = [
+    'Manifest',
+    'format_line',
+    'hash_file',
+    'parse_line',
+    'read_manifest',
+    'rewrite_manifest',
+    'verify',
+]
+
+# vim:ts=4 sts=4 sw=4 et
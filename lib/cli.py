@@ -17,501 +17,268 @@
 scanhelper's command-line interface
 '''
 
-import argparse
-import collections
-import datetime
-import errno
-import itertools
 import logging
 import os
-import pty
-import re
-import shlex
-import string
 import sys
-import time
+import tarfile
+import threading
 
-from . import __version__
-from . import gnu
+from . import archive
+from . import checksum
+from . import cmdline
+from . import daemon as resident
 from . import ipc
+from . import orchestrator
+from . import pages
+from . import scanimage
 from . import scanner
-from . import utils
-from . import vcmp
-from . import xdg
+from . import session
+from . import walk
+from . import watch as watching
 from . import xmp
 
-file_formats = ('pnm', 'tiff', 'png')
-media_types = dict(
-    pnm='image/x-portable-anymap',
-    tiff='image/tiff',
-    png='image/png',
-)
-
 logger = None
 ipc_logger = None
 
-infinity = 1e999
-
-class HelpAction(argparse.Action):
-
-    def __call__(self, parser, namespace, values, option_string=None):
-        parser.epilog = 'device-specific options:\n'
-        if namespace.device is None:
-            parser.epilog += '''  use 'scanhelper -d DEVICE --help' to get list of all options for DEVICE'''
-        else:
-            scanimage_args = ['--format=pnm', '-d', namespace.device, '--help']
-            subprocess = run_scanimage(*scanimage_args, stdout=ipc.PIPE,
-               encoding=sys.stdout.encoding,
-               errors='replace',
-            )
-            for line in subprocess.stdout:
-                if not line.startswith('Options specific to device'):
-                    continue
-                else:
-                    break
-            for line in subprocess.stdout:
-                if line.strip():
-                    parser.epilog += line
-                else:
-                    break
-            subprocess.stdout.close()
-            subprocess.wait()
-        parser.print_help()
-        parser.exit()
-
-class VersionAction(argparse.Action):
-
-    def __init__(self, option_strings, dest=argparse.SUPPRESS):
-        super().__init__(
-            option_strings=option_strings,
-            dest=dest,
-            nargs=0,
-            help="show program's version information and exit"
-        )
-
-    def __call__(self, parser, namespace, values, option_string=None):
-        print(f'{parser.prog} {__version__}')
-        sane_version = scanner.get_sane_version()
-        print(f'+ SANE {sane_version}')
-        scanimage_version = get_scanimage_version()
-        if scanimage_version != sane_version:
-            print(f'+ scanimage {scanimage_version}')
-        print('+ Python {0}.{1}.{2}'.format(*sys.version_info))  # pylint: disable=consider-using-f-string
-        try:
-            pil_version = xmp.PIL.__version__
-        except AttributeError:
-            pil_version = xmp.PIL.PILLOW_VERSION  #  pylint: disable=no-member
-        print(f'+ Pillow {pil_version}')
-        print(f'+ Jinja2 {xmp.jinja2.__version__}')
-        parser.exit()
-
-class Config:
-
-    @classmethod
-    def get_paths(cls):
-        for x in xdg.load_config_paths('scanhelper'):
-            yield os.path.join(x, 'config')
-
-    def __init__(self):
-        self._data = data = collections.defaultdict(list)
-        data[None] = []
-        for config in self.get_paths():
-            if not os.path.exists(config):
-                continue
-            with open(config, 'rt') as config:  # pylint: disable=unspecified-encoding
-                for line in config:
-                    if not line:
-                        continue
-                    if line[0] == '-' or line[0].isspace() or ':' not in line:
-                        profile = None
-                    else:
-                        profile, _, line = line.partition(':')
-                        profile = profile.strip()
-                    self._data[profile] += shlex.split(line)
-
-    def get_profiles(self):
-        result = set(self._data.keys())
-        result.remove(None)
-        return result
-
-    def get(self, profile=None):
-        if profile is None:
-            return self._data[None]
-        else:
-            if profile not in self._data:
-                raise KeyError(profile)
-            return self._data[profile]
-
-def at_kv_pair(s):
-    (k, v) = s.split('=', 1)
-    if not k:
-        raise ValueError
-    return (k, v)
-at_kv_pair.__name__ = 'KEY=VALUE'
-
-class ArgumentParser(argparse.ArgumentParser):
-
-    def __init__(self):
-        argparse.ArgumentParser.__init__(self, add_help=False, formatter_class=argparse.RawDescriptionHelpFormatter)
-        self.color = False
-        self.register('action', 'help', HelpAction)
-        self.set_defaults(action='scan')
-        sane_default_dev = os.getenv('SANE_DEFAULT_DEVICE') or None
-        self.add_argument('-d', '--device-name', metavar='DEVICE', dest='device', default=sane_default_dev,
-            help='use the given scanner device')
-        self.add_argument('-L', '--list-devices', action='store_const', const='list_devices', dest='action',
-            help='show available scanner devices')
-        self.add_argument('--format', choices=file_formats, type=str.lower, dest='output_format', default='png',
-            help='file format of output file (default: PNG)')
-        self.add_argument('--target-directory', metavar='DIRECTORY',
-            help='output directory (default: a unique, time-based directory is created)')
-        self.add_argument('--target-directory-prefix', metavar='PREFIX',
-            help='prefix for directory name if --target-directory is not used')
-        self.add_argument('-i', '--icc-profile', metavar='PROFILE',
-            help='include this ICC profile into TIFF file')
-        self.add_argument('--accept-md5-only', action='store_true',
-            help='only accept authorization requests using MD5')
-        self.add_argument('-n', '--dont-scan', action='store_true',
-            help='(not supported)')
-        self.add_argument('-T', '--test', action='store_true',
-            help='(not supported)')
-        self.add_argument('-B', '--buffer-size', metavar='#', type=int, default=None,
-            help='input buffer size (in kB; default: 32)')
-        self.add_argument('-p', '--progress', action='store_true',
-            help='print progress messages')
-        self.add_argument('-v', '--verbose', action='store_true',
-            help='more informational messages')
-        self.add_argument('--profile')
-        group = self.add_argument_group('batch mode')
-        group.add_argument('-b', '--batch-mode', metavar='TEMPLATE', dest='filename_template',
-            help='output filename template (default: p%%04d.<ext>)')
-        group.add_argument('--batch-start', metavar='#', default=1, type=int,
-            help='page number to start naming files with (default: 1)')
-        group.add_argument('--batch-count', metavar='#', default=infinity, type=int,
-            help='number of pages to scan in a single batch (default: no limit)')
-        group.add_argument('--batch-increment', metavar='#', default=1, type=int,
-            help='increase page number in filename by # (default: 1)')
-        group.add_argument('--batch-double', action='store_const', dest='batch_increment', const=2,
-            help='same as --batch-increment=2')
-        group.add_argument('--batch-prompt', action='store_const', dest='batch_button', const=None,
-            help='wait for ENTER before each batch (the default)')
-        group.add_argument('--batch-button', metavar='BUTTON',
-            help='wait for the scanner button before each batch')
-        group.add_argument('--page-count', metavar='#', default=infinity, type=int,
-            help='total number of pages to scan (default: no limit)')
-        group.add_argument('--list-buttons', action='store_const', const='list_buttons', dest='action',
-            help='show available buttons')
-        group = self.add_argument_group('XMP support')
-        group.add_argument('--xmp', action='store_true',
-            help='create sidecar XMP metadata')
-        group.add_argument('--reconstruct-xmp', nargs='+', metavar='IMAGE',
-            help='reconstruct sidecar XMP metadata from existing files (only for advanced users)')
-        group.add_argument('--override-xmp', nargs='+', action='append', default=[],
-            type=at_kv_pair, metavar='KEY=VALUE',
-            help='override an XMP metadata item (only for advanced users)')
-        group = self.add_argument_group('auxiliary actions')
-        group.add_argument('-h', '--help', action=HelpAction, nargs=0,
-            help='show this help message and exit')
-        group.add_argument('-V', '--version', action=VersionAction)
-        group.add_argument('--show-config', action='store_const', const='show_config', dest='action',
-            help='show status of configuration files')
-
-    def do_not_print_usage(self, file=None):
-        pass
-
-    def xerror(self, message):
-        self.print_usage = self.do_not_print_usage
-        self.error(message)
-
-    def parse_args(self, args=None, namespace=None):
-        config = Config()
-        if args is None:
-            args = sys.argv[1:]
-        my_args = list(args)
-        my_args[:0] = config.get()
-        result, extra_args = self.parse_known_args(my_args)
-        if result.reconstruct_xmp:
-            result.action = 'reconstruct_xmp'
-        if result.profile is not None:
-            my_args = list(args)
-            try:
-                my_args[:0] = config.get(result.profile)
-            except KeyError:
-                self.xerror(f'profile not found: {result.profile!r}')
-                raise ValueError from None
-            my_args[:0] = config.get()
-            result, extra_args = self.parse_known_args(my_args)
-        result.config = config
-        for opt in 'dont-scan', 'test':
-            if getattr(result, opt.replace('-', '_')):
-                self.xerror(f'--{opt} option is not yet supported')
-        result.extra_args = extra_args
-        if result.filename_template is None:
-            result.filename_template = f'p%04d.{result.output_format[:3]}'
-        result.override_xmp = dict(
-            itertools.chain(*result.override_xmp)
-        )
-        # TODO: reject unknown XML keys
-        return result
-
 def list_devices(options):
     del options
     for d in scanner.get_devices():
         print(str.join('\t', d))
 
-def get_device(options):
-    scanners = scanner.get_devices()
-    if not scanners:
-        raise IndexError('no scanner devices')
-    if options.device is None:
-        if len(scanners) > 1:
-            raise IndexError('please select a scanner device')
-        name, vendor, model, type_ = scanners[0]
-    else:
-        for name, vendor, model, type_ in scanners:
-            if name == options.device:
-                break
-        else:
-            raise IndexError(f'no such device: {options.device}')
-    return scanner.Device(name, vendor, model, type_)
-
 def error(message, *args, **kwargs):
     message = str(message)
     if args or kwargs:
         message = message.format(*args, **kwargs)
-    print(f'scanhelper: error: {message}', file=sys.stderr)
+    report_error(message)
     sys.exit(1)
 
+def report_error(message):
+    '''
+    print the error message, without exiting
+    '''
+    print(f'scanhelper: error: {message}', file=sys.stderr)
+
 def list_buttons(options):
     try:
-        device = get_device(options)
+        device = session.get_device(options)
     except IndexError as exc:
         error(exc)
     for name in device:
         print(name)
 
-def run_scanimage(*args, **kwargs):
-    cmdline = ['scanimage']
-    cmdline += args
+async def consume(scanned_pages):
+    async for page in scanned_pages:
+        del page
+
+def scan(options):
     try:
-        proc = ipc.Subprocess(cmdline, **kwargs)
-    except OSError as exc:
-        if exc.errno == errno.ENOENT:
-            message = 'scanimage not found; please install '
-            if utils.debian:
-                message += 'the sane-utils package'
-            else:
-                message += 'sane-backends <http://www.sane-project.org/>'
-            error(message)
-        raise
-    return proc
-
-def get_scanimage_args(options, device, start=0, count=infinity, increment=1):
-    assert isinstance(device, scanner.Device)
-    result = []
-    result += ['--device-name', device.name]
-    result += [f'--format={options.output_format}']
-    if options.icc_profile is not None:
-        result += ['--icc-profile', options.icc_profile]
-    result += [f'--batch={options.filename_template}']
-    if start >= 0:
-        result += [f'--batch-start={start}']
-    if count < infinity:
-        result += [f'--batch-count={count}']
-    if increment > 1:
-        result += [f'--batch-increment={increment}']
-    if options.accept_md5_only:
-        result += ['--accept-md5-only']
-    if options.progress:
-        result += ['--progress']
-    if options.verbose:
-        result += ['--verbose']
-    if options.buffer_size is not None:
-        result += [f'--buffer-size={options.buffer_size}']
-    assert all(isinstance(x, str) for x in result)
-    return result + options.extra_args
-
-def get_scanimage_version():
-    proc = run_scanimage('--version', stdout=ipc.PIPE,
-        encoding='ASCII', errors='replace',
-    )
-    line = proc.stdout.readline()
-    proc.stdout.close()
-    proc.wait()
-    match = re.match('^scanimage [(]sane-backends[)] ([0-9.]+)', line)
-    if match is None:
-        error('cannot parse scanimage version')
-    version = match.group(1)
-    return vcmp.LooseVersion(version)
-
-def wait_for_button(device, button, sleep_interval=0.1):
-    if button is None:
-        input('Press ENTER to continue\n')
+        orchestrator.run(consume(session.scan_async(options)))
+    except KeyboardInterrupt:
+        logger.info('Interrupted by user')
+        orchestrator.reraise_sigint()
+
+class XmpDevice:
+
+    '''
+    scanner to describe in XMP metadata of existing images
+
+    It's looked up only when an image lacks vendor or model tags
+    (and they are not overridden), because get_device() is time consuming.
+    '''
+
+    def __init__(self, options):
+        self._options = options
+        self._info = None
+        self._lock = threading.Lock()
+
+    def _get_info(self):
+        with self._lock:
+            if self._info is None:
+                try:
+                    device = session.get_device(self._options)
+                except IndexError:
+                    self._info = (None, None)
+                else:
+                    self._info = (device.vendor, device.model)
+            return self._info
+
+    @property
+    def vendor(self):
+        return self._get_info()[0]
+
+    @property
+    def model(self):
+        return self._get_info()[1]
+
+def write_xmp(options, device, image_filename, fsync):
+    '''
+    create sidecar for the image (or, with --embed-xmp, embed XMP metadata into it);
+    return name of the created (or modified) file
+    '''
+    pages.write_xmp(options, device, image_filename, {}, fsync=fsync)
+    if options.embed_xmp:
+        return image_filename
+    return image_filename + '.xmp'
+
+def get_reconstruct_xmp_paths(options):
+    '''
+    lazily yield images for --reconstruct-xmp
+    '''
+    filter_ = walk.Filter(options.include, options.exclude)
+    yield from walk.iter_images(options.reconstruct_xmp, filter_)
+    if options.files_from is None:
         return
-    if button not in device:
-        error(f'no such button: {button}')
-    print(f'Press {button!r} button to continue')
-    while not device[button]:
-        time.sleep(sleep_interval)
-
-def scan_single_batch(options, device, start=0, count=infinity, increment=1):
-    assert isinstance(device, scanner.Device)
-    device.close()
-    scanimage_args = get_scanimage_args(options, device, start, count, increment)
-    master, slave = pty.openpty()
-    master = os.fdopen(master, 'r', 1)
-    subprocess = run_scanimage(*scanimage_args, stdout=slave, stderr=slave)
-    os.close(slave)
-    while True:
-        try:
-            line = master.readline()
-        except OSError:
-            break
-        if line == '':
-            break
-        sys.stdout.flush()
-        match = re.match('Scanned page ([0-9]+)', line)
-        sys.stdout.write('| ' + line)
-        sys.stdout.flush()
-        if match:
-            yield int(match.group(1))
+    if options.files_from == '-':
+        yield from walk.iter_images(walk.read_paths(sys.stdin.buffer), filter_)
+        return
+    with open(options.files_from, 'rb') as file:
+        yield from walk.iter_images(walk.read_paths(file), filter_)
+
+# Files are fsync()-ed with --durability=per-batch in batches of this size,
+# so that memory use doesn't grow with the number of files:
+reconstruct_xmp_batch_size = 1000
+
+def reconstruct_xmp(options):
+    '''
+    create sidecars for the images;
+    failures are reported, but they don't stop processing of the remaining images
+    '''
+    device = XmpDevice(options)
+    syncer = options.syncer
+    n_failed = 0
     try:
-        subprocess.wait()
-    except ipc.CalledProcessError as ex:
-        if ex.returncode in {scanner.Status.NO_DOCS, scanner.Status.JAMMED}:
-            pass
-        else:
-            raise
-
-def create_unique_directory(prefix=''):
-    alphabet = string.ascii_lowercase
-    prefix += str(datetime.datetime.now()).replace(' ', 'T')[:19]
-    for i in range(4):
-        for suffix in itertools.product(*[alphabet] * i):
-            path = prefix + str.join('', suffix)
+        for (n, image_filename) in enumerate(get_reconstruct_xmp_paths(options), start=1):
             try:
-                logger.debug('Trying to create target directory: %r', path)
-                os.mkdir(path)
-            except OSError:
+                xmp_filename = write_xmp(options, device, image_filename, fsync=syncer.sync_on_write)
+            except OSError as exc:
+                report_error(exc if exc.filename is not None else f'{image_filename}: {exc}')
+                n_failed += 1
                 continue
-            return path
-    raise  # pylint: disable=misplaced-bare-raise
+            except ValueError as exc:
+                # e.g. --embed-xmp for unsupported file format
+                report_error(f'{image_filename}: {exc}')
+                n_failed += 1
+                continue
+            syncer.add(xmp_filename, synced=True)
+            if n % reconstruct_xmp_batch_size == 0:
+                syncer.flush()
+    except OSError as exc:
+        # e.g. unreadable --files-from or directory
+        report_error(exc)
+        n_failed += 1
+    syncer.flush()
+    if n_failed:
+        error('{n} file(s) could not be processed', n=n_failed)
+
+def watch(options):
+    device = XmpDevice(options)
+    # There are no batches, so any durability policy other than "none" means per-file fsync():
+    fsync = options.syncer.policy != 'none'
+    def handle(image_filename):
+        write_xmp(options, device, image_filename, fsync=fsync)
+        logger.debug('Created %s.xmp', image_filename)
+    watcher = watching.Watcher(options.watch, handle, jobs=options.jobs)
+    logger.info('Watching %s', options.watch)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    except OSError as exc:
+        error(f'{options.watch}: {exc.strerror}')
+    except watching.Error as exc:
+        error(exc)
 
-def scan(options):
-    if options.output_format == 'png':
-        if get_scanimage_version() < '1.0.25':
-            if utils.debian:
-                pkg = 'sane-utils'
-            else:
-                pkg = 'scanimage (sane-backends)'
-            error(f'PNG output format requires {pkg} >= 1.0.25')
+def query_catalog(options):
+    if options.catalog_path is None:
+        error('--query-catalog requires --catalog')
+    if not os.path.exists(options.catalog_path):
+        error(f'{options.catalog_path}: no such catalog')
+    # Don't filter by $SANE_DEFAULT_DEVICE; only by the device selected with -d.
+    device = options.device if options.explicit_device else None
+    db = session.open_catalog(options)
     try:
-        device = get_device(options)
-    except IndexError as exc:
+        for created, device, path in db.query(device, options.since, options.until):
+            print(str.join('\t', [str(xmp.rfc3339(created)), device, path]))
+    finally:
+        db.close()
+
+def verify(options):
+    n_failed = 0
+    try:
+        for filename, ok in checksum.verify(options.verify, jobs=options.jobs):
+            if not ok:
+                print(f'{filename}: FAILED')
+                n_failed += 1
+    except (OSError, ValueError) as exc:
         error(exc)
-    assert isinstance(device, scanner.Device)
-    target_directory = options.target_directory
-    if target_directory is None:
-        prefix = options.target_directory_prefix or ''
-        if prefix and prefix[-1].isalnum():
-            prefix += '-'
-        target_directory = create_unique_directory(prefix)
-        logger.info('Target directory: %s', target_directory)
-    os.chdir(target_directory)
-    start = options.batch_start
-    increment = options.batch_increment
-    batch_count = options.batch_count
-    total_count = options.page_count
-    ipc_logger.setLevel(logging.DEBUG)
+    if n_failed:
+        error(f'{n_failed} file(s) failed verification')
+
+def extract_archive(options):
+    directory = options.target_directory or os.curdir
     try:
-        while total_count > 0:
-            try:
-                wait_for_button(device, options.batch_button)
-            except EOFError:
-                return
-            for page in scan_single_batch(options, device, start, min(total_count, batch_count), increment):
-                del page
-                image_filename = gnu.sprintf(os.fsencode(options.filename_template), start)
-                image_filename = os.fsdecode(image_filename)
-                if options.xmp:
-                    real_image_filename = image_filename
-                    xmp_filename = image_filename + '.xmp'
-                    override = dict(
-                        media_type=media_types[options.output_format],
-                    )
-                    override.update(options.override_xmp)
-                    with open(xmp_filename, 'wb') as xmp_file:
-                        xmp.write(
-                            xmp_file=xmp_file,
-                            image_filename=real_image_filename,
-                            device=device,
-                            override=override
-                        )
-                start += increment
-                total_count -= 1
-    except KeyboardInterrupt:
-        logger.info('Interrupted by user')
-        # TODO: re-raise SIGINT
+        for name in archive.extract(options.extract_archive, directory):
+            logger.debug('Extracted %s', name)
+    except (OSError, ValueError, tarfile.TarError) as exc:
+        error(exc)
 
-def reconstruct_xmp(options):
-    class device:
-        vendor = None
-        model = None
-    if ('device_vendor' in options.override_xmp and 'device_model' in options.override_xmp):
-        # Don't bother running get_device(), as it's time consuming.
+def prepare_daemon():
+    scanner.cache_devices()
+    scanimage.get_version()
+
+def run_daemon_job(args):
+    # This runs in a process forked from the daemon's fork server.
+    sys.argv = ['scanhelper', *args]
+    main()
+
+def daemon(options):
+    server = resident.Daemon(options.socket, run_job=run_daemon_job, prepare=prepare_daemon)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
         pass
-    else:
-        assert device  # quieten pyflakes
-        try:
-            device = get_device(options)
-        except IndexError:
-            pass
-        else:
-            assert isinstance(device, scanner.Device)
-    for image_filename in options.reconstruct_xmp:
-        xmp_filename = image_filename + '.xmp'
-        with open(xmp_filename, 'wb') as xmp_file:
-            xmp.write(
-                xmp_file=xmp_file,
-                image_filename=image_filename,
-                device=device,
-                override=options.override_xmp
-            )
-
-def unexpand_tilde(path):
-    home = os.path.expanduser('~/')
-    if path.startswith(home):
-        path = '~/' + path[len(home):]
-    return path
+    except resident.Error as exc:
+        error(exc)
+    except OSError as exc:
+        error(f'{options.socket}: {exc}')
+
+def submit(options):
+    args = resident.strip_client_args(options.args)
+    try:
+        returncode = resident.submit(options.socket, args, os.getcwd())
+    except resident.Error as exc:
+        error(exc)
+    if returncode is None:
+        logger.info('Job cancelled')
+        returncode = 1
+    elif returncode < 0:
+        # killed by a signal
+        returncode = 128 - returncode
+    sys.exit(returncode)
+
+def list_jobs(options):
+    try:
+        jobs = resident.list_jobs(options.socket)
+    except resident.Error as exc:
+        error(exc)
+    for job in jobs:
+        print(str.join('\t', [str(job['job']), job['state'], job['cwd'], ipc.shell_escape(job['args'])]))
+
+def cancel_job(options):
+    try:
+        resident.cancel(options.socket, options.cancel_job)
+    except resident.Error as exc:
+        error(exc)
 
 def show_config(options):
-    esc = ipc.shell_escape
-    print('Configuration files:')
-    for path in options.config.get_paths():
-        path = unexpand_tilde(path)
-        print(f'    {path}')
-    extra_options = options.config.get(None)
-    print()
-    if extra_options:
-        print('Default options:')
-        print(f'    {esc(extra_options)}')
-    else:
-        print('No default options')
-    i = 0
-    for profile in options.config.get_profiles():
-        print()
-        print(f'Options for profile {profile!r}:')
-        extra_options = options.config.get(profile)
-        print(f'    {esc(extra_options)}')
-        i += 1
-    if i == 0:
-        print()
-        print('No profiles')
-    print()
+    options.config.show()
 
 def setup_logging():
-    # Main logger:
     global logger
+    if logger is not None:
+        # already set up (e.g. in the daemon)
+        return
+    # Main logger:
     logger = logging.getLogger('scanhelper.main')
     formatter = logging.Formatter('%(message)s')
     handler = logging.StreamHandler()
@@ -526,15 +293,25 @@ def setup_logging():
     handler.setFormatter(formatter)
     ipc_logger.addHandler(handler)
     ipc_logger.setLevel(logging.INFO)
+    # Staging logger:
+    staging_logger = logging.getLogger('scanhelper.staging')
+    formatter = logging.Formatter('%(message)s')
+    handler = logging.StreamHandler()
+    handler.setFormatter(formatter)
+    staging_logger.addHandler(handler)
+    staging_logger.setLevel(logging.INFO)
 
 def main():
     setup_logging()
-    parser = ArgumentParser()
-    options = parser.parse_args()
-    action = globals()[options.action]
-    if options.verbose:
-        logger.setLevel(logging.DEBUG)
-    return action(options)
+    parser = cmdline.ArgumentParser()
+    try:
+        options = parser.parse_args()
+        action = globals()[options.action]
+        if options.verbose:
+            logger.setLevel(logging.DEBUG)
+        action(options)
+    except (scanimage.Error, session.Error) as exc:
+        error(exc)
 
 __all__ = ['main']
 
@@ -0,0 +1,529 @@
+# encoding=UTF-8
+
+# Copyright © 2011-2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+command-line option parsing
+'''
+
+import argparse
+import collections
+import itertools
+import os
+import sys
+import time
+
+from . import __version__
+from . import archive
+from . import checksum
+from . import config
+from . import daemon as resident
+from . import derivatives
+from . import durability
+from . import encoder
+from . import ipc
+from . import pages
+from . import preview
+from . import recovery
+from . import scanimage
+from . import scanner
+from . import template
+from . import xmp
+
+file_formats = ('pnm', 'tiff', 'png', 'jpeg', 'webp')
+
+infinity = scanimage.infinity
+
+class Error(ValueError):
+    pass
+
+def get_default_device():
+    return os.getenv('SANE_DEFAULT_DEVICE') or None
+
+class HelpAction(argparse.Action):
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        parser.epilog = 'device-specific options:\n'
+        device = namespace.device or get_default_device()
+        if device is None:
+            parser.epilog += '''  use 'scanhelper -d DEVICE --help' to get list of all options for DEVICE'''
+        else:
+            scanimage_args = ['--format=pnm', '-d', device, '--help']
+            subprocess = scanimage.run(*scanimage_args, stdout=ipc.PIPE,
+               encoding=sys.stdout.encoding,
+               errors='replace',
+            )
+            for line in subprocess.stdout:
+                if not line.startswith('Options specific to device'):
+                    continue
+                else:
+                    break
+            for line in subprocess.stdout:
+                if line.strip():
+                    parser.epilog += line
+                else:
+                    break
+            subprocess.stdout.close()
+            subprocess.wait()
+        parser.print_help()
+        parser.exit()
+
+class VersionAction(argparse.Action):
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS):
+        super().__init__(
+            option_strings=option_strings,
+            dest=dest,
+            nargs=0,
+            help="show program's version information and exit"
+        )
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        print(f'{parser.prog} {__version__}')
+        sane_version = scanner.get_sane_version()
+        print(f'+ SANE {sane_version}')
+        scanimage_version = scanimage.get_version()
+        if scanimage_version != sane_version:
+            print(f'+ scanimage {scanimage_version}')
+        print('+ Python {0}.{1}.{2}'.format(*sys.version_info))  # pylint: disable=consider-using-f-string
+        try:
+            pil_version = xmp.PIL.__version__
+        except AttributeError:
+            pil_version = xmp.PIL.PILLOW_VERSION  #  pylint: disable=no-member
+        print(f'+ Pillow {pil_version}')
+        print(f'+ Jinja2 {xmp.jinja2.__version__}')
+        parser.exit()
+
+def at_kv_pair(s):
+    (k, v) = s.split('=', 1)
+    if not k:
+        raise ValueError
+    return (k, v)
+at_kv_pair.__name__ = 'KEY=VALUE'
+
+timestamp_formats = (
+    '%Y-%m-%d',
+    '%Y-%m-%dT%H:%M',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d %H:%M:%S',
+)
+
+def local_timestamp(s):
+    for fmt in timestamp_formats:
+        try:
+            return time.mktime(time.strptime(s, fmt))
+        except ValueError:
+            continue
+    raise ValueError
+local_timestamp.__name__ = 'timestamp'
+
+class ArgumentParser(argparse.ArgumentParser):
+
+    '''
+    parser of scanhelper's command line
+
+    conf: Config object to take default options and profiles from
+    (default: read the configuration files)
+    raise_errors: raise Error instead of printing the message and exiting
+    '''
+
+    def __init__(self, conf=None, raise_errors=False):
+        argparse.ArgumentParser.__init__(self, add_help=False, formatter_class=argparse.RawDescriptionHelpFormatter)
+        self.color = False
+        self.conf = conf
+        self.raise_errors = raise_errors
+        self.register('action', 'help', HelpAction)
+        self.set_defaults(action='scan')
+        # The default is $SANE_DEFAULT_DEVICE, which is filled in by parse_args().
+        self.add_argument('-d', '--device-name', metavar='DEVICE', dest='device',
+            help='use the given scanner device')
+        self.add_argument('-L', '--list-devices', action='store_const', const='list_devices', dest='action',
+            help='show available scanner devices')
+        self.add_argument('--format', choices=file_formats, type=str.lower, dest='output_format', default='png',
+            help='file format of output file (default: PNG)')
+        self.add_argument('--target-directory', metavar='DIRECTORY',
+            help='output directory (default: a unique, time-based directory is created)')
+        self.add_argument('--target-directory-prefix', metavar='PREFIX',
+            help='prefix for directory name if --target-directory is not used')
+        self.add_argument('-i', '--icc-profile', metavar='PROFILE',
+            help='include this ICC profile into TIFF file')
+        self.add_argument('--accept-md5-only', action='store_true',
+            help='only accept authorization requests using MD5')
+        self.add_argument('-n', '--dont-scan', action='store_true',
+            help='(not supported)')
+        self.add_argument('-T', '--test', action='store_true',
+            help='(not supported)')
+        self.add_argument('-B', '--buffer-size', metavar='#', type=int, default=None,
+            help='input buffer size (in kB; default: 32)')
+        self.add_argument('-p', '--progress', action='store_true',
+            help='print progress messages')
+        self.add_argument('-v', '--verbose', action='store_true',
+            help='more informational messages')
+        self.add_argument('--profile')
+        group = self.add_argument_group('batch mode')
+        group.add_argument('-b', '--batch-mode', metavar='TEMPLATE', dest='filename_template',
+            help='output filename template (default: p%%04d.<ext>);'
+            ' it can also contain %%{session}, %%{device} and %%{date} fields')
+        group.add_argument('--batch-start', metavar='#', default=1, type=int,
+            help='page number to start naming files with (default: 1)')
+        group.add_argument('--batch-count', metavar='#', default=infinity, type=int,
+            help='number of pages to scan in a single batch (default: no limit)')
+        group.add_argument('--batch-increment', metavar='#', default=1, type=int,
+            help='increase page number in filename by # (default: 1)')
+        group.add_argument('--batch-double', action='store_const', dest='batch_increment', const=2,
+            help='same as --batch-increment=2')
+        group.add_argument('--batch-prompt', action='store_const', dest='batch_button', const=None,
+            help='wait for ENTER before each batch (the default)')
+        group.add_argument('--batch-button', metavar='BUTTON',
+            help='wait for the scanner button before each batch')
+        group.add_argument('--page-count', metavar='#', default=infinity, type=int,
+            help='total number of pages to scan (default: no limit)')
+        group.add_argument('--resume', action='store_true',
+            help='continue an interrupted session in --target-directory, after the last existing page')
+        group.add_argument('--list-buttons', action='store_const', const='list_buttons', dest='action',
+            help='show available buttons')
+        self.add_xmp_arguments()
+        self.add_encoding_arguments()
+        self.add_staging_arguments()
+        self.add_archive_arguments()
+        self.add_document_arguments()
+        self.add_preview_arguments()
+        self.add_recovery_arguments()
+        self.add_integrity_arguments()
+        self.add_catalog_arguments()
+        self.add_recording_arguments()
+        self.add_daemon_arguments()
+        group = self.add_argument_group('auxiliary actions')
+        group.add_argument('-h', '--help', action=HelpAction, nargs=0,
+            help='show this help message and exit')
+        group.add_argument('-V', '--version', action=VersionAction)
+        group.add_argument('--show-config', action='store_const', const='show_config', dest='action',
+            help='show status of configuration files')
+
+    def add_xmp_arguments(self):
+        group = self.add_argument_group('XMP support')
+        group.add_argument('--xmp', action='store_true',
+            help='create sidecar XMP metadata')
+        group.add_argument('--reconstruct-xmp', nargs='*', metavar='IMAGE',
+            help='reconstruct sidecar XMP metadata from existing files (only for advanced users);'
+            ' directories are walked recursively')
+        group.add_argument('--files-from', metavar='FILE',
+            help='with --reconstruct-xmp, read also NUL-separated paths from FILE ("-" for stdin)')
+        group.add_argument('--include', metavar='GLOB', action='append', default=[],
+            help='with --reconstruct-xmp, take only files with names matching GLOB'
+            ' from the walked directories (default: images)')
+        group.add_argument('--exclude', metavar='GLOB', action='append', default=[],
+            help='with --reconstruct-xmp, skip files and directories with names matching GLOB'
+            ' in the walked directories')
+        group.add_argument('--embed-xmp', action='store_true',
+            help='embed XMP metadata into the image files (PNG and TIFF only) instead of creating sidecars;'
+            ' implies --xmp, and applies also to --reconstruct-xmp')
+        group.add_argument('--watch', metavar='DIRECTORY',
+            help='watch DIRECTORY, and create sidecar XMP metadata for new images as soon as they are complete')
+        group.add_argument('--override-xmp', nargs='+', action='append', default=[],
+            type=at_kv_pair, metavar='KEY=VALUE',
+            help='override an XMP metadata item (only for advanced users)')
+
+    def add_encoding_arguments(self):
+        group = self.add_argument_group('post-processing')
+        group.add_argument('--quality', metavar='N', type=int, default=None,
+            help='image quality, from 0 to 100 (default: 75 for JPEG, 80 for WebP)')
+        group.add_argument('--subsampling', choices=encoder.subsamplings, default=None,
+            help='JPEG chroma subsampling (default: 4:2:0)')
+        group.add_argument('--auto-mode', action='store_true',
+            help='store each page in the smallest appropriate colour mode: colour, grayscale, or bilevel')
+        group.add_argument('--blank-pages', choices=('keep', 'delete', 'move'), default='keep',
+            help=f'what to do with blank pages: keep them, delete them, or move them to {pages.blank_directory}/'
+            ' in the target directory (default: keep)')
+        group.add_argument('--blank-threshold', metavar='PERCENT', type=float, default=0.1,
+            help='maximum ink coverage of a blank page (default: 0.1)')
+        group.add_argument('--split-items', action='store_true',
+            help='store each separate item found on the page (e.g. a photo) as a separate page')
+        group.add_argument('--deskew', action='store_true',
+            help='straighten skewed items found with --split-items')
+        group.add_argument('--derivative', metavar='NAME=SIZE', type=derivatives.Spec,
+            action='append', dest='derivatives', default=[],
+            help='also create a downsampled JPEG copy of each page, named <page>.NAME.jpg;'
+            ' SIZE is either <N>dpi or <N>px (length of the longer side)')
+
+    def add_staging_arguments(self):
+        group = self.add_argument_group('staging')
+        group.add_argument('--staging-directory', metavar='DIRECTORY',
+            help='scan into DIRECTORY (e.g. on local disk) and move files to the target directory in background')
+        group.add_argument('--staging-backlog', metavar='N', type=int, default=64,
+            help='maximum number of files waiting to be moved (default: 64)')
+
+    def add_archive_arguments(self):
+        group = self.add_argument_group('archive')
+        group.add_argument('--archive', metavar='FORMAT', choices=archive.formats, dest='archive_format',
+            help='store pages and sidecars in a single (uncompressed) tar or zip archive in the target directory')
+        group.add_argument('--extract-archive', metavar='ARCHIVE',
+            help='extract pages from ARCHIVE into --target-directory (default: current directory)')
+
+    def add_document_arguments(self):
+        group = self.add_argument_group('document assembly')
+        group.add_argument('--document', metavar='FILE', dest='document_path',
+            help='append pages to a multi-page PDF or TIFF document (chosen by the extension) as they are scanned;'
+            ' relative paths are relative to the target directory')
+
+    def add_preview_arguments(self):
+        group = self.add_argument_group('preview')
+        group.add_argument('--preview-crop', action='store_true',
+            help='before each batch, do a quick preview scan, and then scan only the area covered by the content'
+            ' (for flatbed scanners)')
+        group.add_argument('--preview-resolution', metavar='DPI', type=int, default=preview.default_resolution,
+            help=f'resolution of the preview scan (default: {preview.default_resolution})')
+
+    def add_recovery_arguments(self):
+        group = self.add_argument_group('recovery')
+        group.add_argument('--busy-retries', metavar='N', type=int, default=0,
+            help='if the device is busy, retry up to N times (default: 0)')
+        group.add_argument('--busy-delay', metavar='SECONDS', type=float, default=1.0,
+            help='delay before the first retry, doubled for each subsequent one (default: 1)')
+        group.add_argument('--on-jam', choices=recovery.jam_actions, default='end-batch',
+            help='what to do on paper jam or open cover: end the batch,'
+            ' or wait for the operator and then continue the batch (default: end-batch)')
+
+    def add_integrity_arguments(self):
+        group = self.add_argument_group('integrity')
+        group.add_argument('--checksums', action='store_true',
+            help=f'compute SHA-256 checksums of created files into {checksum.manifest_name}')
+        group.add_argument('--verify', metavar='DIRECTORY',
+            help=f'verify files in DIRECTORY against its {checksum.manifest_name}')
+        group.add_argument('--durability', choices=durability.policies, default='none',
+            help='when to fsync() created files: none, per-page, or per-batch (default: none)')
+        group.add_argument('--jobs', metavar='N', type=int, default=None,
+            help='number of parallel workers (default: depends on the number of CPUs)')
+
+    def add_catalog_arguments(self):
+        group = self.add_argument_group('catalog')
+        group.add_argument('--catalog', metavar='DATABASE', dest='catalog_path',
+            help='record sessions and pages in this SQLite database')
+        group.add_argument('--query-catalog', action='store_const', const='query_catalog', dest='action',
+            help='list cataloged pages (optionally only for the device selected with -d)')
+        group.add_argument('--since', metavar='TIMESTAMP', type=local_timestamp,
+            help='only list pages scanned at or after TIMESTAMP (YYYY-MM-DD[THH:MM[:SS]])')
+        group.add_argument('--until', metavar='TIMESTAMP', type=local_timestamp,
+            help='only list pages scanned before TIMESTAMP')
+
+    def add_recording_arguments(self):
+        group = self.add_argument_group('session recording')
+        group.add_argument('--record', metavar='SESSION',
+            help='record the scan session (scanner output, timing, devices, pages) into this file')
+        group.add_argument('--replay', metavar='SESSION',
+            help='replay a recorded scan session instead of using a real scanner')
+        group.add_argument('--replay-speed', metavar='FACTOR', type=float, default=1,
+            help='replay speed-up factor; 0 means as fast as possible (default: 1)')
+
+    def add_daemon_arguments(self):
+        group = self.add_argument_group('daemon')
+        group.add_argument('--daemon', action='store_const', const='daemon', dest='action',
+            help='run as a resident daemon that accepts scan jobs over a Unix socket')
+        group.add_argument('--submit', action='store_true',
+            help='run this scan job in the daemon')
+        group.add_argument('--list-jobs', action='store_const', const='list_jobs', dest='action',
+            help='list jobs queued in the daemon')
+        group.add_argument('--cancel-job', metavar='ID', type=int,
+            help='cancel a job queued in the daemon')
+        group.add_argument('--socket', metavar='PATH', default=None,
+            help='path to the daemon socket (default: $XDG_RUNTIME_DIR/scanhelper.sock)')
+
+    def do_not_print_usage(self, file=None):
+        pass
+
+    def error(self, message):
+        if self.raise_errors:
+            raise Error(message)
+        super().error(message)
+
+    def xerror(self, message):
+        self.print_usage = self.do_not_print_usage
+        self.error(message)
+
+    def format_option(self, dest, value):
+        '''
+        return command-line arguments that set the option with the given dest to the value
+        '''
+        if dest == 'action':
+            raise KeyError(dest)
+        for action in self._actions:
+            if action.dest != dest or not action.option_strings:
+                continue
+            option = action.option_strings[-1]
+            if action.nargs == 0:
+                if value is action.const:
+                    return [option]
+                if value == action.default:
+                    return []
+                continue
+            if value is None:
+                return []
+            if isinstance(value, dict):
+                value = [f'{k}={v}' for (k, v) in value.items()]
+            if isinstance(action, argparse._AppendAction):  # pylint: disable=protected-access
+                if action.nargs == '+':
+                    return [option, *map(str, value)] if value else []
+                return [f'{option}={v}' for v in value]
+            return [f'{option}={value}']
+        raise KeyError(dest)
+
+    def check_args(self, result):
+        for opt in 'dont-scan', 'test':
+            if getattr(result, opt.replace('-', '_')):
+                self.xerror(f'--{opt} option is not yet supported')
+        if result.resume and result.target_directory is None:
+            self.xerror('--resume requires --target-directory')
+        try:
+            template.parse(result.filename_template)
+        except ValueError as exc:
+            self.xerror(str(exc))
+        self.check_post_processing_args(result)
+        if result.preview_crop and result.replay is not None:
+            self.xerror('--preview-crop cannot be used together with --replay')
+        if result.archive_format and result.staging_directory:
+            self.xerror('--archive cannot be used together with --staging-directory')
+        if result.archive_format and result.catalog_path:
+            # The catalog would point to files that were moved into the archive.
+            self.xerror('--archive cannot be used together with --catalog')
+        self.check_xmp_args(result)
+        if result.busy_retries < 0:
+            self.xerror('--busy-retries must not be negative')
+        if result.busy_delay < 0:
+            self.xerror('--busy-delay must not be negative')
+        if result.jobs is not None and result.jobs < 1:
+            self.xerror('--jobs must be positive')
+        if result.document_path is not None:
+            ext = os.path.splitext(result.document_path)[1].lower()
+            if ext not in pages.document_writers:
+                self.xerror('--document must have .pdf, .tif or .tiff extension')
+
+    def check_xmp_args(self, result):
+        if result.action == 'reconstruct_xmp':
+            if not result.reconstruct_xmp and result.files_from is None:
+                self.xerror('--reconstruct-xmp requires IMAGE arguments or --files-from')
+        elif result.files_from is not None:
+            self.xerror('--files-from requires --reconstruct-xmp')
+        if not result.embed_xmp:
+            return
+        if result.action == 'scan' and result.output_format not in {'png', 'tiff'}:
+            self.xerror('--embed-xmp requires PNG or TIFF output format')
+        if result.action == 'watch':
+            # Embedding modifies the image, which would trigger another event.
+            self.xerror('--embed-xmp cannot be used together with --watch')
+        result.xmp = True
+
+    def check_post_processing_args(self, result):
+        analysis_options = [
+            ('auto-mode', result.auto_mode),
+            ('blank-pages', result.blank_pages != 'keep'),
+            ('preview-crop', result.preview_crop),
+            ('split-items', result.split_items),
+        ]
+        for opt, enabled in analysis_options:
+            if not enabled:
+                continue
+            try:
+                encoder.import_analysis()
+            except ImportError as exc:
+                self.xerror(f'--{opt}: {exc}')
+        if any(spec.unit == 'dpi' for spec in result.derivatives) and pages.get_resolution(result) is None:
+            self.xerror('--derivative with <N>dpi size requires the --resolution option')
+        names = [spec.name for spec in result.derivatives]
+        for name in sorted(set(names)):
+            if names.count(name) > 1:
+                self.xerror(f'--derivative: duplicate name: {name}')
+        if result.deskew and not result.split_items:
+            self.xerror('--deskew requires --split-items')
+        if not 0 <= result.blank_threshold <= 100:
+            self.xerror('--blank-threshold must be between 0 and 100')
+        if result.output_format in encoder.formats and not encoder.is_available(result.output_format):
+            self.xerror(f'{result.output_format} output format is not supported by this Pillow build')
+        if result.quality is not None and not 0 <= result.quality <= 100:
+            self.xerror('--quality must be between 0 and 100')
+
+    @staticmethod
+    def set_action(result):
+        '''
+        select the action for options that take an argument
+        '''
+        if result.reconstruct_xmp is not None:
+            result.action = 'reconstruct_xmp'
+        if result.verify is not None:
+            result.action = 'verify'
+        if result.watch is not None:
+            result.action = 'watch'
+        if result.extract_archive is not None:
+            result.action = 'extract_archive'
+        if result.submit:
+            result.action = 'submit'
+        if result.cancel_job is not None:
+            result.action = 'cancel_job'
+
+    def parse_args(self, args=None, namespace=None):
+        conf = self.conf
+        if conf is None:
+            conf = config.Config()
+        if args is None:
+            args = sys.argv[1:]
+        my_args = list(args)
+        my_args[:0] = conf.get()
+        result, extra_args = self.parse_known_args(my_args)
+        if result.profile is not None:
+            my_args = list(args)
+            try:
+                my_args[:0] = conf.get(result.profile)
+            except KeyError:
+                self.xerror(f'profile not found: {result.profile!r}')
+                raise ValueError from None
+            my_args[:0] = conf.get()
+            result, extra_args = self.parse_known_args(my_args)
+        self.set_action(result)
+        # Some actions (e.g. --query-catalog) treat an explicitly selected device differently:
+        result.explicit_device = result.device is not None
+        if result.device is None:
+            result.device = get_default_device()
+        if result.socket is None:
+            result.socket = resident.get_default_socket_path()
+        result.args = list(args)
+        result.config = conf
+        result.recorder = None
+        result.player = None
+        result.catalog = None
+        result.manifest = None
+        result.mover = None
+        result.archive = None
+        result.document = None
+        result.encoder = None
+        result.syncer = durability.Syncer(result.durability)
+        result.recovery_policy = recovery.Policy(result.busy_retries, result.busy_delay, result.on_jam)
+        result.recoveries = collections.Counter()
+        result.extra_args = extra_args
+        result.scanimage_output = sys.stdout
+        if result.filename_template is None:
+            result.filename_template = f'p%04d.{pages.file_extensions[result.output_format]}'
+        self.check_args(result)
+        result.override_xmp = dict(
+            itertools.chain(*result.override_xmp)
+        )
+        # TODO: reject unknown XML keys
+        return result
+
+__all__ = [
+    'ArgumentParser',
+    'Error',
+    'file_formats',
+]
+
+# vim:ts=4 sts=4 sw=4 et
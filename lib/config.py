@@ -0,0 +1,103 @@
+# encoding=UTF-8
+
+# Copyright © 2011-2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''configuration files'''
+
+import collections
+import os
+import shlex
+
+from . import ipc
+from . import xdg
+
+def unexpand_tilde(path):
+    home = os.path.expanduser('~/')
+    if path.startswith(home):
+        path = '~/' + path[len(home):]
+    return path
+
+class Config:
+
+    @classmethod
+    def get_paths(cls):
+        for x in xdg.load_config_paths('scanhelper'):
+            yield os.path.join(x, 'config')
+
+    def __init__(self, paths=None):
+        self._data = data = collections.defaultdict(list)
+        data[None] = []
+        if paths is None:
+            paths = self.get_paths()
+        for config in paths:
+            if not os.path.exists(config):
+                continue
+            with open(config, 'rt') as config:  # pylint: disable=unspecified-encoding
+                for line in config:
+                    if not line:
+                        continue
+                    if line[0] == '-' or line[0].isspace() or ':' not in line:
+                        profile = None
+                    else:
+                        profile, _, line = line.partition(':')
+                        profile = profile.strip()
+                    self._data[profile] += shlex.split(line)
+
+    def get_profiles(self):
+        result = set(self._data.keys())
+        result.remove(None)
+        return result
+
+    def get(self, profile=None):
+        if profile is None:
+            return self._data[None]
+        else:
+            if profile not in self._data:
+                raise KeyError(profile)
+            return self._data[profile]
+
+    def show(self):
+        '''
+        print status of configuration files
+        '''
+        esc = ipc.shell_escape
+        print('Configuration files:')
+        for path in self.get_paths():
+            path = unexpand_tilde(path)
+            print(f'    {path}')
+        extra_options = self.get(None)
+        print()
+        if extra_options:
+            print('Default options:')
+            print(f'    {esc(extra_options)}')
+        else:
+            print('No default options')
+        i = 0
+        for profile in self.get_profiles():
+            print()
+            print(f'Options for profile {profile!r}:')
+            extra_options = self.get(profile)
+            print(f'    {esc(extra_options)}')
+            i += 1
+        if i == 0:
+            print()
+            print('No profiles')
+        print()
+
+__all__ = [
+    'Config',
+    'unexpand_tilde',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,604 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+resident daemon that runs scan jobs submitted over a Unix socket
+
+The protocol is JSON Lines. The client sends a request with a "command"
+key: "submit" (with "args" and "cwd"), "cancel" (with "job") or "list".
+After "submit", the client can also send "input" (with "data"), "eof" and
+"cancel" messages for its job. The daemon replies with events: "queued",
+"started", "output" (with "data"), "exit" (with "returncode"), "jobs"
+and "error" (with "message").
+'''
+
+import array
+import codecs
+import itertools
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import stat
+import sys
+import tempfile
+import threading
+import traceback
+
+from . import xdg
+
+logger = logging.getLogger('scanhelper.main')
+
+def get_default_socket_path():
+    runtime_dir = xdg.get_runtime_dir()
+    if runtime_dir is None:
+        return os.path.join(tempfile.gettempdir(), f'scanhelper-{os.getuid()}.sock')
+    return os.path.join(runtime_dir, 'scanhelper.sock')
+
+class Error(RuntimeError):
+    pass
+
+class Connection:
+
+    '''
+    JSON Lines connection; send() is thread-safe
+    '''
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._reader = sock.makefile('r', encoding='UTF-8')
+        self._lock = threading.Lock()
+
+    def send(self, **message):
+        data = (json.dumps(message) + '\n').encode('UTF-8')
+        with self._lock:
+            try:
+                self._sock.sendall(data)
+            except OSError:
+                # The client is gone.
+                pass
+
+    def receive(self):
+        '''
+        return the next message, or None if the connection was closed
+        '''
+        try:
+            line = self._reader.readline()
+            if not line:
+                return None
+            return json.loads(line)
+        except (OSError, ValueError):
+            return None
+
+    def __iter__(self):
+        return iter(self.receive, None)
+
+    def close(self):
+        self._reader.close()
+        self._sock.close()
+
+class Job:
+
+    def __init__(self, id_, args, cwd, connection):
+        self.id = id_
+        self.args = args
+        self.cwd = cwd
+        self.connection = connection
+        self.state = 'queued'
+        self.pid = None
+        self.stdin = None
+
+    def describe(self):
+        return dict(job=self.id, state=self.state, args=self.args, cwd=self.cwd)
+
+def _send_message(sock, message, fds=()):
+    ancillary = []
+    if fds:
+        ancillary += [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))]
+    sock.sendmsg([json.dumps(message).encode('UTF-8')], ancillary)
+
+def _receive_message(sock, max_fds=2):
+    '''
+    return (message, list of received file descriptors);
+    message is None if the connection was closed
+    '''
+    fds = array.array('i')
+    (data, ancillary, _, _) = sock.recvmsg(1 << 16, socket.CMSG_LEN(max_fds * fds.itemsize))
+    for (level, type_, fd_data) in ancillary:
+        if level == socket.SOL_SOCKET and type_ == socket.SCM_RIGHTS:
+            fds.frombytes(fd_data[:len(fd_data) - len(fd_data) % fds.itemsize])
+    if not data:
+        return (None, list(fds))
+    return (json.loads(data), list(fds))
+
+class ForkServer:
+
+    '''
+    helper process that forks the jobs
+
+    It is started before the daemon starts any threads, so it is
+    single-threaded: the jobs can't inherit locks that another thread held
+    at the time of fork(). The jobs inherit everything that was initialised
+    by prepare() in this process.
+    '''
+
+    def __init__(self, run_job, prepare):
+        self._run_job = run_job
+        self._prepare = prepare
+        self._sock = None
+
+    def start(self):
+        (self._sock, sock) = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        pid = os.fork()
+        if pid == 0:
+            self._sock.close()
+            self._serve(sock)
+        sock.close()
+        reply = self._receive()
+        if reply['error'] is not None:
+            raise Error(f'cannot prepare the daemon: {reply["error"]}')
+
+    def refresh(self):
+        '''
+        ask the server to call prepare() again; failures are only logged
+        '''
+        _send_message(self._sock, dict(command='prepare'))
+
+    def fork(self, args, cwd, stdin, output):
+        '''
+        fork a process that runs the job with the given stdin and stdout/stderr;
+        return its PID
+        '''
+        _send_message(self._sock, dict(command='run', args=args, cwd=cwd), [stdin, output])
+        reply = self._receive()
+        if reply['error'] is not None:
+            raise Error(f'cannot start the job: {reply["error"]}')
+        return reply['pid']
+
+    def wait(self):
+        '''
+        wait until the forked process exits; return its exit status
+        '''
+        status = self._receive()['status']
+        if os.WIFSIGNALED(status):
+            return -os.WTERMSIG(status)
+        return os.WEXITSTATUS(status)
+
+    def close(self):
+        # The server exits once it's done with the current job.
+        self._sock.close()
+
+    def _receive(self):
+        (message, _) = _receive_message(self._sock)
+        if message is None:
+            raise Error('the fork server has exited')
+        return message
+
+    # The methods below run in the fork server process.
+
+    def _serve(self, sock):
+        # SIGINT from the terminal is meant for the daemon.
+        # (It's blocked rather than ignored, so that the jobs don't miss early cancellation.)
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGINT})
+        try:
+            try:
+                self._prepare()
+            except Exception as exc:  # pylint: disable=broad-except
+                _send_message(sock, dict(error=str(exc)))
+                os._exit(1)  # pylint: disable=protected-access
+            _send_message(sock, dict(error=None))
+            while True:
+                (message, fds) = _receive_message(sock)
+                if message is None:
+                    break
+                if message['command'] == 'prepare':
+                    try:
+                        self._prepare()
+                    except Exception:  # pylint: disable=broad-except
+                        logger.exception('Cannot refresh the daemon state')
+                else:
+                    self._fork(sock, message['args'], message['cwd'], *fds)
+        except BaseException:  # pylint: disable=broad-except
+            traceback.print_exc()
+            os._exit(1)  # pylint: disable=protected-access
+        os._exit(0)  # pylint: disable=protected-access
+
+    def _fork(self, sock, args, cwd, stdin, output):
+        try:
+            pid = os.fork()
+        except OSError as exc:
+            os.close(stdin)
+            os.close(output)
+            _send_message(sock, dict(error=str(exc)))
+            return
+        if pid == 0:
+            sock.close()
+            self._run_child(args, cwd, stdin, output)
+        os.close(stdin)
+        os.close(output)
+        try:
+            os.setpgid(pid, pid)
+        except OSError:
+            # The child has already done it (or exited).
+            pass
+        _send_message(sock, dict(error=None, pid=pid))
+        (_, status) = os.waitpid(pid, 0)
+        _send_message(sock, dict(status=status))
+
+    def _run_child(self, args, cwd, stdin, output):
+        returncode = 1
+        try:
+            os.setpgid(0, 0)
+            os.dup2(stdin, 0)
+            os.dup2(output, 1)
+            os.dup2(output, 2)
+            os.close(stdin)
+            os.close(output)
+            # The daemon's own streams might have been replaced or wrapped:
+            sys.stdin = open(0, 'r', encoding='UTF-8', closefd=False)  # pylint: disable=consider-using-with
+            sys.stdout = open(1, 'w', encoding='UTF-8', closefd=False)  # pylint: disable=consider-using-with
+            sys.stderr = open(2, 'w', encoding='UTF-8', closefd=False)  # pylint: disable=consider-using-with
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGINT})
+            os.chdir(cwd)
+            self._run_job(args)
+            returncode = 0
+        except SystemExit as exc:
+            if exc.code is None:
+                returncode = 0
+            elif isinstance(exc.code, int):
+                returncode = exc.code
+            else:
+                print(exc.code, file=sys.stderr)
+        except BaseException:  # pylint: disable=broad-except
+            traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(returncode)  # pylint: disable=protected-access
+
+def _remove_stale_socket(path):
+    '''
+    remove the socket if it was left behind by a daemon that is gone;
+    raise Error if another daemon is listening on it
+    '''
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            # bind() will fail.
+            return
+    except FileNotFoundError:
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+        return
+    except OSError:
+        return
+    finally:
+        sock.close()
+    raise Error(f'another daemon is already listening on {path}')
+
+def _get_file_id(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_dev, st.st_ino)
+
+class Daemon:
+
+    '''
+    run submitted jobs one by one, each in a process forked from the fork server
+
+    The forked process inherits everything that was initialised by
+    prepare() (imported modules, SANE, cached devices and probes), and
+    calls run_job(args) in the job's working directory. prepare() is
+    called again when the daemon becomes idle, i.e. after a job if no other
+    job is queued; failures of this call are only logged.
+    '''
+
+    def __init__(self, path, run_job, prepare=None):
+        self.path = path
+        self._fork_server = ForkServer(run_job, prepare or (lambda: None))
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def serve_forever(self):
+        _remove_stale_socket(self.path)
+        # This must happen before any threads are started:
+        self._fork_server.start()
+        try:
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            old_umask = os.umask(0o077)
+            try:
+                listener.bind(self.path)
+            finally:
+                os.umask(old_umask)
+            file_id = _get_file_id(self.path)
+            try:
+                listener.listen()
+                logger.info('Listening on %s', self.path)
+                worker = threading.Thread(target=self._work, name='scanhelper.daemon.worker', daemon=True)
+                worker.start()
+                while True:
+                    (sock, _) = listener.accept()
+                    thread = threading.Thread(target=self._handle, args=(sock,), daemon=True)
+                    thread.start()
+            finally:
+                listener.close()
+                # Don't remove the socket of another daemon:
+                if _get_file_id(self.path) == file_id:
+                    os.unlink(self.path)
+        finally:
+            self._fork_server.close()
+
+    def _handle(self, sock):
+        connection = Connection(sock)
+        job = None
+        try:
+            for message in connection:
+                command = message.get('command')
+                if job is not None:
+                    self._handle_job_message(job, command, message)
+                elif command == 'submit':
+                    job = self._submit(message, connection)
+                elif command == 'cancel':
+                    job_id = message.get('job')
+                    with self._lock:
+                        other_job = self._jobs.get(job_id)
+                    if other_job is None:
+                        connection.send(event='error', message=f'no such job: {job_id}')
+                    else:
+                        self._cancel(other_job)
+                        connection.send(event='cancelled', job=job_id)
+                    return
+                elif command == 'list':
+                    with self._lock:
+                        jobs = [j.describe() for j in self._jobs.values()]
+                    connection.send(event='jobs', jobs=jobs)
+                    return
+                else:
+                    connection.send(event='error', message=f'unknown command: {command!r}')
+                    return
+            if job is not None:
+                # The client has disconnected.
+                self._cancel(job)
+        finally:
+            connection.close()
+
+    def _handle_job_message(self, job, command, message):
+        if command == 'input':
+            if job.stdin is not None:
+                try:
+                    os.write(job.stdin, message['data'].encode('UTF-8'))
+                except OSError:
+                    pass
+        elif command == 'eof':
+            self._close_stdin(job)
+        elif command == 'cancel':
+            self._cancel(job)
+
+    def _submit(self, message, connection):
+        with self._lock:
+            job = Job(next(self._ids), list(message['args']), message['cwd'], connection)
+            position = len(self._jobs)
+            self._jobs[job.id] = job
+        connection.send(event='queued', job=job.id, position=position)
+        self._queue.put(job)
+        return job
+
+    def _cancel(self, job):
+        with self._lock:
+            if job.state == 'queued':
+                job.state = 'cancelled'
+                del self._jobs[job.id]
+                job.connection.send(event='exit', returncode=None)
+                return
+            if job.state != 'running':
+                return
+            job.state = 'cancelling'
+            if job.pid is None:
+                # not forked yet; _run() will take care of it
+                return
+        self._interrupt(job)
+
+    def _interrupt(self, job):
+        logger.info('Cancelling job %d', job.id)
+        try:
+            # SIGINT lets scanhelper (and scanimage) stop cleanly.
+            os.killpg(job.pid, signal.SIGINT)
+        except ProcessLookupError:
+            pass
+
+    def _close_stdin(self, job):
+        with self._lock:
+            if job.stdin is not None:
+                os.close(job.stdin)
+                job.stdin = None
+
+    def _work(self):
+        stale = False
+        while True:
+            if stale and self._queue.empty():
+                self._refresh()
+                stale = False
+            job = self._queue.get()
+            with self._lock:
+                if job.state == 'cancelled':
+                    continue
+                job.state = 'running'
+            stale = True
+            try:
+                try:
+                    returncode = self._run(job)
+                finally:
+                    self._close_stdin(job)
+                    with self._lock:
+                        job.state = 'done'
+                        del self._jobs[job.id]
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.exception('Job %d failed', job.id)
+                job.connection.send(event='error', message=f'job {job.id} failed: {exc}')
+                continue
+            job.connection.send(event='exit', returncode=returncode)
+            logger.info('Job %d finished with status %s', job.id, returncode)
+
+    def _refresh(self):
+        try:
+            self._fork_server.refresh()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Cannot refresh the daemon state')
+
+    def _run(self, job):
+        (stdin_r, stdin_w) = os.pipe()
+        (output_r, output_w) = os.pipe()
+        logger.info('Starting job %d: %s', job.id, job.args)
+        try:
+            pid = self._fork_server.fork(job.args, job.cwd, stdin_r, output_w)
+        except BaseException:
+            os.close(stdin_w)
+            os.close(output_r)
+            raise
+        finally:
+            os.close(stdin_r)
+            os.close(output_w)
+        with self._lock:
+            job.pid = pid
+            job.stdin = stdin_w
+            cancelling = job.state == 'cancelling'
+        if cancelling:
+            self._interrupt(job)
+        job.connection.send(event='started', job=job.id)
+        decoder = codecs.getincrementaldecoder('UTF-8')(errors='replace')
+        with open(output_r, 'rb', buffering=0) as output:
+            while True:
+                data = output.read(1 << 16)
+                if not data:
+                    break
+                job.connection.send(event='output', data=decoder.decode(data))
+        return self._fork_server.wait()
+
+def _connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError as exc:
+        sock.close()
+        raise Error(f'cannot connect to the daemon: {path}: {exc.strerror}') from exc
+    return Connection(sock)
+
+def _forward_input(connection, stdin):
+    for line in stdin:
+        connection.send(command='input', data=line)
+    connection.send(command='eof')
+
+def submit(path, args, cwd, stdin=None, stdout=None, stderr=None):
+    '''
+    submit a job to the daemon, and stream its output;
+    return the job's exit status (None if it was cancelled before starting)
+
+    Interrupting the client with SIGINT cancels the job.
+    '''
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    connection = _connect(path)
+    try:
+        connection.send(command='submit', args=args, cwd=cwd)
+        while True:
+            try:
+                event = connection.receive()
+            except KeyboardInterrupt:
+                connection.send(command='cancel')
+                continue
+            if event is None:
+                raise Error('connection to the daemon was lost')
+            kind = event['event']
+            if kind == 'queued':
+                if event['position']:
+                    print(f'Job {event["job"]} queued after {event["position"]} other job(s)', file=stderr)
+            elif kind == 'started':
+                thread = threading.Thread(target=_forward_input, args=(connection, stdin), daemon=True)
+                thread.start()
+            elif kind == 'output':
+                stdout.write(event['data'])
+                stdout.flush()
+            elif kind == 'exit':
+                return event['returncode']
+            elif kind == 'error':
+                raise Error(event['message'])
+    finally:
+        connection.close()
+
+def cancel(path, job_id):
+    connection = _connect(path)
+    try:
+        connection.send(command='cancel', job=job_id)
+        event = connection.receive()
+        if event is not None and event['event'] == 'error':
+            raise Error(event['message'])
+    finally:
+        connection.close()
+
+def list_jobs(path):
+    '''
+    return list of dicts describing the queued and running jobs
+    '''
+    connection = _connect(path)
+    try:
+        connection.send(command='list')
+        event = connection.receive()
+        if event is None:
+            return []
+        return event['jobs']
+    finally:
+        connection.close()
+
+def strip_client_args(args):
+    '''
+    remove options that are meaningful only for the client
+    '''
+    result = []
+    args = iter(args)
+    for arg in args:
+        if arg == '--submit':
+            continue
+        if arg == '--socket':
+            next(args, None)
+            continue
+        if arg.startswith('--socket='):
+            continue
+        result += [arg]
+    return result
+
+__all__ = [
+    'Daemon',
+    'Error',
+    'cancel',
+    'get_default_socket_path',
+    'list_jobs',
+    'strip_client_args',
+    'submit',
+]
+
+# vim:ts=4 sts=4 sw=4 et
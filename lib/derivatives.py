@@ -0,0 +1,117 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+downsampled derivatives (previews, thumbnails) of scanned pages
+'''
+
+import os
+import re
+
+from . import durability
+from . import utils
+
+try:
+    import PIL.Image
+except ImportError as ex:
+    utils.enhance_import_error(ex, 'Pillow', 'python3-pil', 'https://pypi.org/project/Pillow/')
+    raise
+
+file_extension = 'jpg'
+
+class Spec:
+
+    '''
+    derivative specification: NAME=<N>dpi or NAME=<N>px
+
+    <N>px is the length of the longer side, in pixels.
+    '''
+
+    def __init__(self, s):
+        match = re.match(r'\A([a-zA-Z0-9_-]+)=([1-9][0-9]*)(dpi|px)\Z', s)
+        if match is None:
+            raise ValueError(s)
+        self.name = match.group(1)
+        self.size = int(match.group(2))
+        self.unit = match.group(3)
+
+    def __str__(self):
+        return f'{self.name}={self.size}{self.unit}'
+
+    def get_size(self, image_size, dpi=None):
+        '''
+        return size of the derivative of an image of the given size;
+        images are never enlarged
+        '''
+        if self.unit == 'dpi':
+            if dpi is None:
+                raise ValueError(f'{self.name}: image resolution is unknown')
+            scale = self.size / dpi
+        else:
+            scale = self.size / max(image_size)
+        if scale >= 1:
+            return image_size
+        return tuple(max(1, round(n * scale)) for n in image_size)
+
+Spec.__name__ = 'NAME=SIZE'
+
+def get_filename(image_filename, name):
+    root = os.path.splitext(image_filename)[0]
+    return f'{root}.{name}.{file_extension}'
+
+def generate(image, image_filename, specs, dpi=None, fsync=False):
+    '''
+    create derivatives of the (already decoded) image;
+    return list of dicts describing them
+
+    The largest derivative is made from the image, and each smaller one
+    from the previous one. The bulk of downsampling is done with the cheap
+    integer box reduction; only the remainder is properly resampled.
+    '''
+    (width, _) = image.size
+    sized_specs = [(spec.get_size(image.size, dpi), spec) for spec in specs]
+    sized_specs.sort(key=lambda item: item[0], reverse=True)
+    image = utils.to_8bit(image)
+    if image.mode not in {'L', 'RGB'}:
+        image = image.convert('L' if image.mode == '1' else 'RGB')
+    kwargs = {}
+    result = {}
+    for size, spec in sized_specs:
+        factor = min(image.width // size[0], image.height // size[1])
+        if factor > 1:
+            image = image.reduce(factor)
+        if image.size != size:
+            image = image.resize(size, PIL.Image.Resampling.LANCZOS)
+        if dpi:
+            kwargs.update(dpi=(round(dpi * size[0] / width),) * 2)
+        filename = get_filename(image_filename, spec.name)
+        with durability.atomic_write(filename, fsync=fsync) as file:
+            image.save(file, 'JPEG', **kwargs)
+        result[spec.name] = dict(
+            name=spec.name,
+            filename=filename,
+            width=size[0],
+            height=size[1],
+        )
+    return [result[spec.name] for spec in specs]
+
+__all__ = [
+    'Spec',
+    'file_extension',
+    'generate',
+    'get_filename',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,149 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+atomic and durable file output
+'''
+
+import contextlib
+import os
+import tempfile
+
+policies = ('none', 'per-page', 'per-batch')
+
+def fsync_path(path):
+    flags = os.O_RDONLY
+    if os.path.isdir(path):
+        flags |= os.O_DIRECTORY
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def fsync_directory(path):
+    fsync_path(os.path.dirname(path) or os.curdir)
+
+@contextlib.contextmanager
+def atomic_write(path, fsync=False):
+    '''
+    open a temporary file for writing (in binary mode), and rename it to path
+    when the block exits successfully
+
+    If fsync is true, the file contents are flushed to the disk before
+    renaming, and the directory afterwards.
+    '''
+    directory, basename = os.path.split(path)
+    file = tempfile.NamedTemporaryFile(  # pylint: disable=consider-using-with
+        dir=(directory or os.curdir),
+        prefix=f'.{basename}.',
+        suffix='.tmp',
+        delete=False,
+    )
+    try:
+        with file:
+            yield file
+            file.flush()
+            if fsync:
+                os.fsync(file.fileno())
+        os.chmod(file.name, 0o666 & ~umask)
+        os.replace(file.name, path)
+    except BaseException:
+        os.unlink(file.name)
+        raise
+    if fsync:
+        fsync_directory(path)
+
+def _get_umask():
+    # Linux >= 4.7 exposes the umask without changing it, which is safe
+    # even when other threads are creating files:
+    try:
+        with open('/proc/self/status', 'rt', encoding='ASCII') as file:
+            for line in file:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    # Otherwise, fall back to setting it temporarily;
+    # this module is imported at startup, before any threads are started.
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+umask = _get_umask()
+
+class Syncer:
+
+    '''
+    durability policy:
+
+    none
+        don't fsync() anything;
+    per-page
+        fsync() files as soon as they are complete;
+    per-batch
+        fsync() all the files at the end of the batch,
+        followed by a single fsync() of each affected directory.
+    '''
+
+    def __init__(self, policy):
+        if policy not in policies:
+            raise ValueError(f'unknown durability policy: {policy!r}')
+        self.policy = policy
+        self._pending = {}
+
+    @property
+    def sync_on_write(self):
+        '''
+        whether atomic_write() should sync
+        '''
+        return self.policy == 'per-page'
+
+    def add(self, path, synced=False):
+        '''
+        register a complete file
+
+        synced should be true if the file was already written with
+        atomic_write(..., fsync=self.sync_on_write).
+        '''
+        if self.policy == 'per-page':
+            if not synced:
+                fsync_path(path)
+                fsync_directory(path)
+        elif self.policy == 'per-batch':
+            self._pending[path] = None
+
+    def flush(self):
+        '''
+        end of batch
+        '''
+        pending = self._pending
+        self._pending = {}
+        directories = set()
+        for path in pending:
+            fsync_path(path)
+            directories.add(os.path.dirname(path) or os.curdir)
+        for directory in sorted(directories):
+            fsync_path(directory)
+
+__all__ = [
+    'Syncer',
+    'atomic_write',
+    'fsync_directory',
+    'fsync_path',
+    'policies',
+]
+
+# vim:ts=4 sts=4 sw=4 et
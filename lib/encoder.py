@@ -0,0 +1,200 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''parallel encoding of captured pages'''
+
+import concurrent.futures
+import importlib
+import os
+
+from . import derivatives
+from . import durability
+from . import utils
+
+try:
+    import PIL.features
+    import PIL.Image
+except ImportError as ex:
+    utils.enhance_import_error(ex, 'Pillow', 'python3-pil', 'https://pypi.org/project/Pillow/')
+    raise
+
+# output format: Pillow format
+formats = dict(
+    pnm='PPM',
+    tiff='TIFF',
+    png='PNG',
+    jpeg='JPEG',
+    webp='WEBP',
+)
+
+# formats that scanimage cannot write:
+encoded_formats = ('jpeg', 'webp')
+
+subsamplings = ('4:4:4', '4:2:2', '4:2:0')
+
+# format in which scanimage captures pages that are then encoded:
+capture_format = 'pnm'
+
+class Error(RuntimeError):
+    pass
+
+def is_available(format_):
+    if format_ == 'webp':
+        return PIL.features.check('webp')
+    return format_ in formats
+
+def import_analysis():
+    # NumPy is needed only for analysis, so import it only on demand.
+    return importlib.import_module('.analysis', __package__)
+
+class Page:
+
+    '''
+    post-processed page
+
+    properties: extra XMP parameters
+    blank: whether the page was detected as blank;
+    blank pages are either deleted or stored in blank_directory
+    items: if the page was split into separate items, list of Page objects
+    for them, stored under temporary names (see get_item_filename())
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.properties = {}
+        self.blank = False
+        self.items = None
+
+def get_item_filename(target, i):
+    (root, ext) = os.path.splitext(target)
+    return f'{root}.item{i}{ext}'
+
+def save(image, file, format_, dpi=None, quality=None, subsampling=None):
+    kwargs = {}
+    if format_ in encoded_formats:
+        image = utils.to_8bit(image)
+        if image.mode not in {'L', 'RGB'}:
+            image = image.convert('L' if image.mode == '1' else 'RGB')
+        if quality is not None:
+            kwargs.update(quality=quality)
+        if format_ == 'jpeg' and subsampling is not None:
+            kwargs.update(subsampling=subsampling)
+    elif format_ == 'tiff' and image.mode == '1':
+        kwargs.update(compression='group4')
+    if dpi:
+        kwargs.update(dpi=(dpi, dpi))
+    image.save(file, formats[format_], **kwargs)
+
+def encode(source, target, format_, auto_mode=False, blank_threshold=None, blank_directory=None, derivative_specs=(),
+        split_items=False, deskew=False, fsync=False, **kwargs):
+    '''
+    encode the source image into the target file, and remove the source;
+    return Page
+
+    If blank_threshold is not None, blank pages are detected;
+    they are deleted, or, if blank_directory is not None, stored there.
+    If split_items is true, separate items found on the page (optionally
+    deskewed) are stored as separate images.
+    Derivatives (see derivatives.Spec) of non-blank pages are created
+    from the same decoded image.
+    '''
+    page = Page(target)
+    try:
+        with PIL.Image.open(source) as image:
+            if blank_threshold is not None:
+                page.blank = import_analysis().is_blank(image, blank_threshold)
+            if page.blank:
+                if blank_directory is None:
+                    os.unlink(source)
+                    return page
+                target = page.filename = os.path.join(blank_directory, target)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                derivative_specs = ()
+            (items, images) = ([page], [image])
+            if split_items and not page.blank:
+                images = import_analysis().split_items(image, deskew=deskew)
+                items = page.items = [Page(get_item_filename(target, i)) for i in range(len(images))]
+            for item, item_image in zip(items, images):
+                encode_image(item, item_image, format_, auto_mode, derivative_specs, fsync, **kwargs)
+    except (OSError, ValueError) as exc:
+        raise Error(f'{source}: {exc}') from exc
+    # Preserve the time of the scan:
+    stat = os.stat(source)
+    for item in items:
+        os.utime(item.filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.unlink(source)
+    return page
+
+def encode_image(page, image, format_, auto_mode, derivative_specs, fsync, **kwargs):
+    if auto_mode:
+        analysis = import_analysis()
+        color_mode = analysis.classify(image)
+        image = analysis.convert(image, color_mode)
+        page.properties.update(color_mode=color_mode)
+    with durability.atomic_write(page.filename, fsync=fsync) as file:
+        save(image, file, format_, **kwargs)
+    if derivative_specs:
+        page.properties.update(derivatives=derivatives.generate(
+            image, page.filename, derivative_specs, dpi=kwargs.get('dpi'), fsync=fsync,
+        ))
+
+class Encoder:
+
+    '''
+    encode captured pages in a pool of worker threads
+
+    (Pillow and NumPy release the GIL while processing images,
+    so threads are enough.)
+    Callers should wait for the results when max_backlog pages are being encoded.
+    '''
+
+    def __init__(self, format_, jobs=None, **settings):
+        if format_ not in formats:
+            raise ValueError(f'unknown output format: {format_!r}')
+        self.format = format_
+        self.settings = settings
+        self.jobs = jobs or os.cpu_count() or 1
+        self.max_backlog = 2 * self.jobs
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.jobs, thread_name_prefix='scanhelper.encoder')
+
+    def start(self, source, target):
+        '''
+        start encoding the page; return concurrent.futures.Future for the Page
+        '''
+        return self._executor.submit(encode, source, target, self.format, **self.settings)
+
+    def close(self):
+        '''
+        wait for the pending jobs
+        '''
+        self._executor.shutdown(wait=True)
+
+__all__ = [
+    'Encoder',
+    'Error',
+    'Page',
+    'capture_format',
+    'encode',
+    'encode_image',
+    'encoded_formats',
+    'formats',
+    'get_item_filename',
+    'import_analysis',
+    'is_available',
+    'save',
+    'subsamplings',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,183 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+asyncio plumbing for the scan loop
+
+Reading scanimage's output, waiting for the operator (console or scanner
+button), post-processing and signal handling all run in a single event
+loop, so that waiting and I/O overlap.
+'''
+
+import asyncio
+import codecs
+import io
+import locale
+import os
+import signal
+import sys
+
+class LineReader:
+
+    '''
+    asynchronous line reader for a file descriptor (e.g. pty or terminal)
+
+    Line endings are translated to '\\n'.
+    '''
+
+    def __init__(self, fd, encoding=None):
+        self.fd = fd
+        encoding = encoding or locale.getpreferredencoding(False)
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._decoder = io.IncrementalNewlineDecoder(decoder, translate=True)
+        self._buffer = ''
+        self._eof = False
+
+    def _read(self):
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return
+        except OSError:
+            # EIO: all the slave ends of the pty were closed
+            data = b''
+        self._buffer += self._decoder.decode(data, final=not data)
+        self._eof = not data
+
+    async def readline(self):
+        '''
+        return the next line (including the line ending), or '' at EOF
+        '''
+        loop = asyncio.get_event_loop()
+        while '\n' not in self._buffer and not self._eof:
+            readable = loop.create_future()
+            try:
+                loop.add_reader(self.fd, readable.set_result, None)
+            except PermissionError:
+                # regular files (and /dev/null) cannot be polled,
+                # but reading them doesn't block
+                self._read()
+                continue
+            try:
+                await readable
+            finally:
+                loop.remove_reader(self.fd)
+            self._read()
+        (line, newline, self._buffer) = self._buffer.partition('\n')
+        return line + newline
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line
+
+_console_readers = {}
+
+async def read_line(file):
+    '''
+    read a line from the (console) file without blocking the event loop;
+    raise EOFError at EOF
+    '''
+    try:
+        fd = file.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        # not a real file (e.g. StringIO)
+        line = file.readline()
+    else:
+        reader = _console_readers.get(fd)
+        if reader is None:
+            reader = _console_readers[fd] = LineReader(fd, file.encoding)
+        line = await reader.readline()
+    if not line:
+        raise EOFError
+    return line
+
+async def run_in_executor(func, *args):
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, func, *args)
+
+def iterate(agen):
+    '''
+    iterate over the asynchronous generator in a private event loop
+
+    If the iteration is interrupted (e.g. by KeyboardInterrupt), the
+    generator is cancelled, so that it can clean up.
+    '''
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            step = asyncio.ensure_future(agen.__anext__(), loop=loop)  # pylint: disable=unnecessary-dunder-call
+            try:
+                item = loop.run_until_complete(step)
+            except StopAsyncIteration:
+                return
+            except BaseException:
+                if not step.done():
+                    step.cancel()
+                    try:
+                        loop.run_until_complete(step)
+                    except (asyncio.CancelledError, StopAsyncIteration):
+                        pass
+                raise
+            yield item
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
+
+def run(coro):
+    '''
+    run the coroutine in a new event loop;
+    on SIGINT, cancel it, and then raise KeyboardInterrupt
+    '''
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(coro)
+    interrupted = []
+    def interrupt():
+        interrupted.append(True)
+        task.cancel()
+    loop.add_signal_handler(signal.SIGINT, interrupt)
+    try:
+        return loop.run_until_complete(task)
+    except asyncio.CancelledError:
+        if interrupted:
+            raise KeyboardInterrupt from None
+        raise
+    finally:
+        loop.remove_signal_handler(signal.SIGINT)
+        loop.close()
+
+def reraise_sigint():
+    '''
+    terminate the process with SIGINT, so that the caller knows about the interruption
+    '''
+    for file in sys.stdout, sys.stderr:
+        file.flush()
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    os.kill(os.getpid(), signal.SIGINT)
+
+__all__ = [
+    'LineReader',
+    'iterate',
+    'read_line',
+    'reraise_sigint',
+    'run',
+    'run_in_executor',
+]
+
+# vim:ts=4 sts=4 sw=4 et
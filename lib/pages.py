@@ -0,0 +1,287 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''handling of scanned pages'''
+
+import errno
+import logging
+import os
+import re
+
+from . import checksum
+from . import derivatives
+from . import durability
+from . import encoder
+from . import pdf
+from . import template
+from . import tiff
+from . import xmp
+
+logger = logging.getLogger('scanhelper.main')
+
+file_extensions = dict(
+    pnm='pnm',
+    tiff='tif',
+    png='png',
+    jpeg='jpg',
+    webp='webp',
+)
+
+image_extensions = frozenset([
+    '.jpeg',
+    '.jpg',
+    '.png',
+    '.pnm',
+    '.tif',
+    '.tiff',
+    '.webp',
+])
+
+def is_image(name):
+    '''
+    whether the file name looks like a complete image
+    (rather than e.g. a sidecar or a hidden temporary file)
+    '''
+    if name.startswith('.'):
+        return False
+    return os.path.splitext(name)[1].lower() in image_extensions
+
+media_types = dict(
+    pnm='image/x-portable-anymap',
+    tiff='image/tiff',
+    png='image/png',
+    jpeg='image/jpeg',
+    webp='image/webp',
+)
+
+# --document writers, by the file extension:
+document_writers = {
+    '.pdf': pdf.Writer,
+    '.tif': tiff.Writer,
+    '.tiff': tiff.Writer,
+}
+
+# subdirectory of the target directory for blank pages:
+blank_directory = 'blank'
+
+def uses_encoder(options):
+    '''
+    whether pages are captured in an intermediate format, and then encoded by scanhelper
+    '''
+    return (
+        options.output_format in encoder.encoded_formats or
+        options.auto_mode or
+        options.blank_pages != 'keep' or
+        options.split_items or
+        bool(options.derivatives)
+    )
+
+def get_capture_format(options):
+    if uses_encoder(options):
+        return encoder.capture_format
+    return options.output_format
+
+def get_capture_template(options):
+    '''
+    return filename template for files created by scanimage
+    '''
+    if uses_encoder(options):
+        return f'{options.filename_template}.{encoder.capture_format}'
+    return options.filename_template
+
+def get_page_filename(template_string, n):
+    return template.parse(template_string).format(n)
+
+def get_resolution(options):
+    '''
+    return resolution requested with the backend's --resolution option, or None
+    '''
+    resolution = None
+    args = iter(options.extra_args)
+    for arg in args:
+        if arg == '--resolution':
+            value = next(args, '')
+        elif arg.startswith('--resolution='):
+            value = arg.split('=', 1)[1]
+        else:
+            continue
+        match = re.match('[0-9]+', value)
+        if match:
+            resolution = int(match.group())
+    return resolution
+
+def get_xmp_override(options, properties=None):
+    override = dict(
+        media_type=media_types[options.output_format],
+    )
+    override.update(properties or {})
+    override.update(options.override_xmp)
+    return override
+
+def get_xmp_fsync(options):
+    '''
+    whether XMP metadata written in a scanning session should be fsync()-ed right away
+
+    (Staged files are synced by the mover, and images with embedded XMP
+    by the syncer when they are finished.)
+    '''
+    return options.mover is None and options.syncer.sync_on_write and not options.embed_xmp
+
+def write_xmp(options, device, image_filename, override, fsync):
+    '''
+    create sidecar for the image (or, with --embed-xmp, embed XMP metadata into it);
+    return XMP parameters
+
+    Tags found in the image itself (see xmp.read_tags()) are used,
+    unless they are overridden by override or --override-xmp.
+    '''
+    override = {**xmp.read_tags(image_filename), **override, **options.override_xmp}
+    if options.embed_xmp:
+        (xmp_data, parameters) = xmp.render(image_filename, device, override)
+        xmp.embed(image_filename, xmp_data, fsync=fsync)
+        return parameters
+    xmp_filename = image_filename + '.xmp'
+    with durability.atomic_write(xmp_filename, fsync=fsync) as xmp_file:
+        return xmp.write(
+            xmp_file=xmp_file,
+            image_filename=image_filename,
+            device=device,
+            override=override
+        )
+
+def finish_file(options, filename, synced=False, digest=None):
+    '''
+    hand the finished file over to the archive, the mover or the syncer,
+    and to the checksum manifest
+
+    digest is the SHA-256 digest of the file, if it's already known.
+    '''
+    manifest = options.manifest
+    if options.archive is not None:
+        digest = options.archive.add(filename)
+        options.syncer.add(options.archive.path)
+        options.syncer.add(options.archive.index_path)
+        if manifest is not None:
+            manifest.record(filename, digest)
+        return
+    if options.mover is not None:
+        callback = None
+        if manifest is not None:
+            callback = manifest.record
+        options.mover.submit(filename, callback)
+        return
+    options.syncer.add(filename, synced=synced)
+    if manifest is None:
+        return
+    if digest is None:
+        manifest.add(filename)
+    else:
+        manifest.record(filename, digest)
+
+def finish_blank_page(options, page):
+    '''
+    finish a page that was detected as blank
+
+    Blank pages don't get sidecars, and they are not added to the catalog or the document.
+    '''
+    if options.blank_pages == 'delete':
+        logger.info('Deleted blank page %s', page.filename)
+        return
+    logger.info('Moved blank page to %s', page.filename)
+    finish_file(options, page.filename)
+
+def _move(source, target):
+    '''
+    rename the file, refusing to overwrite an existing target
+    '''
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        raise
+    except OSError:
+        # hard links are not supported on this file system
+        if os.path.lexists(target):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), source, None, target) from None
+        os.rename(source, target)
+    else:
+        os.unlink(source)
+
+def rename_item(page, filename):
+    '''
+    move item of a split page (and its derivatives) from its temporary name
+
+    Existing files are never overwritten: FileExistsError is raised instead.
+    '''
+    _move(page.filename, filename)
+    page.filename = filename
+    for derivative in page.properties.get('derivatives', ()):
+        derivative_filename = derivatives.get_filename(filename, derivative['name'])
+        _move(derivative['filename'], derivative_filename)
+        derivative['filename'] = derivative_filename
+
+def complete_pages(options, device, pages):
+    '''
+    regenerate missing sidecars for existing pages
+
+    Return the list of files that are missing from the checksum manifest.
+    '''
+    filenames = []
+    regenerated = set()
+    for n in sorted(pages):
+        image_filename = pages[n]
+        if not os.path.exists(image_filename):
+            # already archived, together with its sidecar
+            continue
+        filenames += [image_filename]
+        if options.xmp and not options.embed_xmp:
+            xmp_filename = image_filename + '.xmp'
+            if not os.path.exists(xmp_filename):
+                logger.info('Regenerating missing %s', xmp_filename)
+                write_xmp(options, device, image_filename, get_xmp_override(options), fsync=get_xmp_fsync(options))
+                regenerated.add(xmp_filename)
+            filenames += [xmp_filename]
+    if not options.checksums:
+        return []
+    in_manifest = set()
+    if os.path.exists(checksum.manifest_name):
+        entries = list(checksum.read_manifest(checksum.manifest_name))
+        valid_entries = [(f, d) for (f, d) in entries if f not in regenerated]
+        if len(valid_entries) < len(entries):
+            checksum.rewrite_manifest(checksum.manifest_name, valid_entries)
+        in_manifest = {f for (f, d) in valid_entries}
+    return [f for f in filenames if f not in in_manifest]
+
+__all__ = [
+    'blank_directory',
+    'complete_pages',
+    'document_writers',
+    'finish_blank_page',
+    'file_extensions',
+    'finish_file',
+    'get_capture_format',
+    'get_capture_template',
+    'get_page_filename',
+    'get_resolution',
+    'get_xmp_fsync',
+    'get_xmp_override',
+    'image_extensions',
+    'is_image',
+    'media_types',
+    'rename_item',
+    'uses_encoder',
+    'write_xmp',
+]
+
+# vim:ts=4 sts=4 sw=4 et
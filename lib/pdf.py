@@ -0,0 +1,468 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''incremental PDF writer'''
+
+import array
+import logging
+import os
+import re
+import zlib
+
+from . import png
+from . import pnm
+from . import tiff
+from . import utils
+
+try:
+    import PIL.Image
+except ImportError as ex:
+    utils.enhance_import_error(ex, 'Pillow', 'python3-pil', 'https://pypi.org/project/Pillow/')
+    raise
+
+block_size = 1 << 20
+
+logger = logging.getLogger('scanhelper.main')
+
+class Error(ValueError):
+    pass
+
+def _format_number(x):
+    return f'{x:.4f}'.rstrip('0').rstrip('.')
+
+def _read_blocks(file, size=None):
+    while size is None or size > 0:
+        block = file.read(block_size if size is None else min(size, block_size))
+        if not block:
+            if size:
+                raise Error('truncated image file')
+            return
+        if size is not None:
+            size -= len(block)
+        yield block
+
+def _deflate(blocks):
+    compressor = zlib.compressobj()
+    for block in blocks:
+        yield compressor.compress(block)
+    yield compressor.flush()
+
+class Image:
+
+    '''
+    image XObject to be embedded: its dictionary and stream data
+    '''
+
+    def __init__(self, width, height, colorspace, bits, data, filter_='FlateDecode', dpi=None):
+        self.width = width
+        self.height = height
+        self.dictionary = (
+            f'/Type /XObject /Subtype /Image /Width {width} /Height {height} '
+            f'/ColorSpace {colorspace} /BitsPerComponent {bits} /Filter /{filter_}'
+        )
+        self.data = data
+        self.dpi = dpi
+
+def _read_png(file):
+    (header, data) = png.read(file)
+    if header.interlace or header.color_type not in {0, 2, 3}:
+        # alpha channels and interlacing cannot be passed through
+        return None
+    if header.color_type == 3:
+        if header.palette is None:
+            raise png.Error('missing PLTE chunk in PNG file')
+        colorspace = f'[/Indexed /DeviceRGB {len(header.palette) // 3 - 1} <{header.palette.hex()}>]'
+    else:
+        colorspace = '/DeviceGray' if header.color_type == 0 else '/DeviceRGB'
+    image = Image(header.width, header.height, colorspace, header.bit_depth, data, dpi=header.dpi)
+    image.dictionary += (
+        f' /DecodeParms << /Predictor 15 /Colors {header.channels}'
+        f' /BitsPerComponent {header.bit_depth} /Columns {header.width} >>'
+    )
+    return image
+
+def _read_jpeg(file):
+    with PIL.Image.open(file) as pil_image:
+        # Only the header is parsed here.
+        mode = pil_image.mode
+        (width, height) = pil_image.size
+        dpi = pil_image.info.get('dpi')
+    colorspace = dict(L='/DeviceGray', RGB='/DeviceRGB').get(mode)
+    if colorspace is None:
+        return None
+    file.seek(0)
+    if dpi:
+        dpi = round(max(dpi))
+    return Image(width, height, colorspace, 8, _read_blocks(file), filter_='DCTDecode', dpi=dpi)
+
+def _read_pnm(file):
+    header = pnm.read_header(file)
+    colorspace = '/DeviceGray' if header.channels == 1 else '/DeviceRGB'
+    image = Image(header.width, header.height, colorspace, header.bit_depth,
+        _deflate(_read_blocks(file, header.data_size))
+    )
+    if header.magic == b'P4':
+        # 1 means black
+        image.dictionary += ' /Decode [1 0]'
+    elif header.maxval != (1 << header.bit_depth) - 1:
+        scale = _format_number(((1 << header.bit_depth) - 1) / header.maxval)
+        image.dictionary += ' /Decode [' + ' '.join([f'0 {scale}'] * header.channels) + ']'
+    return image
+
+def _read_tiff(file):
+    ifd = next(tiff.read_ifds(file), None)
+    if ifd is None or tiff.Tag.STRIP_OFFSETS not in ifd:
+        return None
+    get = ifd.get
+    bits = get(tiff.Tag.BITS_PER_SAMPLE, (1,))
+    photometric = get(tiff.Tag.PHOTOMETRIC, (None,))[0]
+    supported = [
+        # uncompressed:
+        get(tiff.Tag.COMPRESSION, (1,))[0] == 1,
+        # chunky, most significant bit first:
+        get(tiff.Tag.PLANAR_CONFIGURATION, (1,))[0] == 1,
+        get(tiff.Tag.FILL_ORDER, (1,))[0] == 1,
+        # grayscale or RGB, without extra samples:
+        photometric in {0, 1, 2},
+        len(bits) == (3 if photometric == 2 else 1),
+        bits[0] in {1, 8, 16},
+    ]
+    if not all(supported):
+        return None
+    dpi = None
+    (x_resolution,) = get(tiff.Tag.X_RESOLUTION, ((0, 1),))
+    if x_resolution[0] and x_resolution[1]:
+        dpi = x_resolution[0] / x_resolution[1]
+        if get(tiff.Tag.RESOLUTION_UNIT, (2,))[0] == 3:
+            dpi *= 2.54
+        dpi = round(dpi)
+    def data():
+        for offset, size in zip(ifd[tiff.Tag.STRIP_OFFSETS], ifd[tiff.Tag.STRIP_BYTE_COUNTS]):
+            file.seek(offset)
+            yield from _read_blocks(file, size)
+    blocks = data()
+    if bits[0] == 16 and ifd.byte_order == '<':
+        # PDF samples are big-endian.
+        blocks = _byteswap16(blocks)
+    colorspace = '/DeviceRGB' if photometric == 2 else '/DeviceGray'
+    image = Image(
+        ifd[tiff.Tag.IMAGE_WIDTH][0], ifd[tiff.Tag.IMAGE_LENGTH][0], colorspace, bits[0],
+        _deflate(blocks), dpi=dpi
+    )
+    if photometric == 0:
+        # white is zero
+        image.dictionary += ' /Decode [1 0]'
+    return image
+
+def _byteswap16(blocks):
+    carry = b''
+    for block in blocks:
+        block = carry + block
+        n = len(block) & ~1
+        carry = block[n:]
+        samples = array.array('H', block[:n])
+        samples.byteswap()
+        yield samples.tobytes()
+
+def _decode_image(filename):
+    with PIL.Image.open(filename) as pil_image:
+        pil_image = utils.to_8bit(pil_image)
+        if pil_image.mode not in {'1', 'L', 'RGB'}:
+            pil_image = pil_image.convert('RGB')
+        (width, height) = pil_image.size
+        dpi = pil_image.info.get('dpi')
+        bits = 1 if pil_image.mode == '1' else 8
+        colorspace = '/DeviceRGB' if pil_image.mode == 'RGB' else '/DeviceGray'
+        data = pil_image.tobytes()
+    if dpi:
+        dpi = round(max(dpi))
+    return Image(width, height, colorspace, bits, _deflate([data]), dpi=dpi)
+
+_readers = [
+    (png.signature, _read_png),
+    (b'\xFF\xD8', _read_jpeg),
+    (b'P4', _read_pnm),
+    (b'P5', _read_pnm),
+    (b'P6', _read_pnm),
+] + [
+    (signature, _read_tiff) for signature in tiff.signatures
+]
+
+def read_image(file, filename):
+    '''
+    return Image for the file;
+    embed the compressed data as is if possible, decode the image otherwise
+    '''
+    magic = file.read(len(png.signature))
+    file.seek(0)
+    for signature, reader in _readers:
+        if magic.startswith(signature):
+            image = reader(file)
+            if image is not None:
+                return image
+            break
+    return _decode_image(filename)
+
+class _Node:
+
+    '''
+    intermediate page tree node
+    '''
+
+    def __init__(self, id_, parent_id, kids=(), count=0):
+        self.id = id_
+        self.parent_id = parent_id
+        self.kids = list(kids)
+        self.count = count
+
+    def __str__(self):
+        kids = ' '.join(f'{n} 0 R' for n in self.kids)
+        parent = '' if self.parent_id is None else f' /Parent {self.parent_id} 0 R'
+        return f'<< /Type /Pages /Kids [{kids}] /Count {self.count}{parent} >>'
+
+class Writer:
+
+    '''
+    PDF file, to which pages are appended as they are complete
+
+    Every flush() appends an incremental update (a new page tree and
+    cross-reference section), so the file is valid after each flush.
+    Image data is streamed to the file, so memory use doesn't depend on
+    the image size.
+
+    The page size is derived from the image resolution; resolution is used
+    for images that don't specify theirs (e.g. PNM).
+    '''
+
+    catalog_id = 1
+    pages_id = 2
+
+    # The page tree has fixed depth: the root has branches, branches have
+    # leaves, and leaves have pages. Only the last branch and the last leaf
+    # can get more kids, so every update rewrites at most three nodes
+    # of at most this many kids:
+    fanout = 512
+
+    def __init__(self, path, resolution=None):
+        self.path = path
+        self.resolution = resolution
+        self._nodes = None
+        self._offsets = {}
+        self._prev_xref = None
+        if os.path.exists(path):
+            self._file = open(path, 'r+b')  # pylint: disable=consider-using-with
+            self._load()
+        else:
+            self._file = open(path, 'w+b')  # pylint: disable=consider-using-with
+            self._file.write(b'%PDF-1.5\n%\xE2\xE3\xCF\xD3\n')
+            self._size = 3
+            self._write_object(self.catalog_id, f'<< /Type /Catalog /Pages {self.pages_id} 0 R >>')
+            branch_id = self._allocate()
+            leaf_id = self._allocate()
+            # leaf, branch, root:
+            self._nodes = [
+                _Node(leaf_id, branch_id),
+                _Node(branch_id, self.pages_id, [leaf_id]),
+                _Node(self.pages_id, None, [branch_id]),
+            ]
+            self.flush()
+
+    @property
+    def n_pages(self):
+        return self._nodes[-1].count
+
+    def _load(self):
+        file = self._file
+        file.seek(0, os.SEEK_END)
+        end = file.tell()
+        # Find the last complete update;
+        # anything after it is a leftover of an interrupted session.
+        tail = b''
+        while True:
+            start = max(0, end - block_size)
+            file.seek(start)
+            tail = file.read(end - start) + tail
+            match = None
+            for match in re.finditer(rb'trailer\s*<<(.*?)>>\s*startxref\s+(\d+)\s+%%EOF\r?\n?', tail, re.DOTALL):
+                pass
+            if match is not None:
+                break
+            if start == 0:
+                raise Error(f'{self.path}: not a valid PDF file')
+            end = start
+        (trailer, xref_offset) = match.groups()
+        file.truncate(start + match.end())
+        self._prev_xref = int(xref_offset)
+        match = re.search(rb'/Size\s+(\d+)', trailer)
+        if match is None:
+            raise Error(f'{self.path}: missing /Size in trailer')
+        self._size = int(match.group(1))
+        # Every update rewrites the last branch and leaf, so they are in the last cross-reference section.
+        self._nodes = []
+        (node_id, parent_id) = (self.pages_id, None)
+        for _ in range(3):
+            node = self._read_node(node_id, parent_id)
+            self._nodes[:0] = [node]
+            if not node.kids:
+                break
+            (node_id, parent_id) = (node.kids[-1], node.id)
+        if len(self._nodes) != 3:
+            raise Error(f'{self.path}: unsupported page tree')
+        file.seek(0, os.SEEK_END)
+
+    def _read_node(self, node_id, parent_id):
+        file = self._file
+        file.seek(self._read_xref(self._prev_xref, node_id))
+        data = b''
+        while b'endobj' not in data:
+            block = file.read(block_size)
+            if not block:
+                raise Error(f'{self.path}: truncated page tree')
+            data += block
+        data = data[:data.index(b'endobj')]
+        kids = re.search(rb'/Kids\s*\[(.*?)\]', data, re.DOTALL)
+        count = re.search(rb'/Count\s+(\d+)', data)
+        if kids is None or count is None:
+            raise Error(f'{self.path}: page tree not found')
+        kids = [int(n) for n in re.findall(rb'(\d+)\s+0\s+R', kids.group(1))]
+        return _Node(node_id, parent_id, kids, int(count.group(1)))
+
+    def _read_xref(self, offset, object_id):
+        file = self._file
+        file.seek(offset)
+        if file.readline().strip() != b'xref':
+            raise Error(f'{self.path}: cross-reference table not found')
+        while True:
+            line = file.readline().split()
+            if line[:1] == [b'trailer'] or len(line) != 2:
+                break
+            (first, count) = map(int, line)
+            entries = file.read(20 * count)
+            if first <= object_id < first + count:
+                i = object_id - first
+                return int(entries[20 * i:20 * i + 10])
+        raise Error(f'{self.path}: object {object_id} not found in the last cross-reference section')
+
+    def _allocate(self):
+        n = self._size
+        self._size += 1
+        return n
+
+    def _begin_object(self, n):
+        self._offsets[n] = self._file.tell()
+        self._file.write(f'{n} 0 obj\n'.encode('ASCII'))
+
+    def _write_object(self, n, body):
+        self._begin_object(n)
+        self._file.write(f'{body}\nendobj\n'.encode('ASCII'))
+
+    def _write_stream(self, dictionary, chunks):
+        n = self._allocate()
+        length_id = self._allocate()
+        self._begin_object(n)
+        self._file.write(f'<< {dictionary} /Length {length_id} 0 R >>\nstream\n'.encode('ASCII'))
+        start = self._file.tell()
+        for chunk in chunks:
+            self._file.write(chunk)
+        length = self._file.tell() - start
+        self._file.write(b'\nendstream\nendobj\n')
+        self._write_object(length_id, str(length))
+        return n
+
+    def add(self, filename):
+        with open(filename, 'rb') as file:
+            image = read_image(file, filename)
+            image_id = self._write_stream(image.dictionary, image.data)
+        dpi = image.dpi or self.resolution
+        if dpi is None:
+            logger.warning('Unknown resolution of %s; assuming 72 dpi for the document', filename)
+            dpi = self.resolution = 72
+        scale = 72 / dpi
+        width = _format_number(image.width * scale)
+        height = _format_number(image.height * scale)
+        content = f'q {width} 0 0 {height} 0 0 cm /Im0 Do Q'
+        content_id = self._write_stream('/Filter /FlateDecode', _deflate([content.encode('ASCII')]))
+        leaf = self._get_leaf()
+        page_id = self._allocate()
+        self._write_object(page_id,
+            f'<< /Type /Page /Parent {leaf.id} 0 R /MediaBox [0 0 {width} {height}]'
+            f' /Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>'
+        )
+        leaf.kids += [page_id]
+        for node in self._nodes:
+            node.count += 1
+
+    def _get_leaf(self):
+        '''
+        return the leaf node for the next page,
+        replacing full nodes with new ones
+        '''
+        for (level, node) in enumerate(self._nodes):
+            if len(node.kids) < self.fanout:
+                break
+        else:
+            raise Error(f'{self.path}: too many pages')
+        for i in reversed(range(level)):
+            # final version of the full node:
+            self._write_object(self._nodes[i].id, str(self._nodes[i]))
+            parent = self._nodes[i + 1]
+            node = _Node(self._allocate(), parent.id)
+            parent.kids += [node.id]
+            self._nodes[i] = node
+        return self._nodes[0]
+
+    def flush(self):
+        '''
+        append the cross-reference section for objects written since the last flush
+        '''
+        if not self._offsets and self._prev_xref is not None:
+            return
+        file = self._file
+        file.seek(0, os.SEEK_END)
+        for node in self._nodes:
+            self._write_object(node.id, str(node))
+        entries = {n: f'{offset:010} 00000 n\r\n' for n, offset in self._offsets.items()}
+        if self._prev_xref is None:
+            entries[0] = '0000000000 65535 f\r\n'
+        xref_offset = file.tell()
+        file.write(b'xref\n')
+        numbers = sorted(entries)
+        while numbers:
+            count = 1
+            while count < len(numbers) and numbers[count] == numbers[0] + count:
+                count += 1
+            file.write(f'{numbers[0]} {count}\n'.encode('ASCII'))
+            for n in numbers[:count]:
+                file.write(entries[n].encode('ASCII'))
+            numbers = numbers[count:]
+        trailer = f'/Size {self._size} /Root {self.catalog_id} 0 R'
+        if self._prev_xref is not None:
+            trailer += f' /Prev {self._prev_xref}'
+        file.write(f'trailer\n<< {trailer} >>\nstartxref\n{xref_offset}\n%%EOF\n'.encode('ASCII'))
+        file.flush()
+        self._offsets = {}
+        self._prev_xref = xref_offset
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+__all__ = [
+    'Error',
+    'Writer',
+    'read_image',
+]
+
+# vim:ts=4 sts=4 sw=4 et
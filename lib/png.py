@@ -0,0 +1,200 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''minimal PNG parser'''
+
+import errno
+import os
+import struct
+import zlib
+
+signature = b'\x89PNG\r\n\x1a\n'
+
+# keyword of the iTXt chunk that holds XMP metadata:
+xmp_keyword = b'XML:com.adobe.xmp'
+
+class Error(ValueError):
+    pass
+
+def read_chunks(file):
+    '''
+    yield (chunk type, chunk data) pairs
+
+    The file must be positioned just after the signature.
+    '''
+    while True:
+        header = file.read(8)
+        if len(header) < 8:
+            raise Error('truncated PNG file')
+        (size, ctype) = struct.unpack('>I4s', header)
+        data = file.read(size)
+        crc = file.read(4)
+        if len(data) < size or len(crc) < 4:
+            raise Error('truncated PNG file')
+        if struct.unpack('>I', crc)[0] != zlib.crc32(data, zlib.crc32(ctype)):
+            raise Error(f'CRC error in {ctype!r} chunk')
+        yield ctype, data
+        if ctype == b'IEND':
+            return
+
+class Header:
+
+    '''
+    information from the chunks preceding the image data
+    '''
+
+    def __init__(self):
+        self.width = self.height = None
+        self.bit_depth = self.color_type = self.interlace = None
+        self.palette = None
+        self.dpi = None
+
+    @property
+    def channels(self):
+        return {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}[self.color_type]
+
+def read(file):
+    '''
+    parse the PNG file up to the first IDAT chunk;
+    return (header, iterator over image data)
+
+    The iterator yields the zlib-compressed image data, chunk by chunk.
+    '''
+    if file.read(8) != signature:
+        raise Error('not a PNG file')
+    chunks = read_chunks(file)
+    header = Header()
+    for ctype, data in chunks:
+        if ctype == b'IHDR':
+            (header.width, header.height, header.bit_depth, header.color_type, _, _, header.interlace) = (
+                struct.unpack('>IIBBBBB', data)
+            )
+        elif ctype == b'PLTE':
+            header.palette = data
+        elif ctype == b'pHYs':
+            (x, y, unit) = struct.unpack('>IIB', data)
+            if unit == 1:
+                # pixels per metre
+                header.dpi = round(max(x, y) * 0.0254)
+        elif ctype == b'IDAT':
+            break
+    else:
+        raise Error('no image data in PNG file')
+    if header.width is None:
+        raise Error('missing IHDR chunk in PNG file')
+    def image_data():
+        yield data
+        for ctype, chunk_data in chunks:
+            if ctype == b'IDAT':
+                yield chunk_data
+    return header, image_data()
+
+def parse_text(ctype, data):
+    '''
+    return (keyword, text) from the tEXt, zTXt or iTXt chunk data
+    '''
+    (keyword, data) = data.split(b'\0', 1)
+    if ctype == b'tEXt':
+        text = data.decode('ISO-8859-1')
+    elif ctype == b'zTXt':
+        text = zlib.decompress(data[1:]).decode('ISO-8859-1')
+    else:
+        compressed = data[0]
+        (_, _, text) = data[2:].split(b'\0', 2)
+        if compressed:
+            text = zlib.decompress(text)
+        text = text.decode('UTF-8')
+    return keyword.decode('ISO-8859-1'), text
+
+def make_chunk(ctype, data):
+    return struct.pack('>I4s', len(data), ctype) + data + struct.pack('>I', zlib.crc32(data, zlib.crc32(ctype)))
+
+def embed_xmp(source, target, xmp_data):
+    '''
+    copy the PNG file, with the XMP packet embedded in an iTXt chunk just
+    after IHDR (replacing existing XMP metadata, if any)
+
+    The other chunks, including image data, are copied as they are, using
+    sendfile(2) where possible. Both source and target must be real files.
+    '''
+    source_fd = source.fileno()
+    target.flush()
+    target_fd = target.fileno()
+    def pread(size, offset):
+        data = os.pread(source_fd, size, offset)
+        if len(data) < size:
+            raise Error('truncated PNG file')
+        return data
+    if pread(8, 0) != signature:
+        raise Error('not a PNG file')
+    # keyword, compression flag and method, empty language tag and translated keyword:
+    xmp_chunk = make_chunk(b'iTXt', xmp_keyword + b'\0\0\0\0\0' + xmp_data)
+    # Chunks are copied in spans of consecutive chunks that are kept:
+    span = 0
+    offset = 8
+    while True:
+        (size, ctype) = struct.unpack('>I4s', pread(8, offset))
+        end = offset + 8 + size + 4
+        if ctype == b'IHDR':
+            _copy(source_fd, target_fd, span, end - span)
+            _write(target_fd, xmp_chunk)
+            span = end
+        elif ctype == b'iTXt' and size > len(xmp_keyword):
+            if pread(len(xmp_keyword) + 1, offset + 8) == xmp_keyword + b'\0':
+                # old XMP metadata
+                _copy(source_fd, target_fd, span, offset - span)
+                span = end
+        elif ctype == b'IEND':
+            _copy(source_fd, target_fd, span, end - span)
+            return
+        offset = end
+
+def _copy(source_fd, target_fd, offset, size):
+    '''
+    copy size bytes from offset in the source to the current position in the target
+    '''
+    while size > 0:
+        try:
+            n = os.sendfile(target_fd, source_fd, offset, size)
+        except OSError as exc:
+            if exc.errno not in {errno.EINVAL, errno.ENOSYS}:
+                raise
+            # sendfile(2) doesn't support these files
+            n = _write(target_fd, os.pread(source_fd, min(size, 1 << 20), offset))
+        if n == 0:
+            raise Error('truncated PNG file')
+        offset += n
+        size -= n
+
+def _write(fd, data):
+    view = memoryview(data)
+    while view:
+        n = os.write(fd, view)
+        view = view[n:]
+    return len(data)
+
+__all__ = [
+    'Error',
+    'Header',
+    'embed_xmp',
+    'make_chunk',
+    'parse_text',
+    'read',
+    'read_chunks',
+    'signature',
+    'xmp_keyword',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,90 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''minimal parser for binary PNM files'''
+
+class Error(ValueError):
+    pass
+
+# magic: number of samples per pixel
+formats = {
+    b'P4': 1,
+    b'P5': 1,
+    b'P6': 3,
+}
+
+class Header:
+
+    def __init__(self, magic, width, height, maxval):
+        self.magic = magic
+        self.width = width
+        self.height = height
+        self.maxval = maxval
+
+    @property
+    def channels(self):
+        return formats[self.magic]
+
+    @property
+    def bit_depth(self):
+        if self.magic == b'P4':
+            return 1
+        if self.maxval < 256:
+            return 8
+        return 16
+
+    @property
+    def data_size(self):
+        row_size = (self.width * self.channels * self.bit_depth + 7) // 8
+        return row_size * self.height
+
+def _read_token(file):
+    token = b''
+    while True:
+        c = file.read(1)
+        if not c:
+            raise Error('truncated PNM file')
+        if c == b'#' and not token:
+            file.readline()
+        elif c.isspace():
+            if token:
+                return token
+        else:
+            token += c
+
+def read_header(file):
+    '''
+    parse the PNM header, leaving the file positioned at the image data
+    '''
+    magic = file.read(2)
+    if magic not in formats:
+        raise Error('not a binary PNM file')
+    try:
+        width = int(_read_token(file))
+        height = int(_read_token(file))
+        maxval = 1 if magic == b'P4' else int(_read_token(file))
+    except ValueError:
+        raise Error('invalid PNM header') from None
+    if not 0 < maxval < 65536:
+        raise Error(f'invalid PNM maximum value: {maxval}')
+    return Header(magic, width, height, maxval)
+
+__all__ = [
+    'Error',
+    'Header',
+    'read_header',
+]
+
+# vim:ts=4 sts=4 sw=4 et
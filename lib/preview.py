@@ -0,0 +1,110 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+preview scans for restricting the scan area to the content
+'''
+
+from . import encoder
+from . import utils
+
+try:
+    import PIL.Image
+except ImportError as ex:
+    utils.enhance_import_error(ex, 'Pillow', 'python3-pil', 'https://pypi.org/project/Pillow/')
+    raise
+
+default_resolution = 50
+
+# format in which scanimage writes the preview;
+# unlike PNM, TIFF records the resolution that was actually used:
+capture_format = 'tiff'
+
+# margin around the detected content, in millimetres:
+padding = 2.0
+
+mm_per_inch = 25.4
+
+def get_scanimage_args(resolution=default_resolution):
+    '''
+    return scanimage arguments for the preview scan;
+    they must come after the user-supplied ones
+    '''
+    return [f'--format={capture_format}', f'--resolution={resolution}']
+
+def get_origin(scanimage_args):
+    '''
+    return (left, top) offset of the scan area (in millimetres)
+    set by the user-supplied -l and -t scanimage arguments
+    '''
+    origin = {'-l': 0.0, '-t': 0.0}
+    args = iter(scanimage_args)
+    for arg in args:
+        for opt in origin:
+            if arg == opt:
+                value = next(args, '')
+            elif arg.startswith(opt):
+                value = arg[len(opt):].lstrip('=')
+            else:
+                continue
+            value = value[:-2] if value.endswith('mm') else value
+            try:
+                origin[opt] = float(value)
+            except ValueError:
+                raise ValueError(f'cannot parse scanimage argument: {opt} {value}') from None
+    return (origin['-l'], origin['-t'])
+
+def get_geometry(file, origin=(0.0, 0.0)):
+    '''
+    return scanimage geometry arguments (-l, -t, -x, -y, in millimetres)
+    for the content of the preview image read from the file,
+    or None if no content was found
+
+    origin is the (left, top) offset of the preview scan area (see get_origin()).
+    '''
+    analysis = encoder.import_analysis()
+    with PIL.Image.open(file) as image:
+        try:
+            dpi = float(image.info['dpi'][0])
+        except LookupError:
+            raise ValueError('unknown resolution of the preview image') from None
+        box = analysis.get_content_box(image)
+        size = image.size
+    if box is None:
+        return None
+    scale = mm_per_inch / dpi
+    (left, top, right, bottom) = (n * scale for n in box)
+    (bed_width, bed_height) = (n * scale for n in size)
+    left = max(0.0, left - padding)
+    top = max(0.0, top - padding)
+    right = min(bed_width, right + padding)
+    bottom = min(bed_height, bottom + padding)
+    return [
+        '-l', f'{origin[0] + left:.1f}',
+        '-t', f'{origin[1] + top:.1f}',
+        '-x', f'{right - left:.1f}',
+        '-y', f'{bottom - top:.1f}',
+    ]
+
+__all__ = [
+    'capture_format',
+    'default_resolution',
+    'get_geometry',
+    'get_origin',
+    'get_scanimage_args',
+    'padding',
+]
+
+# vim:ts=4 sts=4 sw=4 et
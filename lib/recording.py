@@ -0,0 +1,316 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+session recording and replay
+'''
+
+import json
+import os
+import re
+import threading
+import time
+
+from . import ipc
+from . import scanner
+from . import utils
+
+try:
+    import PIL.Image
+except ImportError as ex:
+    utils.enhance_import_error(ex, 'Pillow', 'python3-pil', 'https://pypi.org/project/Pillow/')
+    raise
+
+format_version = 1
+
+# options stored in the "start" event:
+_header_keys = [
+    'output_format', 'filename_template',
+    'batch_start', 'batch_count', 'batch_increment', 'batch_button',
+    'page_count',
+]
+
+class Recorder:
+
+    '''
+    record everything scanhelper observes during a scan session
+
+    The recording is a JSON Lines file; each line is an event with a "time"
+    key (seconds since the start of the session) and an "event" key.
+    '''
+
+    def __init__(self, path, options):
+        self._file = open(path, 'wt', encoding='UTF-8')  # pylint: disable=consider-using-with
+        self._start = time.monotonic()
+        self.record('start',
+            version=format_version,
+            output_format=options.output_format,
+            filename_template=options.filename_template,
+            batch_start=options.batch_start,
+            batch_count=_finite(options.batch_count),
+            batch_increment=options.batch_increment,
+            batch_button=options.batch_button,
+            page_count=_finite(options.page_count),
+        )
+
+    def record(self, event, **data):
+        data = dict(time=time.monotonic() - self._start, event=event, **data)
+        json.dump(data, self._file)
+        self._file.write('\n')
+        self._file.flush()
+
+    def page(self, filename):
+        size = os.stat(filename).st_size
+        with PIL.Image.open(filename) as image:
+            info = dict(
+                format=image.format,
+                mode=image.mode,
+                dimensions=image.size,
+                dpi=image.info.get('dpi'),
+            )
+        self.record('page', filename=filename, size=size, **info)
+
+    def close(self):
+        self.record('end')
+        self._file.close()
+
+def _finite(n):
+    if n == float('inf'):
+        return None
+    return n
+
+class Batch:
+
+    def __init__(self, time_):
+        self.time = time_
+        self.lines = []
+        self.pages = []
+        self.returncode = 0
+
+class ReplayDevice(scanner.Device):
+
+    use_option_cache = False
+
+    def __init__(self, name, vendor, model, type_, buttons):
+        self._buttons = buttons
+        super().__init__(name, vendor, model, type_)
+
+    def _init_options(self):
+        self._options = dict.fromkeys(self._buttons)
+
+    def __getitem__(self, name):
+        return False
+
+    def open(self):
+        self._device = self  # there's nothing to open
+
+    def close(self):
+        pass
+
+class ReplayProcess:
+
+    '''
+    stand-in for the scanimage subprocess
+
+    Recorded output is written to the given file descriptor, with the
+    recorded timing; page files are created just before scanimage would
+    announce them.
+    '''
+
+    def __init__(self, batch, fd, speed):
+        self._batch = batch
+        self._speed = speed
+        self._thread = threading.Thread(target=self._run, args=(fd,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, fd):
+        pages = iter(self._batch.pages)
+        prev_time = self._batch.time
+        with os.fdopen(fd, 'wt', encoding='UTF-8') as file:
+            for time_, line in self._batch.lines:
+                _sleep(time_ - prev_time, self._speed)
+                prev_time = time_
+                if re.match('Scanned page', line):
+                    page = next(pages, None)
+                    if page is not None:
+                        create_image(page)
+                file.write(line)
+                file.flush()
+
+    def wait(self):
+        self._thread.join()
+        if self._batch.returncode:
+            raise ipc.CalledProcessError(self._batch.returncode, 'scanimage')
+
+def _sleep(seconds, speed):
+    if speed and seconds > 0:
+        time.sleep(seconds / speed)
+
+def create_image(page):
+    '''
+    create a synthetic image with the recorded properties
+    '''
+    image = PIL.Image.new(page['mode'], tuple(page['dimensions']))
+    kwargs = {}
+    if page['dpi']:
+        kwargs.update(dpi=tuple(page['dpi']))
+    with image:
+        image.save(page['filename'], page['format'], **kwargs)
+
+# keys required for each event type (besides "time" and "event"):
+_event_keys = {
+    'start': ['version', *_header_keys],
+    'devices': ['devices'],
+    'device': ['name', 'buttons'],
+    'wait': ['button', 'duration', 'eof'],
+    'scanimage': [],
+    'output': ['line'],
+    'page': ['filename', 'size', 'format', 'mode', 'dimensions', 'dpi'],
+    'exit': ['returncode'],
+    'end': [],
+}
+
+# events that must be preceded by a "scanimage" event:
+_batch_events = {'output', 'page', 'exit'}
+
+def load(path):
+    '''
+    read and validate the recording; return list of events
+    '''
+    events = []
+    with open(path, 'rt', encoding='UTF-8') as file:
+        for n, line in enumerate(file, start=1):
+            try:
+                event = json.loads(line)
+            except ValueError:
+                raise ValueError(f'{path}:{n}: malformed recording') from None
+            if not isinstance(event, dict) or not isinstance(event.get('event'), str):
+                raise ValueError(f'{path}:{n}: malformed recording')
+            events += [event]
+    if not events or events[0]['event'] != 'start':
+        raise ValueError(f'{path}: not a scanhelper session recording')
+    version = events[0].get('version')
+    if version != format_version:
+        raise ValueError(f'{path}: unsupported recording version: {version}')
+    spawned = False
+    for n, event in enumerate(events, start=1):
+        kind = event['event']
+        keys = _event_keys.get(kind)
+        if keys is None:
+            raise ValueError(f'{path}:{n}: unknown event: {kind!r}')
+        if n > 1 and kind == 'start':
+            raise ValueError(f'{path}:{n}: unexpected {kind!r} event')
+        missing = [key for key in ['time', *keys] if key not in event]
+        if missing:
+            raise ValueError(f'{path}:{n}: {kind!r} event without {missing[0]!r}')
+        if kind == 'scanimage':
+            spawned = True
+        elif kind in _batch_events and not spawned:
+            raise ValueError(f'{path}:{n}: {kind!r} event before scanimage run')
+    if events[-1]['event'] != 'end':
+        raise ValueError(f'{path}: truncated recording')
+    return events
+
+class Player:
+
+    '''
+    replay a recorded scan session
+
+    speed is the time acceleration factor; 0 means no delays at all.
+    '''
+
+    def __init__(self, path, speed=1):
+        self.speed = speed
+        self._devices = None
+        self._device_name = None
+        self._buttons = {}
+        self._waits = []
+        self._batches = []
+        events = load(path)
+        self._header = events[0]
+        batch = None
+        for event in events[1:]:
+            kind = event['event']
+            if kind == 'devices':
+                self._devices = [tuple(d) for d in event['devices']]
+            elif kind == 'device':
+                self._device_name = event['name']
+                self._buttons[event['name']] = event['buttons']
+            elif kind == 'wait':
+                self._waits += [event]
+            elif kind == 'scanimage':
+                batch = Batch(event['time'])
+                self._batches += [batch]
+            elif kind == 'output':
+                batch.lines += [(event['time'], event['line'])]
+            elif kind == 'page':
+                batch.pages += [event]
+            elif kind == 'exit':
+                batch.returncode = event['returncode']
+        self._waits.reverse()
+        self._batches.reverse()
+
+    def apply(self, options):
+        '''
+        override device and batch options with the recorded ones
+        '''
+        if self._device_name is not None:
+            options.device = self._device_name
+        header = self._header
+        for key in ['output_format', 'filename_template', 'batch_start', 'batch_increment', 'batch_button']:
+            setattr(options, key, header[key])
+        for key in ['batch_count', 'page_count']:
+            value = header[key]
+            if value is None:
+                value = float('inf')
+            setattr(options, key, value)
+
+    def get_devices(self):
+        if self._devices is None:
+            raise IndexError('no device list in the recording')
+        return self._devices
+
+    def open_device(self, name, vendor, model, type_):
+        buttons = self._buttons.get(name, ())
+        return ReplayDevice(name, vendor, model, type_, buttons)
+
+    def wait(self, button):
+        try:
+            event = self._waits.pop()
+        except IndexError:
+            raise EOFError from None
+        if button is None:
+            print('Press ENTER to continue')
+        else:
+            print(f'Press {button!r} button to continue')
+        _sleep(event['duration'], self.speed)
+        if event['eof']:
+            raise EOFError
+
+    def spawn_scanimage(self, stdout):
+        try:
+            batch = self._batches.pop()
+        except IndexError:
+            batch = Batch(0)
+            batch.returncode = scanner.Status.NO_DOCS
+        return ReplayProcess(batch, os.dup(stdout), self.speed)
+
+__all__ = [
+    'Player',
+    'Recorder',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,86 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+recovery from scanner failures
+'''
+
+import os
+
+from . import scanner
+
+jam_actions = ('end-batch', 'wait')
+
+descriptions = {
+    scanner.Status.DEVICE_BUSY: 'device busy',
+    scanner.Status.JAMMED: 'paper jam',
+    scanner.Status.COVER_OPEN: 'cover open',
+}
+
+class Policy:
+
+    '''
+    what to do when scanimage fails with the given status
+
+    busy_retries: how many times in a row to retry if the device is busy
+    busy_delay: delay before the first retry, in seconds;
+    it's doubled for each subsequent retry
+    on_jam: what to do on paper jam or open cover:
+    "end-batch" (as if there were no more documents),
+    or "wait" (for the operator, and then continue the batch)
+    '''
+
+    def __init__(self, busy_retries=0, busy_delay=1.0, on_jam='end-batch'):
+        if on_jam not in jam_actions:
+            raise ValueError(f'unknown action: {on_jam!r}')
+        self.busy_retries = busy_retries
+        self.busy_delay = busy_delay
+        self.on_jam = on_jam
+
+    def get_action(self, status, n_retries=0):
+        '''
+        return "retry", "wait", "end-batch", or None (meaning that the failure is fatal);
+        n_retries is the number of retries that have already been done
+        '''
+        if status == scanner.Status.DEVICE_BUSY:
+            if n_retries < self.busy_retries:
+                return 'retry'
+            return None
+        if status in {scanner.Status.JAMMED, scanner.Status.COVER_OPEN}:
+            return self.on_jam
+        return None
+
+    def get_delay(self, n_retries):
+        return self.busy_delay * 2 ** n_retries
+
+def remove_partial_page(filename):
+    '''
+    remove the page that scanimage didn't finish, if any
+    '''
+    # scanimage >= 1.0.25 writes to a temporary .part file first.
+    for path in [filename, filename + '.part']:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+__all__ = [
+    'Policy',
+    'descriptions',
+    'jam_actions',
+    'remove_partial_page',
+]
+
+# vim:ts=4 sts=4 sw=4 et
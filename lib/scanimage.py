@@ -0,0 +1,237 @@
+# encoding=UTF-8
+
+# Copyright © 2011-2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''running scanimage'''
+
+import asyncio
+import errno
+import functools
+import logging
+import os
+import pty
+import re
+import signal
+import sys
+import tempfile
+
+from . import ipc
+from . import orchestrator
+from . import pages
+from . import preview
+from . import scanner
+from . import utils
+from . import vcmp
+
+logger = logging.getLogger('scanhelper.main')
+
+infinity = 1e999
+
+class Error(RuntimeError):
+    pass
+
+def run(*args, **kwargs):
+    cmdline = ['scanimage']
+    cmdline += args
+    try:
+        proc = ipc.Subprocess(cmdline, **kwargs)
+    except OSError as exc:
+        if exc.errno == errno.ENOENT:
+            message = 'scanimage not found; please install '
+            if utils.debian:
+                message += 'the sane-utils package'
+            else:
+                message += 'sane-backends <http://www.sane-project.org/>'
+            raise Error(message) from exc
+        raise
+    return proc
+
+def get_args(options, device, start=0, count=infinity, increment=1, geometry=()):
+    assert isinstance(device, scanner.Device)
+    result = []
+    result += ['--device-name', device.name]
+    result += [f'--format={pages.get_capture_format(options)}']
+    if options.icc_profile is not None:
+        result += ['--icc-profile', options.icc_profile]
+    result += [f'--batch={pages.get_capture_template(options)}']
+    if start >= 0:
+        result += [f'--batch-start={start}']
+    if count < infinity:
+        result += [f'--batch-count={count}']
+    if increment > 1:
+        result += [f'--batch-increment={increment}']
+    if options.accept_md5_only:
+        result += ['--accept-md5-only']
+    if options.progress:
+        result += ['--progress']
+    if options.verbose:
+        result += ['--verbose']
+    if options.buffer_size is not None:
+        result += [f'--buffer-size={options.buffer_size}']
+    result += options.extra_args
+    result += geometry
+    assert all(isinstance(x, str) for x in result)
+    return result
+
+@functools.lru_cache(maxsize=None)
+def get_version():
+    '''
+    return scanimage version
+
+    The result is cached, as running scanimage is relatively slow.
+    '''
+    proc = run('--version', stdout=ipc.PIPE,
+        encoding='ASCII', errors='replace',
+    )
+    line = proc.stdout.readline()
+    proc.stdout.close()
+    proc.wait()
+    match = re.match('^scanimage [(]sane-backends[)] ([0-9.]+)', line)
+    if match is None:
+        raise Error('cannot parse scanimage version')
+    version = match.group(1)
+    return vcmp.LooseVersion(version)
+
+async def wait_for_button(device, button, sleep_interval=0.1):
+    '''
+    wait for ENTER, or for the scanner button;
+    raise EOFError at the end of the console input
+
+    If stdin is a terminal, ENTER is accepted also while waiting for the button.
+    '''
+    if button is None:
+        print('Press ENTER to continue')
+        await orchestrator.read_line(sys.stdin)
+        return
+    if button not in device:
+        raise Error(f'no such button: {button}')
+    print(f'Press {button!r} button to continue')
+    waiters = [asyncio.ensure_future(poll_button(device, button, sleep_interval))]
+    if sys.stdin.isatty():
+        waiters += [asyncio.ensure_future(orchestrator.read_line(sys.stdin))]
+    try:
+        (done, _) = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in done:
+            waiter.result()
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+
+async def poll_button(device, button, sleep_interval):
+    while not device[button]:
+        await asyncio.sleep(sleep_interval)
+
+def spawn(options, scanimage_args, tty):
+    if options.player is not None:
+        return options.player.spawn_scanimage(stdout=tty)
+    if options.recorder is not None:
+        options.recorder.record('scanimage', args=scanimage_args)
+    return run(*scanimage_args, stdout=tty, stderr=tty)
+
+def scan_preview(options, device):
+    '''
+    do a preview scan;
+    return scanimage geometry arguments for the content area
+    '''
+    assert isinstance(device, scanner.Device)
+    device.close()
+    scanimage_args = ['--device-name', device.name]
+    scanimage_args += options.extra_args
+    scanimage_args += preview.get_scanimage_args(options.preview_resolution)
+    with tempfile.TemporaryFile() as file:
+        try:
+            run(*scanimage_args, stdout=file).wait()
+            file.seek(0)
+            geometry = preview.get_geometry(file, preview.get_origin(options.extra_args))
+        except (ipc.CalledProcessError, OSError, ValueError) as exc:
+            raise Error(f'preview scan failed: {exc}') from exc
+    if geometry is None:
+        logger.info('Preview: no content found; scanning the whole area')
+        return []
+    logger.info('Preview: scanning area %s', ipc.shell_escape(geometry))
+    return geometry
+
+async def scan_batch(options, device, start=0, count=infinity, increment=1, geometry=()):
+    '''
+    run scanimage in batch mode; asynchronously yield numbers of the scanned pages
+
+    scanimage's output is echoed to options.scanimage_output, unless it's None.
+    '''
+    assert isinstance(device, scanner.Device)
+    device.close()
+    scanimage_args = get_args(options, device, start, count, increment, geometry)
+    recorder = options.recorder
+    output = options.scanimage_output
+    master, slave = pty.openpty()
+    subprocess = spawn(options, scanimage_args, slave)
+    os.close(slave)
+    try:
+        async for line in orchestrator.LineReader(master):
+            if recorder is not None:
+                recorder.record('output', line=line)
+            match = re.match('Scanned page ([0-9]+)', line)
+            if output is not None:
+                output.flush()
+                output.write('| ' + line)
+                output.flush()
+            if match:
+                yield int(match.group(1))
+    except BaseException:
+        # cancelled, or the caller gave up
+        os.close(master)
+        interrupt(subprocess)
+        raise
+    returncode = 0
+    try:
+        await orchestrator.run_in_executor(subprocess.wait)
+    except ipc.CalledProcessError as ex:
+        returncode = ex.returncode
+        if ex.returncode != scanner.Status.NO_DOCS:
+            # Jams etc. are dealt with by the caller; see the recovery module.
+            raise
+    finally:
+        os.close(master)
+        if recorder is not None:
+            recorder.record('exit', returncode=returncode)
+
+def interrupt(subprocess):
+    '''
+    stop scanimage (if it's still running), and wait for it to exit
+    '''
+    if not isinstance(subprocess, ipc.Subprocess):
+        # replayed session
+        return
+    if subprocess.poll() is None:
+        # This lets scanimage cancel the scan properly.
+        subprocess.send_signal(signal.SIGINT)
+    try:
+        subprocess.wait()
+    except ipc.CalledProcessError:
+        pass
+
+__all__ = [
+    'Error',
+    'get_args',
+    'get_version',
+    'infinity',
+    'interrupt',
+    'poll_button',
+    'run',
+    'scan_batch',
+    'scan_preview',
+    'spawn',
+    'wait_for_button',
+]
+
+# vim:ts=4 sts=4 sw=4 et
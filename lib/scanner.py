@@ -25,6 +25,8 @@ except ImportError as ex:
     raise
 
 _version = None
+_device_cache = None
+_option_cache = {}
 
 def initialize():
     global _version
@@ -39,8 +41,32 @@ def get_sane_version():
 
 def get_devices():
     initialize()
+    if _device_cache is not None:
+        return _device_cache
     return sane.get_devices()
 
+def cache_devices():
+    '''
+    enumerate devices and their options;
+    get_devices() will return the cached list until the next call
+
+    (This is used by the daemon, to save time on each job.)
+    '''
+    global _device_cache
+    initialize()
+    _device_cache = None
+    devices = sane.get_devices()
+    _option_cache.clear()
+    for name, vendor, model, type_ in devices:
+        try:
+            device = Device(name, vendor, model, type_)
+        except sane.error:
+            # e.g. device busy
+            continue
+        device.close()
+        _option_cache[name] = device._options  # pylint: disable=protected-access
+    _device_cache = devices
+
 class OptionDescriptor:
 
     def __init__(self, index, type_, unit, size, capabilities, constraint):
@@ -53,12 +79,19 @@ class OptionDescriptor:
 
 class Device:
 
+    # whether options cached by cache_devices() can be used:
+    use_option_cache = True
+
     def __init__(self, name, vendor, model, type_):
         self.name = name
         self.vendor = vendor
         self.model = model
         self.type_ = type_
         self._device = None
+        if self.use_option_cache and name in _option_cache:
+            self._options = _option_cache[name]
+            # The device will be opened on demand.
+            return
         self.open()
         assert self._device is not None
         self._init_options()
@@ -112,6 +145,7 @@ class Status:
 __all__ = [
     'Device',
     'Status',
+    'cache_devices',
     'get_devices',
     'get_sane_version',
     'initialize',
@@ -0,0 +1,766 @@
+# encoding=UTF-8
+
+# Copyright © 2011-2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+scanning sessions
+
+This is scanhelper's library interface:
+
+    options = session.get_options(['--resolution', '300'], device='test', page_count=10, xmp=True)
+    for page in session.scan(options):
+        print(page.path, page.size)
+
+Problems are reported by raising Error.
+'''
+
+import asyncio
+import concurrent.futures
+import datetime
+import itertools
+import logging
+import os
+import sqlite3
+import string
+import tempfile
+import time
+
+from . import archive
+from . import catalog
+from . import checksum
+from . import cmdline
+from . import config
+from . import durability
+from . import encoder
+from . import ipc
+from . import orchestrator
+from . import pages
+from . import recording
+from . import recovery
+from . import scanimage
+from . import scanner
+from . import staging
+from . import template
+from . import utils
+from . import xmp
+
+try:
+    import PIL.Image
+except ImportError as ex:
+    utils.enhance_import_error(ex, 'Pillow', 'python3-pil', 'https://pypi.org/project/Pillow/')
+    raise
+
+logger = logging.getLogger('scanhelper.main')
+ipc_logger = logging.getLogger('scanhelper.ipc')
+
+class Error(RuntimeError):
+    pass
+
+class Page:
+
+    '''
+    scanned (and processed) page
+
+    filename: name of the image file, relative to the target directory
+    (and, with --archive, the name of the archive member)
+    path: absolute path of the image file
+    xmp_path: absolute path of the sidecar XMP file, or None
+    (e.g. with --embed-xmp, which stores XMP metadata in the image file)
+    number: page number
+    size: (width, height) of the image, in pixels
+    scanned: time when scanimage finished the page, in seconds since the epoch
+    scan_time: time scanimage spent on the page (since the previous page
+    or the start of the batch), in seconds
+
+    With --staging-directory, the files are moved to the target directory
+    in background; they might not be there until the session ends.
+    '''
+
+    def __init__(self, filename, number, scanned, scan_time):
+        self.filename = filename
+        self.path = None
+        self.xmp_path = None
+        self.number = number
+        self.size = None
+        self.scanned = scanned
+        self.scan_time = scan_time
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.number}: {self.filename}>'
+
+def get_options(scanimage_args=(), **kwargs):
+    '''
+    return options for scan()
+
+    Keyword arguments correspond to the command-line options; they are named
+    after the attributes of the result (e.g. target_directory='scans',
+    output_format='jpeg', page_count=10, xmp=True, derivatives=['thumb=256px']).
+    Omitted options have the same defaults as on the command line.
+    scanimage_args are passed to scanimage (e.g. ['--resolution', '300']).
+
+    Unlike the command-line interface, this doesn't read configuration files.
+    '''
+    parser = cmdline.ArgumentParser(conf=config.Config(paths=()), raise_errors=True)
+    args = []
+    for key, value in kwargs.items():
+        try:
+            args += parser.format_option(key, value)
+        except KeyError:
+            raise TypeError(f'unknown option: {key}') from None
+    args += scanimage_args
+    try:
+        options = parser.parse_args(args)
+    except cmdline.Error as exc:
+        raise Error(str(exc)) from exc
+    options.scanimage_output = None
+    return options
+
+def get_device(options):
+    player = options.player
+    recorder = options.recorder
+    if player is not None:
+        scanners = player.get_devices()
+    else:
+        scanners = scanner.get_devices()
+    if recorder is not None:
+        recorder.record('devices', devices=scanners)
+    if not scanners:
+        raise IndexError('no scanner devices')
+    if options.device is None:
+        if len(scanners) > 1:
+            raise IndexError('please select a scanner device')
+        name, vendor, model, type_ = scanners[0]
+    else:
+        for name, vendor, model, type_ in scanners:
+            if name == options.device:
+                break
+        else:
+            raise IndexError(f'no such device: {options.device}')
+    if player is not None:
+        return player.open_device(name, vendor, model, type_)
+    device = scanner.Device(name, vendor, model, type_)
+    if recorder is not None:
+        recorder.record('device', name=name, buttons=list(device))
+    return device
+
+def create_unique_directory(prefix=''):
+    alphabet = string.ascii_lowercase
+    prefix += str(datetime.datetime.now()).replace(' ', 'T')[:19]
+    for i in range(4):
+        for suffix in itertools.product(*[alphabet] * i):
+            path = prefix + str.join('', suffix)
+            try:
+                logger.debug('Trying to create target directory: %r', path)
+                os.mkdir(path)
+            except OSError:
+                continue
+            return path
+    raise  # pylint: disable=misplaced-bare-raise
+
+async def wait_for_batch(options, device):
+    player = options.player
+    recorder = options.recorder
+    button = options.batch_button
+    if player is not None:
+        await orchestrator.run_in_executor(player.wait, button)
+        return
+    start = time.monotonic()
+    eof = False
+    try:
+        await scanimage.wait_for_button(device, button)
+    except EOFError:
+        eof = True
+        raise
+    finally:
+        if recorder is not None:
+            recorder.record('wait', button=button, duration=time.monotonic() - start, eof=eof)
+
+def scan(options, wait=None):
+    '''
+    scan pages as configured by the options (see get_options());
+    yield Page objects as the pages are processed
+
+    This runs scan_async() in a private event loop.
+    '''
+    return orchestrator.iterate(scan_async(options, wait))
+
+async def scan_async(options, wait=None):
+    '''
+    scan pages as configured by the options (see get_options());
+    asynchronously yield Page objects as the pages are processed
+
+    The coroutine function wait(options, device) is awaited before each
+    batch; it can raise EOFError to end the session. By default, it waits
+    for ENTER, or for the scanner button selected with batch_button.
+
+    Cancelling the scan stops scanimage, and finishes the pages that were
+    already scanned.
+
+    The working directory is changed to the target directory while scanning.
+    '''
+    cwd = os.getcwd()
+    if options.replay is not None:
+        try:
+            options.player = recording.Player(options.replay, speed=options.replay_speed)
+        except (OSError, ValueError) as exc:
+            raise Error(str(exc)) from exc
+        options.player.apply(options)
+    elif options.record is not None:
+        try:
+            options.recorder = recording.Recorder(options.record, options)
+        except OSError as exc:
+            raise Error(str(exc)) from exc
+    try:
+        if options.catalog_path is not None:
+            options.catalog = open_catalog(options)
+        async for page in scan_session(options, wait or wait_for_batch):
+            yield page
+    except scanimage.Error as exc:
+        raise Error(str(exc)) from exc
+    finally:
+        if options.recorder is not None:
+            options.recorder.close()
+        if options.catalog is not None:
+            options.catalog.close()
+        os.chdir(cwd)
+
+def open_catalog(options):
+    try:
+        db = catalog.Catalog(options.catalog_path)
+    except sqlite3.Error as exc:
+        raise Error(f'{options.catalog_path}: {exc}') from exc
+    return db
+
+def get_target_directory(options):
+    target_directory = options.target_directory
+    if target_directory is None:
+        prefix = options.target_directory_prefix or ''
+        if prefix and prefix[-1].isalnum():
+            prefix += '-'
+        target_directory = create_unique_directory(prefix)
+        logger.info('Target directory: %s', target_directory)
+    return target_directory
+
+def process_page(options, device, page, properties=None):
+    '''
+    write sidecars for the page, and hand it over to the catalog, document, archive, etc.;
+    return the page
+    '''
+    image_filename = page.filename
+    parameters = None
+    digest = None
+    if options.xmp:
+        override = pages.get_xmp_override(options, properties)
+        parameters = pages.write_xmp(options, device, image_filename, override, fsync=pages.get_xmp_fsync(options))
+    if options.catalog is not None:
+        if parameters is None:
+            override = pages.get_xmp_override(options, properties)
+            parameters = xmp.get_parameters(image_filename, device, override)
+        # The digest is reused for the checksum manifest:
+        digest = checksum.hash_file(image_filename)
+        options.catalog.add_page(image_filename, parameters, digest, xmp_ids=options.xmp)
+    if parameters is not None:
+        page.size = (parameters['width'], parameters['height'])
+    else:
+        with PIL.Image.open(image_filename) as image:
+            page.size = image.size
+    if options.document is not None:
+        add_to_document(options, image_filename)
+    directory = os.getcwd() if options.mover is None else options.mover.target_directory
+    page.path = os.path.join(directory, image_filename)
+    pages.finish_file(options, image_filename, digest=digest)
+    for derivative in (properties or {}).get('derivatives', ()):
+        pages.finish_file(options, derivative['filename'])
+    if options.xmp and not options.embed_xmp:
+        page.xmp_path = page.path + '.xmp'
+        pages.finish_file(options, image_filename + '.xmp', synced=True)
+    return page
+
+def open_document(options):
+    path = os.path.abspath(options.document_path)
+    if os.path.exists(path) and not options.resume:
+        raise Error(f'refusing to overwrite existing document {path} (use --resume to continue the session)')
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        document = pages.document_writers[ext](path, resolution=pages.get_resolution(options))
+    except (OSError, ValueError) as exc:
+        raise Error(f'{path}: {exc}') from exc
+    return document
+
+def add_to_document(options, image_filename):
+    document = options.document
+    try:
+        document.add(image_filename)
+    except (OSError, ValueError) as exc:
+        raise Error(f'{document.path}: cannot add {image_filename}: {exc}') from exc
+    options.syncer.add(document.path)
+
+def expand_filename_template(options, device, now):
+    '''
+    replace the extra fields in the filename template with their values
+    '''
+    tmpl = template.parse(options.filename_template)
+    if not tmpl.fields:
+        return
+    tmpl = tmpl.expand(
+        session=now.strftime('%Y%m%dT%H%M%S'),
+        device=device.name.replace(os.sep, '_'),
+        date=now.strftime('%Y-%m-%d'),
+    )
+    options.filename_template = str(tmpl)
+    logger.debug('Filename template: %s', options.filename_template)
+
+def index_target_directory(options):
+    if options.target_directory is None:
+        # freshly created directory
+        return {}
+    try:
+        existing_pages = template.index_pages(options.filename_template)
+        if options.archive_format is not None:
+            path = archive.get_archive_name(options.archive_format)
+            if os.path.exists(path):
+                existing_pages.update(template.index_pages(options.filename_template, archive.read_index(path)))
+    except ValueError as exc:
+        if options.resume:
+            raise Error(str(exc)) from exc
+        return {}
+    return existing_pages
+
+def check_scanimage_version(options):
+    if options.player is not None:
+        return
+    if pages.get_capture_format(options) == 'png':
+        if scanimage.get_version() < '1.0.25':
+            if utils.debian:
+                pkg = 'sane-utils'
+            else:
+                pkg = 'scanimage (sane-backends)'
+            raise Error(f'PNG output format requires {pkg} >= 1.0.25')
+
+def get_resume_point(existing_pages, start, increment):
+    '''
+    return (last existing page number in the sequence starting at start,
+    number of pages of the sequence up to that page),
+    or (None, 0) if there are no such pages
+
+    Pages that are missing in the middle (e.g. deleted blank pages)
+    are counted too.
+    '''
+    if increment == 0:
+        # every page has the same number
+        if start in existing_pages:
+            return (start, 1)
+        return (None, 0)
+    numbers = [n for n in existing_pages if (n - start) * increment >= 0]
+    if not numbers:
+        return (None, 0)
+    last = max(numbers) if increment > 0 else min(numbers)
+    return (last, (last - start) // increment + 1)
+
+def get_scan_order(existing_pages, increment):
+    '''
+    return filenames of the existing pages, in the order they were scanned
+    '''
+    return [existing_pages[n] for n in sorted(existing_pages, reverse=increment < 0)]
+
+def start_session(options, device, start, batch_count, increment, existing_pages=None, unchecked=()):
+    if options.catalog is not None:
+        options.catalog.begin_session(
+            directory=os.getcwd(),
+            device=device,
+            profile=options.profile,
+            options=ipc.shell_escape(scanimage.get_args(options, device, start, batch_count, increment)),
+        )
+    if options.checksums:
+        try:
+            options.manifest = checksum.Manifest(checksum.manifest_name)
+        except OSError as exc:
+            raise Error(str(exc)) from exc
+    if options.archive_format is not None:
+        path = archive.get_archive_name(options.archive_format)
+        options.archive = archive.Archive(path, options.archive_format)
+    if pages.uses_encoder(options):
+        options.encoder = encoder.Encoder(options.output_format,
+            jobs=options.jobs,
+            dpi=pages.get_resolution(options),
+            quality=options.quality,
+            subsampling=options.subsampling,
+            auto_mode=options.auto_mode,
+            blank_threshold=options.blank_threshold if options.blank_pages != 'keep' else None,
+            blank_directory=pages.blank_directory if options.blank_pages == 'move' else None,
+            derivative_specs=options.derivatives,
+            split_items=options.split_items,
+            deskew=options.deskew,
+            fsync=options.staging_directory is None and options.syncer.sync_on_write,
+        )
+    if options.document_path is not None:
+        options.document = open_document(options)
+        missing = get_scan_order(existing_pages or {}, increment)[options.document.n_pages:]
+        for image_filename in missing:
+            if os.path.exists(image_filename):
+                add_to_document(options, image_filename)
+            else:
+                logger.warning('Cannot add archived page %s to the document', image_filename)
+    for filename in unchecked:
+        pages.finish_file(options, filename)
+    if options.staging_directory is not None:
+        target_directory = os.getcwd()
+        try:
+            staging_directory = tempfile.mkdtemp(prefix='scanhelper.', dir=options.staging_directory)
+        except OSError as exc:
+            raise Error(str(exc)) from exc
+        logger.debug('Staging directory: %s', staging_directory)
+        os.chdir(staging_directory)
+        options.mover = staging.Mover(target_directory, max_backlog=options.staging_backlog)
+
+class Batch:
+
+    '''
+    scanner batch
+
+    finished: future for the number of stored pages, which is set when
+    the batch is post-processed
+    With --split-items, each item counts as a page, and items are numbered
+    consecutively.
+    '''
+
+    def __init__(self, start, increment):
+        self.start = start
+        self.increment = increment
+        self.n_items = 0
+        self.numbers = self._get_numbers()
+        self.n_scanned = 0
+        self.finished = asyncio.get_event_loop().create_future()
+
+    def _get_numbers(self):
+        # Count the items as they are numbered;
+        # with zero increment, the numbers alone wouldn't tell how many there were.
+        for number in itertools.count(self.start, self.increment):
+            self.n_items += 1
+            yield number
+
+async def scan_batches(options, device, wait, start, total_count, queue):
+    '''
+    scan batches, and queue the scanned pages (and the batch ends) for post-processing
+
+    Post-processing of a batch overlaps with waiting for the next one.
+    '''
+    while total_count > 0:
+        try:
+            await wait(options, device)
+        except EOFError:
+            return
+        batch = Batch(start, options.batch_increment)
+        eof = False
+        try:
+            await scan_batch(options, device, wait, batch, min(total_count, options.batch_count), queue)
+        except EOFError:
+            # EOF while waiting for the operator to clear a jam
+            eof = True
+        await queue.put(batch)
+        if eof:
+            return
+        n = batch.n_scanned
+        if options.split_items:
+            # Numbering of the next batch depends on the number of items.
+            n = await batch.finished
+        start += n * batch.increment
+        total_count -= n
+
+async def scan_batch(options, device, wait, batch, count, queue):
+    '''
+    scan a single batch;
+    queue the scanned pages, together with their encoding futures, for post-processing
+
+    If scanimage fails, recover as configured by options.recovery_policy:
+    the batch is either ended, or continued with the next page number.
+    '''
+    geometry = []
+    if options.preview_crop:
+        geometry = await orchestrator.run_in_executor(scanimage.scan_preview, options, device)
+    policy = options.recovery_policy
+    n_retries = 0
+    while batch.n_scanned < count:
+        n_scanned = batch.n_scanned
+        try:
+            await scan_pages(options, device, batch, count, geometry, queue)
+            return
+        except ipc.CalledProcessError as exc:
+            status = exc.returncode
+            if batch.n_scanned > n_scanned:
+                n_retries = 0
+            action = policy.get_action(status, n_retries)
+            if action is None:
+                raise
+        number = batch.start + batch.n_scanned * batch.increment
+        recovery.remove_partial_page(pages.get_page_filename(pages.get_capture_template(options), number))
+        description = recovery.descriptions[status]
+        options.recoveries[description] += 1
+        if action == 'end-batch':
+            logger.warning('Scanning failed (%s); ending the batch', description)
+            return
+        if action == 'retry':
+            delay = policy.get_delay(n_retries)
+            n_retries += 1
+            logger.warning('Scanning failed (%s); retrying in %g s', description, delay)
+            await asyncio.sleep(delay)
+        else:
+            logger.warning('Scanning failed (%s); continuing the batch with page %d', description, number)
+            await wait(options, device)
+
+async def scan_pages(options, device, batch, count, geometry, queue):
+    '''
+    run scanimage for the rest of the batch
+    '''
+    start = batch.start + batch.n_scanned * batch.increment
+    timestamp = time.monotonic()
+    async for page in scanimage.scan_batch(options, device, start, count - batch.n_scanned, batch.increment, geometry):
+        del page
+        number = batch.start + batch.n_scanned * batch.increment
+        batch.n_scanned += 1
+        (previous_timestamp, timestamp) = (timestamp, time.monotonic())
+        capture_filename = pages.get_page_filename(pages.get_capture_template(options), number)
+        if options.recorder is not None:
+            options.recorder.page(capture_filename)
+        capture = Page(capture_filename, number, time.time(), timestamp - previous_timestamp)
+        encoding = None
+        if options.encoder is not None:
+            capture.filename = pages.get_page_filename(options.filename_template, number)
+            encoding = options.encoder.start(capture_filename, capture.filename)
+        await queue.put((batch, capture, encoding))
+
+def process_encoded_page(options, device, page, capture, numbers):
+    '''
+    process the encoded page;
+    return the list of stored pages: none for a blank page, or one for each item of a split page
+    '''
+    if page.blank:
+        pages.finish_blank_page(options, page)
+        return []
+    if page.items is None:
+        capture.filename = page.filename
+        return [process_page(options, device, capture, page.properties)]
+    logger.info('Found %d item(s)', len(page.items))
+    result = []
+    for item in page.items:
+        number = next(numbers)
+        pages.rename_item(item, pages.get_page_filename(options.filename_template, number))
+        item_page = Page(item.filename, number, capture.scanned, capture.scan_time)
+        result += [process_page(options, device, item_page, item.properties)]
+    return result
+
+async def post_process(options, device, item, executor):
+    '''
+    post-process the queued item in the executor;
+    return the list of stored pages
+    '''
+    loop = asyncio.get_event_loop()
+    if isinstance(item, Batch):
+        await loop.run_in_executor(executor, finish_batch, options)
+        n = item.n_scanned
+        if options.split_items:
+            n = item.n_items
+        item.finished.set_result(n)
+        return []
+    (batch, capture, encoding) = item
+    if encoding is None:
+        return [await loop.run_in_executor(executor, process_page, options, device, capture)]
+    try:
+        page = await asyncio.wrap_future(encoding)
+    except encoder.Error as exc:
+        raise Error(f'cannot encode page: {exc}') from exc
+    return await loop.run_in_executor(executor, process_encoded_page, options, device, page, capture, batch.numbers)
+
+def finish_batch(options):
+    if options.archive is not None:
+        options.archive.flush()
+    if options.document is not None:
+        options.document.flush()
+    options.syncer.flush()
+    if options.catalog is not None:
+        options.catalog.flush()
+    report_staging(options)
+
+def finish_session(options):
+    if options.encoder is not None:
+        options.encoder.close()
+    if options.archive is not None:
+        options.archive.close()
+    if options.document is not None:
+        options.document.close()
+    mover = options.mover
+    if mover is not None:
+        mover.drain()
+        staging_directory = os.getcwd()
+        template_directory = os.path.dirname(pages.get_page_filename(options.filename_template, 0))
+        if template_directory:
+            try:
+                os.removedirs(template_directory)
+            except OSError:
+                pass
+        os.chdir(mover.target_directory)
+        for directory in [pages.blank_directory, staging_directory]:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+    if options.manifest is not None:
+        close_manifest(options)
+    if options.recoveries:
+        logger.info('Recovered from: %s', str.join(', ',
+            (f'{description} ({n}x)' for description, n in sorted(options.recoveries.items()))
+        ))
+    if mover is not None and mover.failed:
+        raise Error(f'{len(mover.failed)} file(s) could not be moved to the target directory; see {staging_directory}')
+
+def close_manifest(options):
+    try:
+        options.manifest.close()
+        if options.syncer.policy != 'none':
+            durability.fsync_path(checksum.manifest_name)
+    except OSError as exc:
+        if exc.filename is None:
+            exc.filename = checksum.manifest_name
+        raise Error(str(exc)) from exc
+
+def report_staging(options):
+    mover = options.mover
+    if mover is None:
+        return
+    logger.info('Staging: %d file(s) pending, %.1f MB/s', mover.backlog, mover.throughput / 1e6)
+
+async def probe(options):
+    '''
+    check scanimage version, look up the device, and create the target directory;
+    return (device, target_directory)
+
+    These are independent of each other, so they run concurrently.
+    '''
+    results = await asyncio.gather(
+        orchestrator.run_in_executor(check_scanimage_version, options),
+        orchestrator.run_in_executor(get_device, options),
+        orchestrator.run_in_executor(get_target_directory, options),
+        return_exceptions=True,
+    )
+    (_, device, target_directory) = results
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if not errors:
+        return (device, target_directory)
+    if not isinstance(device, BaseException):
+        device.close()
+    if options.target_directory is None and not isinstance(target_directory, BaseException):
+        # freshly created, so most likely empty
+        try:
+            os.rmdir(target_directory)
+        except OSError:
+            pass
+    exc = errors[0]
+    if isinstance(exc, IndexError):
+        raise Error(str(exc)) from exc
+    raise exc
+
+async def scan_session(options, wait):
+    (device, target_directory) = await probe(options)
+    assert isinstance(device, scanner.Device)
+    if options.staging_directory is not None:
+        options.staging_directory = os.path.abspath(options.staging_directory)
+    os.chdir(target_directory)
+    expand_filename_template(options, device, datetime.datetime.now())
+    start = options.batch_start
+    increment = options.batch_increment
+    batch_count = options.batch_count
+    total_count = options.page_count
+    existing_pages = index_target_directory(options)
+    (last, n_done) = get_resume_point(existing_pages, start, increment)
+    if options.resume and last is not None:
+        logger.info('Resuming after page %d', last)
+        start = last + increment
+        total_count -= n_done
+    elif last is not None:
+        raise Error(
+            f'refusing to overwrite existing pages in {target_directory} (use --resume to continue the session)'
+        )
+    unchecked = []
+    if options.resume:
+        unchecked = pages.complete_pages(options, device, existing_pages)
+    start_session(options, device, start, batch_count, increment, existing_pages, unchecked)
+    # scanimage doesn't create directories:
+    directory = os.path.dirname(pages.get_page_filename(pages.get_capture_template(options), start))
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    ipc_logger.setLevel(logging.DEBUG)
+    # Post-processing runs in a single thread, so that pages are finished in order:
+    executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='scanhelper.session')
+    # Scanning waits when too many pages are being encoded:
+    queue = asyncio.Queue(maxsize=options.encoder.max_backlog if options.encoder is not None else 0)
+    producer = asyncio.ensure_future(scan_batches(options, device, wait, start, total_count, queue))
+    # The queue might be full, so the end marker has to wait for its turn too:
+    producer.add_done_callback(lambda _: asyncio.ensure_future(queue.put(None)))
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            for page in await post_process(options, device, item, executor):
+                yield page
+        await producer
+    except (asyncio.CancelledError, GeneratorExit):
+        # Stop scanning, but finish the pages that were already scanned:
+        await stop(producer)
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is None:
+                break
+            await post_process(options, device, item, executor)
+        raise
+    finally:
+        await stop(producer)
+        executor.shutdown(wait=True)
+        await close_session(options)
+
+async def close_session(options):
+    '''
+    run finish_session() in an executor, so that the event loop isn't blocked
+    while the staged files are being moved
+
+    Cancellation (e.g. by another SIGINT) is refused, as the staged files would be left behind.
+    '''
+    finishing = asyncio.ensure_future(orchestrator.run_in_executor(finish_session, options))
+    while True:
+        try:
+            await asyncio.shield(finishing)
+            return
+        except asyncio.CancelledError:
+            if finishing.done():
+                raise
+            logger.warning('Cannot exit yet: finishing the session')
+
+async def stop(task):
+    '''
+    cancel the task, and wait until it's done
+    '''
+    if not task.done():
+        task.cancel()
+        await asyncio.wait([task])
+
+__all__ = [
+    'Error',
+    'Page',
+    'get_device',
+    'get_options',
+    'scan',
+    'scan_async',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,168 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+asynchronous shipping of staged files to the target directory
+'''
+
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+
+block_size = 1 << 20
+
+class Mover:
+
+    '''
+    background mover of files from the current (staging) directory to the
+    target directory
+
+    At most max_backlog files can be waiting; submit() blocks when the
+    queue is full. Each file is copied to a temporary name, fsync()ed, and
+    renamed into place; only then is the staged copy removed.
+    Failed copies are retried with exponential backoff. Files that could
+    not be moved (or whose callback failed) are recorded in failed.
+    '''
+
+    retries = 5
+    retry_delay = 1
+
+    def __init__(self, target_directory, max_backlog=64):
+        self.target_directory = target_directory
+        self.failed = []
+        self._queue = queue.Queue(maxsize=max_backlog)
+        self._lock = threading.Lock()
+        self._n_bytes = 0
+        self._busy_time = 0.0
+        self._thread = threading.Thread(target=self._run, name='mover')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, filename, callback=None):
+        '''
+        schedule moving of the file
+
+        If callback is not None, it will be called with the file name and
+        its SHA-256 digest (computed while copying) once the file is moved.
+        '''
+        self._queue.put((filename, callback))
+
+    @property
+    def backlog(self):
+        return self._queue.unfinished_tasks
+
+    @property
+    def throughput(self):
+        '''
+        average copying speed, in bytes per second
+        '''
+        with self._lock:
+            if self._busy_time == 0:
+                return 0.0
+            return self._n_bytes / self._busy_time
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._move(*item)
+            except Exception:  # pylint: disable=broad-except
+                # e.g. the callback failed; keep the thread alive, or submit() and drain() would hang
+                (filename, _) = item
+                logger.exception('Cannot move %s', filename)
+                self.failed += [filename]
+            finally:
+                self._queue.task_done()
+
+    def _move(self, filename, callback):
+        for attempt in range(self.retries + 1):
+            start = time.monotonic()
+            try:
+                size, digest = self._copy(filename, hash_=callback is not None)
+            except OSError as exc:
+                if attempt == self.retries:
+                    logger.error('Cannot move %s: %s', filename, exc)
+                    self.failed += [filename]
+                    return
+                delay = self.retry_delay * 2 ** attempt
+                logger.warning('Cannot move %s: %s; retrying in %d s', filename, exc, delay)
+                time.sleep(delay)
+            else:
+                break
+        with self._lock:
+            self._n_bytes += size
+            self._busy_time += time.monotonic() - start
+        try:
+            os.unlink(filename)
+        except OSError as exc:
+            logger.error('Cannot remove staged %s: %s', filename, exc)
+            self.failed += [filename]
+        if callback is not None:
+            callback(filename, digest)
+
+    def _copy(self, filename, hash_):
+        target_path = os.path.join(self.target_directory, filename)
+        target_dir = os.path.dirname(target_path)
+        os.makedirs(target_dir, exist_ok=True)
+        tmp_path = target_path + '.part'
+        digest = hashlib.sha256() if hash_ else None
+        size = 0
+        with open(filename, 'rb') as src, open(tmp_path, 'wb') as dst:
+            while True:
+                block = src.read(block_size)
+                if not block:
+                    break
+                if digest is not None:
+                    digest.update(block)
+                dst.write(block)
+                size += len(block)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.rename(tmp_path, target_path)
+        fd = os.open(target_dir, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        if digest is not None:
+            digest = digest.hexdigest()
+        return size, digest
+
+    def drain(self, report_interval=5):
+        '''
+        wait until all the submitted files are moved,
+        reporting progress every report_interval seconds
+
+        This blocks; in the event loop, call it in an executor.
+        '''
+        self._queue.put(None)
+        while True:
+            self._thread.join(report_interval)
+            if not self._thread.is_alive():
+                break
+            logger.info('Moving files to the target directory: %d pending', self.backlog - 1)
+
+logger = logging.getLogger('scanhelper.staging')
+
+__all__ = [
+    'Mover',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,278 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''filename templates'''
+
+import functools
+import os
+import re
+
+# extra fields (%{name}), which are expanded by scanhelper before the
+# template is passed to scanimage:
+fields = ('session', 'device', 'date')
+
+_specifier = re.compile(r'''
+%
+(?:
+    [{] (?P<field> [^}]* ) [}]
+|
+    (?P<flags> [-+ #0]* )
+    (?P<width> [0-9]* )
+    (?: [.] (?P<precision> [0-9]* ) )?
+    (?P<conversion> [a-zA-Z%] )
+)?
+''', re.VERBOSE)
+
+class Field:
+
+    '''
+    extra field: %{name}
+    '''
+
+    def __init__(self, name):
+        if name not in fields:
+            raise ValueError(f'unknown field in filename template: %{{{name}}}')
+        self.name = name
+
+    def __str__(self):
+        return f'%{{{self.name}}}'
+
+class Conversion:
+
+    '''
+    page number conversion: %d, %i or %u, with optional flags, width and precision
+
+    Formatting follows C printf() semantics, so that file names are
+    identical to those created by scanimage.
+    '''
+
+    def __init__(self, flags, width, precision, conversion):
+        self.spec = f'%{flags}{width}' + ('' if precision is None else f'.{precision}') + conversion
+        if conversion not in 'diu':
+            raise ValueError(f'unsupported conversion in filename template: {self.spec}')
+        self.signed = conversion != 'u'
+        self.width = int(width or 0)
+        self.precision = None if precision is None else int(precision or 0)
+        # padding: '-' (spaces on the right), '0' (zeros after the sign) or '' (spaces on the left)
+        self.padding = ''
+        if '-' in flags:
+            self.padding = '-'
+        elif '0' in flags and self.precision is None:
+            self.padding = '0'
+        self.sign = ''
+        if self.signed:
+            if '+' in flags:
+                self.sign = '+'
+            elif ' ' in flags:
+                self.sign = ' '
+        # Without precision, Python's %-formatting agrees with C,
+        # except for sign flags, which are meaningless for %u:
+        self.python_spec = None
+        if self.precision is None:
+            python_flags = flags if self.signed else flags.replace('+', '').replace(' ', '')
+            self.python_spec = f'%{python_flags}{width}d'
+
+    def format(self, n):
+        if not self.signed:
+            # unsigned int
+            n %= 1 << 32
+        if self.python_spec is not None:
+            return self.python_spec % n
+        if self.signed:
+            sign = '-' if n < 0 else self.sign
+        else:
+            sign = ''
+        digits = str(abs(n))
+        if self.precision is not None:
+            digits = digits.zfill(self.precision) if n or self.precision else ''
+        padding = self.width - len(sign) - len(digits)
+        if padding <= 0:
+            return sign + digits
+        if self.padding == '-':
+            return sign + digits + ' ' * padding
+        if self.padding == '0':
+            return sign + '0' * padding + digits
+        return ' ' * padding + sign + digits
+
+    def __str__(self):
+        return self.spec
+
+class Template:
+
+    '''
+    compiled filename template
+
+    The template is a printf-style format string with exactly one page
+    number conversion, as accepted by scanimage --batch; it can also
+    contain extra fields (see the "fields" variable), which must be
+    expanded before formatting file names.
+    '''
+
+    def __init__(self, template):
+        self.tokens = []
+        pos = 0
+        for match in _specifier.finditer(template):
+            literal = template[pos:match.start()]
+            pos = match.end()
+            if literal:
+                self.tokens += [literal]
+            if match.group('field') is not None:
+                self.tokens += [Field(match.group('field'))]
+            elif match.group('conversion') is None:
+                raise ValueError('incomplete conversion in filename template')
+            elif match.group('conversion') == '%':
+                if match.group() != '%%':
+                    raise ValueError(f'unsupported conversion in filename template: {match.group()}')
+                self.tokens += ['%']
+            else:
+                self.tokens += [Conversion(*match.group('flags', 'width', 'precision', 'conversion'))]
+        if template[pos:]:
+            self.tokens += [template[pos:]]
+        self.tokens = _merge_literals(self.tokens)
+        conversions = [t for t in self.tokens if isinstance(t, Conversion)]
+        if len(conversions) != 1:
+            raise ValueError('filename template must contain exactly one page number conversion')
+        [self._conversion] = conversions
+        self.fields = [t.name for t in self.tokens if isinstance(t, Field)]
+        self._prefix = self._suffix = self._python_format = None
+        if not self.fields:
+            i = self.tokens.index(self._conversion)
+            self._prefix = str.join('', self.tokens[:i])
+            self._suffix = str.join('', self.tokens[i + 1:])
+            if self._conversion.signed and self._conversion.python_spec is not None:
+                # fast path: a single %-formatting operation
+                self._python_format = str.join('', [
+                    self._prefix.replace('%', '%%'),
+                    self._conversion.python_spec,
+                    self._suffix.replace('%', '%%'),
+                ])
+
+    def expand(self, **values):
+        '''
+        return a new template with the extra fields replaced by the values
+        '''
+        result = str.join('', (
+            str(values[t.name]).replace('%', '%%') if isinstance(t, Field)
+            else str(t) if isinstance(t, Conversion)
+            else t.replace('%', '%%')
+            for t in self.tokens
+        ))
+        return Template(result)
+
+    def format(self, n):
+        '''
+        return file name for page n
+        '''
+        if self._python_format is not None:
+            return self._python_format % n
+        if self.fields:
+            raise ValueError('filename template has unexpanded fields')
+        return self._prefix + self._conversion.format(n) + self._suffix
+
+    def format_batch(self, start, count, increment=1):
+        '''
+        return list of file names for the batch of pages
+        '''
+        numbers = range(start, start + count * increment, increment)
+        if self._python_format is not None:
+            fmt = self._python_format
+            return [fmt % n for n in numbers]
+        return [self.format(n) for n in numbers]
+
+    def get_regex(self):
+        '''
+        return regex matching file names generated from the template
+
+        The page number is captured as the first group.
+        '''
+        if self.fields:
+            raise ValueError('filename template has unexpanded fields')
+        regex = ''
+        for token in self.tokens:
+            if isinstance(token, Conversion):
+                regex += '[ ]*([-+ ]?[0-9]+)[ ]*'
+            else:
+                regex += re.escape(token)
+        return re.compile(regex + r'\Z')
+
+    def __str__(self):
+        '''
+        return the template in the scanimage --batch syntax
+        '''
+        return str.join('', (
+            t.replace('%', '%%') if isinstance(t, str) else str(t)
+            for t in self.tokens
+        ))
+
+def _merge_literals(tokens):
+    result = []
+    for token in tokens:
+        if result and isinstance(token, str) and isinstance(result[-1], str):
+            result[-1] += token
+        else:
+            result += [token]
+    return result
+
+@functools.lru_cache(maxsize=None)
+def parse(template):
+    '''
+    return compiled filename template; raise ValueError if it's not valid
+
+    The result is cached.
+    '''
+    return Template(template)
+
+def get_regex(template):
+    '''
+    return regex matching file names generated from the --batch-mode template
+
+    The page number is captured as the first group.
+    '''
+    return parse(template).get_regex()
+
+def index_pages(template, filenames=None):
+    '''
+    return {page number: file name} for files matching the template
+
+    By default, existing files are considered.
+    '''
+    directory, basename = os.path.split(template)
+    if '%' in directory:
+        raise ValueError('page number must be in the last component of the filename template')
+    regex = get_regex(basename)
+    if filenames is None:
+        try:
+            filenames = [os.path.join(directory, name) for name in os.listdir(directory or os.curdir)]
+        except FileNotFoundError:
+            filenames = []
+    pages = {}
+    for filename in filenames:
+        file_directory, name = os.path.split(filename)
+        if file_directory != directory:
+            continue
+        match = regex.match(name)
+        if match:
+            pages[int(match.group(1))] = filename
+    return pages
+
+__all__ = [
+    'Template',
+    'fields',
+    'get_regex',
+    'index_pages',
+    'parse',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,389 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''minimal TIFF reader and writer'''
+
+import os
+import struct
+import zlib
+
+from . import utils
+
+try:
+    import PIL.Image
+except ImportError as ex:
+    utils.enhance_import_error(ex, 'Pillow', 'python3-pil', 'https://pypi.org/project/Pillow/')
+    raise
+
+signatures = (b'II*\0', b'MM\0*')
+
+class Tag:
+    IMAGE_WIDTH = 256
+    IMAGE_LENGTH = 257
+    BITS_PER_SAMPLE = 258
+    COMPRESSION = 259
+    PHOTOMETRIC = 262
+    FILL_ORDER = 266
+    MAKE = 271
+    MODEL = 272
+    STRIP_OFFSETS = 273
+    SAMPLES_PER_PIXEL = 277
+    ROWS_PER_STRIP = 278
+    STRIP_BYTE_COUNTS = 279
+    X_RESOLUTION = 282
+    Y_RESOLUTION = 283
+    PLANAR_CONFIGURATION = 284
+    RESOLUTION_UNIT = 296
+    DATE_TIME = 306
+    PREDICTOR = 317
+    COLOR_MAP = 320
+    EXTRA_SAMPLES = 338
+    SAMPLE_FORMAT = 339
+    XMP = 700
+
+class Type:
+    BYTE = 1
+    ASCII = 2
+    SHORT = 3
+    LONG = 4
+    RATIONAL = 5
+    UNDEFINED = 7
+
+# type: (struct format, size)
+_types = {
+    1: ('B', 1),
+    2: ('B', 1),
+    3: ('H', 2),
+    4: ('I', 4),
+    5: ('I', 8),
+    6: ('b', 1),
+    7: ('B', 1),
+    8: ('h', 2),
+    9: ('i', 4),
+    10: ('i', 8),
+    11: ('f', 4),
+    12: ('d', 8),
+    13: ('I', 4),
+}
+
+# tags describing the image data, which are copied when assembling pages:
+_image_tags = (
+    Tag.IMAGE_WIDTH,
+    Tag.IMAGE_LENGTH,
+    Tag.BITS_PER_SAMPLE,
+    Tag.COMPRESSION,
+    Tag.PHOTOMETRIC,
+    Tag.FILL_ORDER,
+    Tag.SAMPLES_PER_PIXEL,
+    Tag.ROWS_PER_STRIP,
+    Tag.X_RESOLUTION,
+    Tag.Y_RESOLUTION,
+    Tag.PLANAR_CONFIGURATION,
+    Tag.RESOLUTION_UNIT,
+    Tag.PREDICTOR,
+    Tag.COLOR_MAP,
+    Tag.EXTRA_SAMPLES,
+    Tag.SAMPLE_FORMAT,
+    Tag.XMP,
+)
+
+# PIL mode: (bits per sample, photometric interpretation)
+_pil_modes = {
+    '1': (1, 1),
+    'L': (8, 1),
+    'RGB': (8, 2),
+    'I;16': (16, 1),
+}
+
+class Error(ValueError):
+    pass
+
+def encode(type_, values, byte_order='<'):
+    '''
+    return the TIFF representation of the values
+    '''
+    if type_ in {Type.BYTE, Type.ASCII, Type.UNDEFINED} and isinstance(values, bytes):
+        if type_ == Type.ASCII and not values.endswith(b'\0'):
+            values += b'\0'
+        return len(values), values
+    fmt, _ = _types[type_]
+    if type_ in {5, 10}:
+        flat_values = [x for pair in values for x in pair]
+        return len(values), struct.pack(f'{byte_order}{len(flat_values)}{fmt}', *flat_values)
+    return len(values), struct.pack(f'{byte_order}{len(values)}{fmt}', *values)
+
+def decode(type_, count, data, byte_order='<'):
+    if type_ not in _types:
+        return data
+    if type_ in {Type.BYTE, Type.UNDEFINED}:
+        return data
+    if type_ == Type.ASCII:
+        return data.rstrip(b'\0')
+    fmt, _ = _types[type_]
+    if type_ in {5, 10}:
+        values = struct.unpack(f'{byte_order}{2 * count}{fmt}', data)
+        return tuple(zip(values[::2], values[1::2]))
+    return struct.unpack(f'{byte_order}{count}{fmt}', data)
+
+class IFD:
+
+    '''
+    image file directory
+
+    entries: {tag: (type, count, raw data)}
+    '''
+
+    def __init__(self, byte_order, offset=None):
+        self.byte_order = byte_order
+        self.offset = offset
+        self.next_pointer_offset = None
+        self.entries = {}
+
+    def __contains__(self, tag):
+        return tag in self.entries
+
+    def __getitem__(self, tag):
+        (type_, count, data) = self.entries[tag]
+        return decode(type_, count, data, self.byte_order)
+
+    def get(self, tag, default=None):
+        if tag in self.entries:
+            return self[tag]
+        return default
+
+    def set(self, tag, type_, values):
+        (count, data) = encode(type_, values, self.byte_order)
+        self.entries[tag] = (type_, count, data)
+
+def read_header(file):
+    '''
+    return (byte order, offset of the first IFD)
+    '''
+    file.seek(0)
+    header = file.read(8)
+    if header[:4] not in signatures:
+        raise Error('not a TIFF file')
+    byte_order = '<' if header[:2] == b'II' else '>'
+    (offset,) = struct.unpack(byte_order + 'I', header[4:])
+    return byte_order, offset
+
+def read_ifds(file):
+    '''
+    yield all the IFDs of the TIFF file
+    '''
+    (byte_order, offset) = read_header(file)
+    seen = set()
+    while offset:
+        if offset in seen:
+            raise Error('IFD loop in TIFF file')
+        seen.add(offset)
+        ifd = IFD(byte_order, offset)
+        file.seek(offset)
+        (n,) = struct.unpack(byte_order + 'H', _read(file, 2))
+        raw_entries = _read(file, 12 * n)
+        ifd.next_pointer_offset = offset + 2 + 12 * n
+        (next_offset,) = struct.unpack(byte_order + 'I', _read(file, 4))
+        for i in range(n):
+            (tag, type_, count, value) = struct.unpack(byte_order + 'HHI4s', raw_entries[12 * i:12 * i + 12])
+            size = _types.get(type_, ('B', 1))[1] * count
+            if size > 4:
+                (value_offset,) = struct.unpack(byte_order + 'I', value)
+                file.seek(value_offset)
+                value = _read(file, size)
+            ifd.entries[tag] = (type_, count, value[:size])
+        yield ifd
+        offset = next_offset
+
+def _read(file, size):
+    data = file.read(size)
+    if len(data) < size:
+        raise Error('truncated TIFF file')
+    return data
+
+def write_ifd(file, ifd):
+    '''
+    append the IFD (and values that don't fit into it) to the end of the file;
+    return its offset
+    '''
+    byte_order = ifd.byte_order
+    file.seek(0, os.SEEK_END)
+    entries = []
+    for tag in sorted(ifd.entries):
+        (type_, count, data) = ifd.entries[tag]
+        if len(data) > 4:
+            _align(file)
+            offset = file.tell()
+            file.write(data)
+            data = struct.pack(byte_order + 'I', offset)
+        entries += [struct.pack(byte_order + 'HHI', tag, type_, count) + data.ljust(4, b'\0')]
+    _align(file)
+    offset = file.tell()
+    file.write(struct.pack(byte_order + 'H', len(entries)))
+    file.write(b''.join(entries))
+    ifd.offset = offset
+    ifd.next_pointer_offset = file.tell()
+    file.write(b'\0\0\0\0')
+    return offset
+
+def embed_xmp(file, xmp_data):
+    '''
+    set the XMP tag of the first IFD of the TIFF file (opened for reading and writing)
+
+    The modified IFD is appended to the end of the file, and then linked
+    in place of the original one, so that the image data stays intact and
+    the file is valid at all times.
+    '''
+    (byte_order, _) = read_header(file)
+    ifd = next(read_ifds(file), None)
+    if ifd is None:
+        raise Error('no images in TIFF file')
+    file.seek(ifd.next_pointer_offset)
+    next_pointer = _read(file, 4)
+    ifd.set(Tag.XMP, Type.BYTE, xmp_data)
+    offset = write_ifd(file, ifd)
+    file.seek(ifd.next_pointer_offset)
+    file.write(next_pointer)
+    file.flush()
+    file.seek(4)
+    file.write(struct.pack(byte_order + 'I', offset))
+
+def _align(file):
+    if file.tell() & 1:
+        file.write(b'\0')
+
+class Writer:
+
+    '''
+    multi-page TIFF file, to which pages are appended as they are complete
+
+    The file is valid after each added page.
+    TIFF pages are copied without re-encoding;
+    other images are decoded and stored with Deflate compression.
+    resolution is recorded for decoded images that don't specify theirs (e.g. PNM).
+    '''
+
+    def __init__(self, path, resolution=None):
+        self.path = path
+        self.resolution = resolution
+        self.n_pages = 0
+        if os.path.exists(path):
+            self._file = open(path, 'r+b')  # pylint: disable=consider-using-with
+            (self._byte_order, _) = read_header(self._file)
+            self._next_pointer_offset = 4
+            for ifd in read_ifds(self._file):
+                self._next_pointer_offset = ifd.next_pointer_offset
+                self.n_pages += 1
+        else:
+            self._file = open(path, 'w+b')  # pylint: disable=consider-using-with
+            self._byte_order = '<'
+            self._file.write(b'II*\0\0\0\0\0')
+            self._next_pointer_offset = 4
+
+    def add(self, filename):
+        with open(filename, 'rb') as file:
+            ifd = None
+            if file.read(4) in signatures:
+                ifd = self._copy_tiff(file)
+            if ifd is None:
+                ifd = self._encode_image(filename)
+        offset = write_ifd(self._file, ifd)
+        # Link the new IFD only when it's complete, so that the file is
+        # valid at all times.
+        self._file.seek(self._next_pointer_offset)
+        self._file.write(struct.pack(self._byte_order + 'I', offset))
+        self._file.seek(0, os.SEEK_END)
+        self._next_pointer_offset = ifd.next_pointer_offset
+        self.n_pages += 1
+
+    def _copy_tiff(self, file):
+        source = next(read_ifds(file), None)
+        if source is None or Tag.STRIP_OFFSETS not in source:
+            # tiled images are not supported
+            return None
+        bits = source.get(Tag.BITS_PER_SAMPLE, (1,))
+        if source.byte_order != self._byte_order and max(bits) > 8:
+            return None
+        ifd = IFD(self._byte_order)
+        for tag in _image_tags:
+            if tag in source:
+                (type_, _, _) = source.entries[tag]
+                ifd.set(tag, type_, source[tag])
+        offsets = []
+        self._file.seek(0, os.SEEK_END)
+        for offset, size in zip(source[Tag.STRIP_OFFSETS], source[Tag.STRIP_BYTE_COUNTS]):
+            offsets += [self._file.tell()]
+            file.seek(offset)
+            while size > 0:
+                block = _read(file, min(size, 1 << 20))
+                self._file.write(block)
+                size -= len(block)
+        ifd.set(Tag.STRIP_OFFSETS, Type.LONG, offsets)
+        ifd.set(Tag.STRIP_BYTE_COUNTS, Type.LONG, source[Tag.STRIP_BYTE_COUNTS])
+        return ifd
+
+    def _encode_image(self, filename):
+        with PIL.Image.open(filename) as image:
+            if image.mode not in _pil_modes:
+                image = image.convert('RGB')
+            (width, height) = image.size
+            dpi = image.info.get('dpi')
+            if not dpi and self.resolution:
+                dpi = (self.resolution, self.resolution)
+            data = image.tobytes()
+            (bits, photometric) = _pil_modes[image.mode]
+            samples = len(image.getbands())
+        ifd = IFD(self._byte_order)
+        ifd.set(Tag.IMAGE_WIDTH, Type.LONG, [width])
+        ifd.set(Tag.IMAGE_LENGTH, Type.LONG, [height])
+        ifd.set(Tag.BITS_PER_SAMPLE, Type.SHORT, [bits] * samples)
+        ifd.set(Tag.COMPRESSION, Type.SHORT, [8])
+        ifd.set(Tag.PHOTOMETRIC, Type.SHORT, [photometric])
+        ifd.set(Tag.SAMPLES_PER_PIXEL, Type.SHORT, [samples])
+        ifd.set(Tag.ROWS_PER_STRIP, Type.LONG, [height])
+        if dpi:
+            dpi = round(max(dpi))
+            ifd.set(Tag.X_RESOLUTION, Type.RATIONAL, [(dpi, 1)])
+            ifd.set(Tag.Y_RESOLUTION, Type.RATIONAL, [(dpi, 1)])
+            ifd.set(Tag.RESOLUTION_UNIT, Type.SHORT, [2])
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        compressor = zlib.compressobj()
+        view = memoryview(data)
+        for i in range(0, len(view), 1 << 20):
+            self._file.write(compressor.compress(view[i:i + (1 << 20)]))
+        self._file.write(compressor.flush())
+        ifd.set(Tag.STRIP_OFFSETS, Type.LONG, [offset])
+        ifd.set(Tag.STRIP_BYTE_COUNTS, Type.LONG, [self._file.tell() - offset])
+        return ifd
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+__all__ = [
+    'Error',
+    'IFD',
+    'Tag',
+    'Type',
+    'Writer',
+    'embed_xmp',
+    'read_ifds',
+    'signatures',
+    'write_ifd',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -28,9 +28,25 @@ def enhance_import_error(exception, package, debian_package, homepage):
         message += f' <{homepage}>'
     exception.msg = message
 
+# Pillow modes of 16-bit grayscale images:
+pil_16bit_modes = frozenset({'I', 'I;16', 'I;16B', 'I;16L', 'I;16N'})
+
+def to_8bit(image):
+    '''
+    convert 16-bit grayscale Pillow image to 8-bit one ("L" mode);
+    return other images as they are
+
+    Pillow's convert() would clip the values instead of scaling them.
+    '''
+    if image.mode in pil_16bit_modes:
+        return image.convert('I').point(lambda v: v / 256).convert('L')
+    return image
+
 __all__ = [
     'debian',
     'enhance_import_error',
+    'pil_16bit_modes',
+    'to_8bit',
 ]
 
 # vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,101 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+lazy enumeration of input images
+'''
+
+import fnmatch
+import os
+
+from . import pages
+
+def read_paths(file, block_size=1 << 16):
+    '''
+    yield NUL-separated paths from the binary file
+    '''
+    tail = b''
+    while True:
+        block = file.read(block_size)
+        if not block:
+            break
+        *paths, tail = (tail + block).split(b'\0')
+        for path in paths:
+            if path:
+                yield os.fsdecode(path)
+    if tail:
+        yield os.fsdecode(tail)
+
+class Filter:
+
+    '''
+    include: glob patterns for names of files to take while walking directories
+    (default: image files);
+    exclude: glob patterns for names of files and directories to skip
+    '''
+
+    def __init__(self, include=(), exclude=()):
+        self.include = list(include)
+        self.exclude = list(exclude)
+
+    @staticmethod
+    def _match(name, patterns):
+        return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+    def wants_directory(self, name):
+        return not self._match(name, self.exclude)
+
+    def wants_file(self, name):
+        if self._match(name, self.exclude):
+            return False
+        if self.include:
+            return self._match(name, self.include)
+        return pages.is_image(name)
+
+def iter_images(paths, filter_=None):
+    '''
+    yield image paths: the given paths themselves, or, for directories,
+    the files found by walking them recursively (in sorted order),
+    as permitted by the filter
+
+    Symbolic links to directories are not followed while walking.
+    Only listings of the directories on the current path are kept in memory.
+    '''
+    if filter_ is None:
+        filter_ = Filter()
+    for path in paths:
+        if os.path.isdir(path):
+            yield from _walk(path, filter_)
+        else:
+            yield path
+
+def _walk(directory, filter_):
+    with os.scandir(directory) as entries:
+        entries = sorted((entry.name, entry.is_dir(follow_symlinks=False)) for entry in entries)
+    for (name, is_dir) in entries:
+        path = os.path.join(directory, name)
+        if is_dir:
+            if filter_.wants_directory(name):
+                yield from _walk(path, filter_)
+        elif filter_.wants_file(name):
+            yield path
+
+__all__ = [
+    'Filter',
+    'iter_images',
+    'read_paths',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,223 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+'''
+watching a directory for new images (Linux only)
+'''
+
+import concurrent.futures
+import ctypes
+import logging
+import os
+import select
+import struct
+import threading
+
+from . import pages
+
+logger = logging.getLogger('scanhelper.main')
+
+# <sys/inotify.h> constants:
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+_event_header = struct.Struct('iIII')
+
+class Error(RuntimeError):
+    pass
+
+class Inotify:
+
+    '''
+    thin wrapper for the inotify API
+    '''
+
+    def __init__(self):
+        libc = ctypes.CDLL(None, use_errno=True)
+        try:
+            self._add_watch = libc.inotify_add_watch
+            init = libc.inotify_init1
+        except AttributeError:
+            raise Error('inotify is not supported on this system') from None
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            self._raise()
+
+    @staticmethod
+    def _raise(path=None):
+        errno_ = ctypes.get_errno()
+        raise OSError(errno_, os.strerror(errno_), path)
+
+    def add_watch(self, path, mask):
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            self._raise(path)
+        return wd
+
+    def read(self):
+        '''
+        return list of pending (wd, mask, name) events, without blocking
+        '''
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            (wd, mask, _, length) = _event_header.unpack_from(data, offset)
+            offset += _event_header.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events += [(wd, mask, os.fsdecode(name))]
+        return events
+
+    def fileno(self):
+        return self.fd
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class Watcher:
+
+    '''
+    call handler(path) in a pool of worker threads for each image that is
+    completely written to (or moved into) the directory
+
+    Events are coalesced: a file is never handled by two workers at once,
+    and any number of events that arrive while the file is queued or being
+    handled cause only one more call.
+    '''
+
+    def __init__(self, directory, handler, jobs=None):
+        self.directory = directory
+        self._handler = handler
+        self._jobs = jobs
+        self._states = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._stop_pipe = os.pipe()
+
+    def run(self):
+        '''
+        handle events until stop() is called (or until the directory is gone);
+        then wait for the pending handlers
+        '''
+        with Inotify() as inotify:
+            inotify.add_watch(self.directory, IN_CLOSE_WRITE | IN_MOVED_TO | IN_ONLYDIR)
+            poll = select.poll()
+            poll.register(inotify, select.POLLIN)
+            poll.register(self._stop_pipe[0], select.POLLIN)
+            executor = concurrent.futures.ThreadPoolExecutor(self._jobs, thread_name_prefix='scanhelper.watch')
+            self._executor = executor
+            try:
+                self._loop(inotify, poll)
+            finally:
+                with self._lock:
+                    self._executor = None
+                    for fd in self._stop_pipe:
+                        os.close(fd)
+                    self._stop_pipe = None
+                executor.shutdown(wait=True)
+
+    def _loop(self, inotify, poll):
+        while True:
+            try:
+                ready = {fd for fd, _ in poll.poll()}
+            except InterruptedError:
+                continue
+            if self._stop_pipe[0] in ready:
+                return
+            names = {}
+            for (_, mask, name) in inotify.read():
+                if mask & IN_IGNORED:
+                    raise Error(f'{self.directory}: directory is no longer watched')
+                if mask & IN_Q_OVERFLOW:
+                    logger.warning('Too many events; rescanning %s', self.directory)
+                    names.update(dict.fromkeys(self._get_stale()))
+                elif pages.is_image(name):
+                    names[name] = None
+            for name in names:
+                self._submit(os.path.join(self.directory, name))
+
+    def _get_stale(self):
+        '''
+        return names of images whose sidecars are missing or older than the image
+        '''
+        for entry in os.scandir(self.directory):
+            if not pages.is_image(entry.name):
+                continue
+            try:
+                xmp_mtime = os.stat(entry.path + '.xmp').st_mtime
+            except FileNotFoundError:
+                xmp_mtime = None
+            if xmp_mtime is None or xmp_mtime < entry.stat().st_mtime:
+                yield entry.name
+
+    def _submit(self, path):
+        with self._lock:
+            state = self._states.get(path)
+            if state is None:
+                self._states[path] = 'queued'
+                self._executor.submit(self._handle, path)
+            elif state == 'running':
+                self._states[path] = 'again'
+
+    def _handle(self, path):
+        with self._lock:
+            self._states[path] = 'running'
+        try:
+            self._handler(path)
+        except FileNotFoundError:
+            # The file was (re)moved in the meantime.
+            pass
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Cannot handle %s', path)
+        finally:
+            with self._lock:
+                if self._states[path] == 'again' and self._executor is not None:
+                    self._states[path] = 'queued'
+                    self._executor.submit(self._handle, path)
+                else:
+                    del self._states[path]
+
+    def stop(self):
+        '''
+        make run() return; this can be called from other threads
+        '''
+        with self._lock:
+            if self._stop_pipe is not None:
+                os.write(self._stop_pipe[1], b'\0')
+
+__all__ = [
+    'Error',
+    'Watcher',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -35,7 +35,17 @@ def load_config_paths(resource):
         if os.path.exists(path):
             yield path
 
+def get_runtime_dir():
+    '''
+    return $XDG_RUNTIME_DIR, or None if it's not set
+    '''
+    path = os.environ.get('XDG_RUNTIME_DIR') or ''
+    if not os.path.isabs(path):
+        return None
+    return path
+
 __all__ = [
+    'get_runtime_dir',
     'load_config_paths',
 ]
 
@@ -16,12 +16,18 @@
 '''XMP support'''
 
 import datetime
+import email.utils
 import os
 import re
+import struct
 import time
 import uuid
 import xml.dom.minidom as minidom
+import zlib
 
+from . import durability
+from . import png
+from . import tiff
 from . import utils
 
 try:
@@ -48,6 +54,8 @@ documented_template = '''\
     xmlns:tiff="http://ns.adobe.com/tiff/1.0/"
     xmlns:xmpMM="http://ns.adobe.com/xap/1.0/mm/"
     xmlns:stEvt="http://ns.adobe.com/xap/1.0/sType/ResourceEvent#"
+    xmlns:stMfs="http://ns.adobe.com/xap/1.0/sType/ManifestItem#"
+    xmlns:stRef="http://ns.adobe.com/xap/1.0/sType/ResourceRef#"
 >
 <rdf:RDF>
     <rdf:Description rdf:about="">
@@ -78,8 +86,31 @@ documented_template = '''\
                     <stEvt:when>{{image_timestamp}}</stEvt:when>
                     <stEvt:instanceID>{{instance_id}}</stEvt:instanceID>
                 </rdf:li>
+{% if color_mode %}\
+                <rdf:li rdf:parseType="Resource">
+                    <stEvt:action>converted</stEvt:action>
+                    <stEvt:parameters>colour mode: {{color_mode}}</stEvt:parameters> # automatically selected colour mode (``color``, ``gray`` or ``bilevel``)
+                    <stEvt:softwareAgent>scanhelper {{version}}</stEvt:softwareAgent>
+                    <stEvt:when>{{metadata_timestamp}}</stEvt:when>
+                </rdf:li>
+{% endif %}\
             </rdf:Seq>
         </xmpMM:History>
+{% if derivatives %}\
+        <xmpMM:Manifest>
+            <rdf:Bag>
+{% for derivative in derivatives %}\
+                <rdf:li rdf:parseType="Resource">
+                    <stMfs:linkForm>ReferenceStream</stMfs:linkForm>
+                    <stMfs:reference rdf:parseType="Resource">
+                        <stRef:filePath>{{derivative.filename}}</stRef:filePath>
+                        <stRef:renditionClass>{{derivative.name}}</stRef:renditionClass>
+                    </stMfs:reference>
+                </rdf:li>
+{% endfor %}\
+            </rdf:Bag>
+        </xmpMM:Manifest>
+{% endif %}\
     </rdf:Description>
 </rdf:RDF>
 </x:xmpmeta>
@@ -91,9 +122,12 @@ You can use the ``--xmp`` option to generate XMP metadata for each scanned
 image in a separate file (so called *sidecar XMP file*).
 
 It is also possible to reconstruct XMP metadata for existing files using the
-``--reconstruct-xmp`` option. However, scanhelper is not always able to extract
-all the needed information correctly (e.g. old versions of scanhelper didn't
-preserve information about resolution). To work around this problem, there is
+``--reconstruct-xmp`` option. Scanner vendor and model, and image creation
+date are then taken from the image's own TIFF tags or PNG chunks; only if
+they are missing, the current scanner and file modification time are used.
+However, scanhelper is not always able to extract all the needed information
+correctly (e.g. old versions of scanhelper didn't preserve information about
+resolution). To work around this problem, there is
 ``--override-xmp KEY=VALUE ...`` option that allows you to override some
 metadata items.
 '''
@@ -131,6 +165,8 @@ media_types = dict(
     PPM='image/x-portable-anymap',
     PNG='image/png',
     TIFF='image/tiff',
+    JPEG='image/jpeg',
+    WEBP='image/webp',
 )
 
 class rfc3339:
@@ -156,7 +192,103 @@ def gen_uuid():
     # https://www.rfc-editor.org/rfc/rfc4122.html#section-3
     return f'urn:uuid:{uuid.uuid4()}'
 
-def write(xmp_file, image_filename, device, override):
+def _parse_tiff_datetime(value):
+    # "YYYY:MM:DD HH:MM:SS", in local time
+    return time.mktime(time.strptime(value, '%Y:%m:%d %H:%M:%S'))
+
+def _parse_png_time(value):
+    # (year, month, day, hour, minute, second), in UTC
+    return datetime.datetime(*value, tzinfo=datetime.timezone.utc).timestamp()
+
+def _parse_png_creation_time(value):
+    # RFC 1123 date, as recommended by the PNG specification
+    return email.utils.parsedate_to_datetime(value).timestamp()
+
+def _timestamp(parse, value):
+    try:
+        return rfc3339(parse(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+_png_time = struct.Struct('>HBBBBB')
+
+def _read_png_tags(file):
+    if file.read(8) != png.signature:
+        raise png.Error('not a PNG file')
+    text = {}
+    png_time = None
+    for ctype, data in png.read_chunks(file):
+        if ctype == b'tIME':
+            # malformed time chunks are not fatal (and they are ignored)
+            if len(data) == _png_time.size:
+                png_time = _png_time.unpack(data)
+        elif ctype in {b'tEXt', b'zTXt', b'iTXt'}:
+            try:
+                (keyword, value) = png.parse_text(ctype, data)
+            except (ValueError, zlib.error):
+                # malformed text chunks are not fatal
+                continue
+            text[keyword] = value
+        elif ctype == b'IDAT':
+            # Don't bother reading the image data.
+            break
+    timestamp = None
+    if 'Creation Time' in text:
+        timestamp = _timestamp(_parse_png_creation_time, text['Creation Time'])
+    if timestamp is None and png_time is not None:
+        timestamp = _timestamp(_parse_png_time, png_time)
+    return dict(
+        device_vendor=text.get('Make'),
+        device_model=text.get('Model') or text.get('Source'),
+        image_timestamp=timestamp,
+    )
+
+def _read_tiff_tags(file):
+    ifd = next(tiff.read_ifds(file), None)
+    if ifd is None:
+        return {}
+    def get_text(tag):
+        value = ifd.get(tag)
+        if isinstance(value, bytes):
+            return value.decode('UTF-8', 'replace')
+        return None
+    timestamp = get_text(tiff.Tag.DATE_TIME)
+    if timestamp is not None:
+        timestamp = _timestamp(_parse_tiff_datetime, timestamp)
+    return dict(
+        device_vendor=get_text(tiff.Tag.MAKE),
+        device_model=get_text(tiff.Tag.MODEL),
+        image_timestamp=timestamp,
+    )
+
+def read_tags(image_filename):
+    '''
+    return XMP parameters (device_vendor, device_model, image_timestamp)
+    found in the PNG or TIFF file's own metadata
+
+    Malformed or missing metadata is silently ignored.
+    '''
+    with open(image_filename, 'rb') as file:
+        magic = file.read(8)
+        file.seek(0)
+        try:
+            if magic == png.signature:
+                tags = _read_png_tags(file)
+            elif magic[:4] in tiff.signatures:
+                tags = _read_tiff_tags(file)
+            else:
+                tags = {}
+        except (png.Error, tiff.Error):
+            tags = {}
+    parameters = {}
+    for (key, value) in tags.items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value:
+            parameters[key] = value
+    return parameters
+
+def get_parameters(image_filename, device, override):
     image_timestamp = mtime(image_filename)
     metadata_timestamp = now()
     with PIL.Image.open(image_filename) as image:
@@ -169,8 +301,6 @@ def write(xmp_file, image_filename, device, override):
         media_type = media_types[image.format]
     parameters = dict(
         version=__version__,
-        device_vendor=device.vendor,
-        device_model=device.model,
         image_timestamp=image_timestamp,
         metadata_timestamp=metadata_timestamp,
         media_type=media_type,
@@ -181,10 +311,57 @@ def write(xmp_file, image_filename, device, override):
         instance_id=gen_uuid(),
     )
     parameters.update(override)
+    # Look at the device only if needed, as it could be expensive to find:
+    if 'device_vendor' not in parameters:
+        parameters['device_vendor'] = device.vendor
+    if 'device_model' not in parameters:
+        parameters['device_model'] = device.model
+    return parameters
+
+def render(image_filename, device, override):
+    '''
+    return (XMP packet, parameters)
+    '''
+    parameters = get_parameters(image_filename, device, override)
     xmp_data = template.render(**parameters).encode('UTF-8')
     assert minidom.parseString(xmp_data)
+    return xmp_data, parameters
+
+def write(xmp_file, image_filename, device, override):
+    (xmp_data, parameters) = render(image_filename, device, override)
     xmp_file.write(xmp_data)
+    return parameters
+
+def embed(image_filename, xmp_data, fsync=False):
+    '''
+    embed the XMP packet into the PNG or TIFF file, without re-encoding the image
+
+    The file's permissions and timestamps are preserved.
+    '''
+    stat = os.stat(image_filename)
+    with open(image_filename, 'rb') as file:
+        magic = file.read(8)
+    if magic == png.signature:
+        with open(image_filename, 'rb') as source:
+            with durability.atomic_write(image_filename, fsync=fsync) as target:
+                png.embed_xmp(source, target, xmp_data)
+        os.chmod(image_filename, stat.st_mode & 0o7777)
+    elif magic[:4] in tiff.signatures:
+        with open(image_filename, 'r+b') as file:
+            tiff.embed_xmp(file, xmp_data)
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+    else:
+        raise ValueError('embedding XMP metadata is supported only for PNG and TIFF files')
+    os.utime(image_filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
 
-__all__ = ['write']
+__all__ = [
+    'embed',
+    'get_parameters',
+    'read_tags',
+    'render',
+    'write',
+]
 
 # vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,145 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import numpy
+
+import PIL.Image
+import PIL.ImageDraw
+
+from lib import analysis
+
+from .tools import (
+    assert_equal,
+    assert_false,
+    assert_greater,
+    assert_true,
+)
+
+def make_text_page(mode='RGB'):
+    image = PIL.Image.new(mode, (2480, 3508), 'white')
+    draw = PIL.ImageDraw.Draw(image)
+    for y in range(200, 3300, 60):
+        draw.rectangle((200, y, 2200, y + 20), fill='black')
+    return image
+
+def make_16bit(image):
+    '''
+    return 16-bit grayscale copy of the image
+    '''
+    data = numpy.asarray(image.convert('L')).astype('<u2') * 257
+    return PIL.Image.frombytes('I;16', image.size, data.tobytes())
+
+def test_classify():
+    page = make_text_page()
+    assert_equal(analysis.classify(page), 'bilevel')
+    gray = PIL.Image.linear_gradient('L').resize((1000, 1000)).convert('RGB')
+    assert_equal(analysis.classify(gray), 'gray')
+    color = page.copy()
+    PIL.ImageDraw.Draw(color).ellipse((1000, 1000, 1400, 1400), fill='red')
+    assert_equal(analysis.classify(color), 'color')
+    assert_equal(analysis.classify(page.convert('1')), 'bilevel')
+    assert_equal(analysis.classify(make_16bit(page)), 'bilevel')
+    assert_equal(analysis.classify(make_16bit(gray)), 'gray')
+
+def test_convert():
+    page = make_text_page()
+    bilevel = analysis.convert(page, 'bilevel')
+    assert_equal(bilevel.mode, '1')
+    assert_equal(bilevel.size, page.size)
+    assert_equal(bilevel.getpixel((300, 210)), 0)
+    assert_equal(bilevel.getpixel((300, 250)), 255)
+    assert_equal(analysis.convert(page, 'gray').mode, 'L')
+    assert_equal(analysis.convert(page.convert('L'), 'color').mode, 'RGB')
+    gray = PIL.Image.linear_gradient('L')
+    for color_mode in analysis.color_modes:
+        converted = analysis.convert(make_16bit(gray), color_mode)
+        assert_equal(converted.tobytes(), analysis.convert(gray, color_mode).tobytes())
+
+def test_blank():
+    page = make_text_page()
+    assert_false(analysis.is_blank(page, 0.1))
+    assert_equal(analysis.get_ink_coverage(make_16bit(page)), analysis.get_ink_coverage(page))
+    assert_false(analysis.is_blank(make_16bit(page), 0.1))
+    blank = PIL.Image.new('L', page.size, 235)
+    draw = PIL.ImageDraw.Draw(blank)
+    # edge shadow:
+    draw.rectangle((0, 0, 60, 3508), fill=40)
+    # dust:
+    for x in range(300, 2200, 300):
+        draw.point((x, x), fill=0)
+    assert_true(analysis.is_blank(blank, 0.1))
+    assert_true(analysis.is_blank(blank.convert('1'), 0.1))
+    draw.text((1000, 1500), 'This page intentionally left blank.', fill=0, font_size=60)
+    assert_false(analysis.is_blank(blank, 0.1))
+
+def test_content_box():
+    bed = PIL.Image.new('RGB', (425, 585), (250, 250, 250))
+    draw = PIL.ImageDraw.Draw(bed)
+    draw.rectangle((10, 20, 109, 169), fill=(120, 90, 60))
+    # dust:
+    draw.point((300, 400), fill='black')
+    assert_equal(analysis.get_content_box(bed), (10, 20, 110, 170))
+    assert_equal(analysis.get_content_box(PIL.Image.new('L', (425, 585), 250)), None)
+
+def make_photo_bed():
+    bed = PIL.Image.new('RGB', (2550, 3500), (245, 245, 245))
+    draw = PIL.ImageDraw.Draw(bed)
+    draw.rectangle((1300, 150, 2299, 749), fill=(50, 50, 200))
+    draw.rectangle((100, 100, 1099, 699), fill=(200, 50, 50))
+    photo = PIL.Image.new('RGB', (1000, 600), (50, 150, 50))
+    photo = photo.rotate(5, PIL.Image.Resampling.BICUBIC, expand=True, fillcolor=(245, 245, 245))
+    bed.paste(photo, (200, 1500))
+    # dust:
+    draw.point((2000, 3000), fill='black')
+    return bed
+
+def test_find_items():
+    items = analysis.find_items(make_photo_bed())
+    assert_equal(len(items), 3)
+    [(box1, skew1), (box2, _), (_, skew3)] = items
+    assert_greater(box2[0], box1[0])
+    assert_greater(1, abs(skew1))
+    assert_greater(1, abs(skew3 + 5))
+
+def test_find_items_square():
+    # Second moments of a square are the same in every direction:
+    bed = PIL.Image.new('RGB', (2550, 3500), (245, 245, 245))
+    photo = PIL.Image.new('RGB', (500, 500), (50, 150, 50))
+    photo = photo.rotate(10, PIL.Image.Resampling.BICUBIC, expand=True, fillcolor=(245, 245, 245))
+    bed.paste(photo, (200, 1500))
+    [(_, skew)] = analysis.find_items(bed)
+    assert_greater(1, abs(skew + 10))
+
+def test_split_items():
+    [item1, item2, item3] = analysis.split_items(make_photo_bed(), deskew=True)
+    assert_equal(item1.getpixel((500, 300)), (200, 50, 50))
+    assert_equal(item2.getpixel((500, 300)), (50, 50, 200))
+    for item in [item1, item2, item3]:
+        (width, height) = item.size
+        assert_greater(1050, width)
+        assert_greater(width, 990)
+        assert_greater(650, height)
+        assert_greater(height, 590)
+    blank = PIL.Image.new('L', (100, 100), 255)
+    assert_equal(analysis.split_items(blank), [blank])
+
+def test_threshold():
+    sample = analysis.get_sample(PIL.Image.new('L', (100, 100), 200)).copy()
+    sample[:50] = 40
+    threshold = analysis.get_threshold(sample)
+    assert_greater(threshold, 39)
+    assert_greater(200, threshold)
+
+# vim:ts=4 sts=4 sw=4 et
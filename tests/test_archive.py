@@ -0,0 +1,86 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+
+from lib import archive
+
+from .tools import (
+    assert_equal,
+    assert_raises,
+)
+
+def _test_round_trip(format_):
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    cwd = os.getcwd()
+    try:
+        os.chdir(tmpdir)
+        path = archive.get_archive_name(format_)
+        data = {}
+        for n in range(3):
+            # two sessions, to exercise appending to an existing archive:
+            arch = archive.Archive(path, format_)
+            for name in f'p{n}.png', f'p{n}.png.xmp':
+                data[name] = os.urandom(1000 + n * 777)
+                with open(name, 'wb') as file:
+                    file.write(data[name])
+                arch.add(name)
+                assert_equal(os.path.exists(name), False)
+            if format_ == 'tar':
+                with tarfile.open(path) as tar:
+                    assert_equal(len(tar.getnames()), 2 * n + 2)
+            arch.close()
+        if format_ == 'zip':
+            with zipfile.ZipFile(path) as zf:
+                assert_equal(zf.testzip(), None)
+        index = archive.read_index(path)
+        assert_equal(sorted(index), sorted(data))
+        for name, content in data.items():
+            assert_equal(archive.read_member(path, name, index), content)
+        os.mkdir('out')
+        names = list(archive.extract(path, 'out'))
+        assert_equal(sorted(names), sorted(data))
+        for name, content in data.items():
+            with open(os.path.join('out', name), 'rb') as file:
+                assert_equal(file.read(), content)
+        with assert_raises(FileExistsError):
+            list(archive.extract(path, 'out'))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmpdir)
+
+def test_tar():
+    _test_round_trip('tar')
+
+def test_zip():
+    _test_round_trip('zip')
+
+def test_unsafe_name():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        path = os.path.join(tmpdir, 'evil.zip')
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr('../evil', b'')
+        with assert_raises(ValueError):
+            list(archive.extract(path, tmpdir))
+        assert_equal(os.path.exists(os.path.join(os.path.dirname(tmpdir), 'evil')), False)
+    finally:
+        shutil.rmtree(tmpdir)
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,103 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+from lib import checksum
+
+from .tools import (
+    assert_equal,
+    assert_false,
+    assert_raises,
+    assert_true,
+)
+
+def test_hash_file():
+    with tempfile.NamedTemporaryFile(prefix='scanhelper.') as file:
+        data = os.urandom(checksum.block_size + 42)
+        file.write(data)
+        file.flush()
+        assert_equal(checksum.hash_file(file.name), hashlib.sha256(data).hexdigest())
+
+def test_manifest_verify():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        path = os.path.join(tmpdir, checksum.manifest_name)
+        manifest = checksum.Manifest(path)
+        for name in 'p0001.png', 'p0002.png':
+            with open(os.path.join(tmpdir, name), 'wb') as file:
+                file.write(name.encode('ASCII'))
+            manifest.add(os.path.join(tmpdir, name))
+        manifest.close()
+        with open(path, 'rt', encoding='UTF-8') as file:
+            lines = file.read().splitlines()
+        assert_equal(len(lines), 2)
+        with open(path, 'wt', encoding='UTF-8') as file:
+            for line in lines:
+                print(line.replace(tmpdir + os.sep, ''), file=file)
+        result = list(checksum.verify(tmpdir))
+        assert_equal(result, [('p0001.png', True), ('p0002.png', True)])
+        progress_path = os.path.join(tmpdir, checksum.progress_name)
+        assert_false(os.path.exists(progress_path))
+        with open(os.path.join(tmpdir, 'p0002.png'), 'ab') as file:
+            file.write(b'!')
+        result = list(checksum.verify(tmpdir))
+        assert_equal(result, [('p0001.png', True), ('p0002.png', False)])
+        assert_true(os.path.exists(progress_path))
+        # resume: only the failed file is checked again
+        result = list(checksum.verify(tmpdir))
+        assert_equal(result, [('p0002.png', False)])
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_manifest_line():
+    def t(filename, line):
+        assert_equal(checksum.format_line(filename, digest), line)
+        assert_equal(checksum.parse_line(line), (filename, digest))
+    digest = '0' * 64
+    t('p0001.png', f'{digest}  p0001.png')
+    t('p 1.png', f'{digest}  p 1.png')
+    t('p\\1\n.png', f'\\{digest}  p\\\\1\\n.png')
+    assert_equal(checksum.parse_line(f'{digest} *p0001.png'), ('p0001.png', digest))
+    for line in [digest, f'{digest} p0001.png', f'\\{digest}  p\\x.png']:
+        with assert_raises(ValueError):
+            checksum.parse_line(line)
+
+def test_verify_sha256sum():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        names = [f'p{n:04d}.png' for n in range(10)] + ['back\\slash.png']
+        lines = []
+        for name in names:
+            data = name.encode('UTF-8')
+            with open(os.path.join(tmpdir, name), 'wb') as file:
+                file.write(data)
+            digest = hashlib.sha256(data).hexdigest()
+            # as written by "sha256sum --binary":
+            escaped = name.replace('\\', '\\\\')
+            prefix = '\\' if escaped != name else ''
+            lines += [f'{prefix}{digest} *{escaped}']
+        with open(os.path.join(tmpdir, checksum.manifest_name), 'wt', encoding='UTF-8') as file:
+            for line in lines:
+                print(line, file=file)
+        result = list(checksum.verify(tmpdir, jobs=1))
+        assert_equal(result, [(name, True) for name in names])
+    finally:
+        shutil.rmtree(tmpdir)
+
+# vim:ts=4 sts=4 sw=4 et
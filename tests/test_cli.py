@@ -20,17 +20,22 @@ import os
 import shutil
 import sys
 import tempfile
+import types
 import xml.etree.ElementTree as etree
 
 import PIL.Image
 
+import lib.catalog
 import lib.cli
+import lib.template
 import lib.xdg
 
 from .tools import (
     assert_equal,
     assert_greater,
+    assert_in,
     assert_not_equal,
+    assert_raises,
     interim,
     interim_environ,
 )
@@ -116,6 +121,239 @@ def test_scanning(xmp=False):
 def test_scanning_xmp():
     test_scanning(xmp=True)
 
+def test_record_replay():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        session = os.path.join(tmpdir, 'session')
+        (rc, stdout, _) = run_scanhelper(
+            '-d', 'test:0',
+            '--page-count=1',
+            '--target-directory-prefix', os.path.join(tmpdir, 'rec'),
+            '--record', session,
+            stdin='\n',
+        )
+        assert_equal(rc, 0)
+        (rc, stdout, _) = run_scanhelper(
+            '--replay', session,
+            '--replay-speed=0',
+            '--target-directory-prefix', os.path.join(tmpdir, 'play'),
+            '--xmp',
+        )
+        [rec_path] = glob.glob(os.path.join(tmpdir, 'rec-*', '*.png'))
+        [play_path] = glob.glob(os.path.join(tmpdir, 'play-*', '*.png'))
+        assert_equal(os.path.basename(play_path), os.path.basename(rec_path))
+        with PIL.Image.open(rec_path) as rec_img, PIL.Image.open(play_path) as play_img:
+            assert_equal(play_img.size, rec_img.size)
+            assert_equal(play_img.mode, rec_img.mode)
+        with open(play_path + '.xmp', 'rb') as file:
+            etree.parse(file)
+    finally:
+        shutil.rmtree(tmpdir)
+    assert_equal(rc, 0)
+    assert_not_equal(stdout, '')
+
+def test_catalog():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        db_path = os.path.join(tmpdir, 'catalog.db')
+        (rc, stdout, stderr) = run_scanhelper(
+            '-d', 'test:0',
+            '--page-count=1',
+            '--target-directory-prefix', os.path.join(tmpdir, 'test'),
+            '--catalog', db_path,
+            stdin='\n',
+        )
+        assert_equal(rc, 0)
+        [path] = glob.glob(os.path.join(tmpdir, 'test-*', '*.png'))
+        (rc, stdout, stderr) = run_scanhelper('--catalog', db_path, '--query-catalog', '-d', 'test:0')
+        assert_equal(stderr, '')
+        assert_equal(rc, 0)
+        [line] = stdout.splitlines()
+        assert_equal(line.split('\t')[1:], ['test:0', os.path.realpath(path)])
+        (rc, stdout, stderr) = run_scanhelper('--catalog', db_path, '--query-catalog', '-d', 'test:1')
+        assert_equal(rc, 0)
+        assert_equal(stdout, '')
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_catalog_archive():
+    (rc, _, stderr) = run_scanhelper('--catalog', 'catalog.db', '--archive', 'tar')
+    assert_equal(stderr, 'scanhelper: error: --archive cannot be used together with --catalog\n')
+    assert_equal(rc, 2)
+
+def test_query_catalog_default_device():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        db_path = os.path.join(tmpdir, 'catalog.db')
+        db = lib.catalog.Catalog(db_path)
+        for name in 'test:0', 'test:1':
+            db.begin_session(tmpdir, types.SimpleNamespace(name=name, vendor='Acme', model='Scanner'))
+            db.add_page(db_path, dict(width=1, height=1, dpi=300), '0' * 64)
+        db.close()
+        with interim_environ(SANE_DEFAULT_DEVICE='test:1'):
+            (rc, stdout, stderr) = run_scanhelper('--catalog', db_path, '--query-catalog')
+            assert_equal(stderr, '')
+            assert_equal(rc, 0)
+            assert_equal([line.split('\t')[1] for line in stdout.splitlines()], ['test:0', 'test:1'])
+            (rc, stdout, stderr) = run_scanhelper('--catalog', db_path, '--query-catalog', '-d', 'test:0')
+            assert_equal(rc, 0)
+            assert_equal([line.split('\t')[1] for line in stdout.splitlines()], ['test:0'])
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_resume():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        args = ['-d', 'test:0', '--target-directory', tmpdir, '--xmp']
+        (rc, _, stderr) = run_scanhelper(*args, '--page-count=1', stdin='\n')
+        assert_equal(rc, 0)
+        os.unlink(os.path.join(tmpdir, 'p0001.png.xmp'))
+        (rc, _, stderr) = run_scanhelper(*args, '--page-count=1', stdin='\n')
+        assert_equal(rc, 1)
+        assert_equal(stderr.splitlines()[-1],
+            f'scanhelper: error: refusing to overwrite existing pages in {tmpdir} '
+            '(use --resume to continue the session)'
+        )
+        (rc, _, stderr) = run_scanhelper(*args, '--page-count=2', '--resume', stdin='\n')
+        assert_equal(rc, 0)
+        assert_equal(
+            sorted(os.listdir(tmpdir)),
+            ['p0001.png', 'p0001.png.xmp', 'p0002.png', 'p0002.png.xmp']
+        )
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_archive():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        args = ['-d', 'test:0', '--target-directory', tmpdir, '--xmp', '--archive=tar']
+        (rc, _, stderr) = run_scanhelper(*args, '--page-count=1', stdin='\n')
+        assert_equal(rc, 0)
+        (rc, _, stderr) = run_scanhelper(*args, '--page-count=2', '--resume', stdin='\n')
+        assert_equal(rc, 0)
+        assert_equal(sorted(os.listdir(tmpdir)), ['pages.tar', 'pages.tar.idx'])
+        path = os.path.join(tmpdir, 'pages.tar')
+        extract_dir = os.path.join(tmpdir, 'extracted')
+        (rc, _, stderr) = run_scanhelper('--extract-archive', path, '--target-directory', extract_dir)
+        assert_equal(stderr, '')
+        assert_equal(rc, 0)
+        assert_equal(
+            sorted(os.listdir(extract_dir)),
+            ['p0001.png', 'p0001.png.xmp', 'p0002.png', 'p0002.png.xmp']
+        )
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_document():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        args = ['-d', 'test:0', '--target-directory', tmpdir, '--document=pages.tiff']
+        (rc, _, stderr) = run_scanhelper(*args, '--page-count=1', stdin='\n')
+        assert_equal(rc, 0)
+        os.unlink(os.path.join(tmpdir, 'pages.tiff'))
+        (rc, _, stderr) = run_scanhelper(*args, '--page-count=3', '--resume', stdin='\n')
+        assert_equal(rc, 0)
+        with PIL.Image.open(os.path.join(tmpdir, 'pages.tiff')) as image:
+            assert_equal(image.n_frames, 3)
+        (rc, _, stderr) = run_scanhelper(*args, '--page-count=1', stdin='\n')
+        assert_equal(rc, 1)
+        (rc, _, stderr) = run_scanhelper('--document=pages.doc')
+        assert_equal(stderr, 'scanhelper: error: --document must have .pdf, .tif or .tiff extension\n')
+        assert_equal(rc, 2)
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_jpeg():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        args = ['-d', 'test:0', '--target-directory', tmpdir, '--xmp', '--format=jpeg', '--page-count=2']
+        (rc, _, _) = run_scanhelper(*args, '--resolution=150', stdin='\n')
+        assert_equal(rc, 0)
+        assert_equal(
+            sorted(os.listdir(tmpdir)),
+            ['p0001.jpg', 'p0001.jpg.xmp', 'p0002.jpg', 'p0002.jpg.xmp']
+        )
+        with PIL.Image.open(os.path.join(tmpdir, 'p0001.jpg')) as image:
+            assert_equal(image.format, 'JPEG')
+            assert_equal(image.info['dpi'], (150, 150))
+        with open(os.path.join(tmpdir, 'p0001.jpg.xmp'), 'rb') as file:
+            xmp = etree.parse(file)
+        media_type = xmp.find('.//{http://purl.org/dc/elements/1.1/}format').text
+        assert_equal(media_type, 'image/jpeg')
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_blank_pages():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        args = ['-d', 'test:0', '--target-directory', tmpdir, '--xmp', '--page-count=2']
+        (rc, _, _) = run_scanhelper(*args, '--blank-pages=move', '--blank-threshold=100', stdin='\n')
+        assert_equal(rc, 0)
+        assert_equal(sorted(os.listdir(tmpdir)), ['blank'])
+        assert_equal(sorted(os.listdir(os.path.join(tmpdir, 'blank'))), ['p0001.png', 'p0002.png'])
+        (rc, _, _) = run_scanhelper(*args, '--blank-pages=delete', '--blank-threshold=0', '--resume', stdin='\n')
+        assert_equal(rc, 0)
+        assert_equal(sorted(os.listdir(tmpdir)), ['blank'])
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_derivatives_duplicate():
+    (rc, stdout, stderr) = run_scanhelper('--derivative=thumb=64px', '--derivative=thumb=128px')
+    assert_equal(stdout, '')
+    assert_equal(stderr, 'scanhelper: error: --derivative: duplicate name: thumb\n')
+    assert_equal(rc, 2)
+
+def test_derivatives():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        args = ['-d', 'test:0', '--target-directory', tmpdir, '--xmp', '--page-count=1', '--resolution=150']
+        (rc, _, _) = run_scanhelper(*args, '--derivative=preview=96dpi', '--derivative=thumb=64px', stdin='\n')
+        assert_equal(rc, 0)
+        assert_equal(
+            sorted(os.listdir(tmpdir)),
+            ['p0001.png', 'p0001.png.xmp', 'p0001.preview.jpg', 'p0001.thumb.jpg']
+        )
+        with PIL.Image.open(os.path.join(tmpdir, 'p0001.thumb.jpg')) as image:
+            assert_equal(max(image.size), 64)
+        with open(os.path.join(tmpdir, 'p0001.png.xmp'), 'rb') as file:
+            xmp = etree.parse(file)
+        paths = [elem.text for elem in xmp.iter('{http://ns.adobe.com/xap/1.0/sType/ResourceRef#}filePath')]
+        assert_equal(paths, ['p0001.preview.jpg', 'p0001.thumb.jpg'])
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_preview_crop():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        args = ['-d', 'test:0', '--target-directory', tmpdir, '--page-count=1', '--preview-crop']
+        (rc, stdout, _) = run_scanhelper(*args, stdin='\n')
+        assert_equal(rc, 0)
+        assert_equal(sorted(os.listdir(tmpdir)), ['p0001.png'])
+        assert_not_equal(stdout, '')
+        (rc, _, stderr) = run_scanhelper('--preview-crop', '--replay', os.path.join(tmpdir, 'session'))
+        assert_equal(stderr, 'scanhelper: error: --preview-crop cannot be used together with --replay\n')
+        assert_equal(rc, 2)
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_template_regex():
+    def t(template, filename, n):
+        regex = lib.template.get_regex(template)
+        match = regex.match(filename)
+        if n is None:
+            assert_equal(match, None)
+        else:
+            assert_equal(int(match.group(1)), n)
+    t('p%04d.png', 'p0042.png', 42)
+    t('p%04d.png', 'p0042.png.xmp', None)
+    t('p%d.png', 'p12345.png', 12345)
+    t('100%%-%-3d.tif', '100%-7  .tif', 7)
+    t('p%+d.pnm', 'p+7.pnm', 7)
+    t('p%04d.png', 'q0042.png', None)
+    for template in 'p.png', 'p%d%d.png', 'p%s.png':
+        with assert_raises(ValueError):
+            lib.template.get_regex(template)
+
 def test_reconstruct_xpm():
     tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
     try:
@@ -131,6 +369,49 @@ def test_reconstruct_xpm():
     assert_equal(stderr, '')
     assert_equal(rc, 0)
 
+def test_reconstruct_xmp_recursive():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        os.mkdir(os.path.join(tmpdir, 'sub'))
+        for name in ['sub/p1.png', 'sub/p2.png', 'p3.png']:
+            with PIL.Image.new('L', (1, 1)) as img:
+                img.save(os.path.join(tmpdir, name))
+        list_path = os.path.join(tmpdir, 'list')
+        with open(list_path, 'wb') as file:
+            file.write(os.fsencode(os.path.join(tmpdir, 'p3.png')) + b'\0')
+        args = ['--reconstruct-xmp', os.path.join(tmpdir, 'sub'), '--exclude=p2.*', '--files-from', list_path]
+        (rc, stdout, stderr) = run_scanhelper(*args)
+        xmp_paths = sorted(
+            os.path.relpath(os.path.join(dirpath, name), tmpdir)
+            for dirpath, _, names in os.walk(tmpdir)
+            for name in names
+            if name.endswith('.xmp')
+        )
+    finally:
+        shutil.rmtree(tmpdir)
+    assert_equal(stdout, '')
+    assert_equal(stderr, '')
+    assert_equal(rc, 0)
+    assert_equal(xmp_paths, ['p3.png.xmp', 'sub/p1.png.xmp'])
+
+def test_reconstruct_xmp_failure():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        paths = [os.path.join(tmpdir, name) for name in ['p1.png', 'p2.png', 'p3.png']]
+        for path in paths[::2]:
+            with PIL.Image.new('L', (1, 1)) as img:
+                img.save(path)
+        (rc, stdout, stderr) = run_scanhelper('--reconstruct-xmp', *paths)
+        xmp_exists = [os.path.exists(path + '.xmp') for path in paths]
+    finally:
+        shutil.rmtree(tmpdir)
+    assert_equal(stdout, '')
+    assert_equal(stderr.count('scanhelper: error:'), 2)
+    assert_in(paths[1], stderr)
+    assert_equal(stderr.splitlines()[-1], 'scanhelper: error: 1 file(s) could not be processed')
+    assert_equal(rc, 1)
+    assert_equal(xmp_exists, [True, False, True])
+
 def _test_not_implemented(arg):
     (rc, stdout, stderr) = run_scanhelper(arg)
     assert_equal(stdout, '')
@@ -190,6 +471,12 @@ def test_bad_option():
     assert_equal(rc, 1)
     assert_equal(stdout, '')
 
+def test_bad_jobs():
+    for jobs in ['0', '-1']:
+        (rc, _, stderr) = run_scanhelper(f'--jobs={jobs}')
+        assert_equal(stderr, 'scanhelper: error: --jobs must be positive\n')
+        assert_equal(rc, 2)
+
 # TODO: add test for --override-xmp
 
 # vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,156 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import contextlib
+import io
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from lib import daemon
+
+from .tools import (
+    assert_equal,
+    assert_raises,
+)
+
+def run_job(args):
+    if args == ['sleep']:
+        try:
+            time.sleep(60)
+        except KeyboardInterrupt:
+            print('interrupted')
+            sys.exit(130)
+    if args == ['threads']:
+        # number of threads of the process the job was forked from:
+        print(len(os.listdir(f'/proc/{os.getppid()}/task')))
+        sys.exit(0)
+    line = input()
+    print(f'{os.path.basename(os.getcwd())}: {args} {line}')
+    sys.exit(len(args))
+
+class FaultyDaemon(daemon.Daemon):
+
+    def __init__(self, path, **kwargs):
+        self.n_prepared = 0
+        super().__init__(path, prepare=self.prepare, **kwargs)
+
+    def prepare(self):
+        self.n_prepared += 1
+        if self.n_prepared > 1:
+            raise RuntimeError('no devices')
+
+    def _run(self, job):
+        if job.args == ['fail']:
+            raise OSError('fork failed')
+        return super()._run(job)
+
+def start_daemon(path, cls=daemon.Daemon):
+    server = cls(path, run_job=run_job)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    while True:
+        try:
+            daemon.list_jobs(path)
+        except daemon.Error:
+            time.sleep(0.01)
+        else:
+            break
+
+@contextlib.contextmanager
+def running_daemon(cls=daemon.Daemon):
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        path = os.path.join(tmpdir, 'socket')
+        start_daemon(path, cls)
+        yield (path, tmpdir)
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_submit():
+    with running_daemon() as (path, tmpdir):
+        stdout = io.StringIO()
+        rc = daemon.submit(path, ['a', 'b'], tmpdir, stdin=io.StringIO('hello\n'), stdout=stdout)
+        assert_equal(rc, 2)
+        assert_equal(stdout.getvalue(), f"{os.path.basename(tmpdir)}: ['a', 'b'] hello\n")
+        assert_equal(daemon.list_jobs(path), [])
+
+def test_cancel():
+    with running_daemon() as (path, tmpdir):
+        stdout = io.StringIO()
+        result = []
+        def submit():
+            result.append(daemon.submit(path, ['sleep'], tmpdir, stdin=io.StringIO(), stdout=stdout))
+        thread = threading.Thread(target=submit)
+        thread.start()
+        while True:
+            jobs = daemon.list_jobs(path)
+            if jobs and jobs[0]['state'] == 'running':
+                break
+            time.sleep(0.01)
+        [job] = jobs
+        assert_equal(job['args'], ['sleep'])
+        time.sleep(0.1)
+        daemon.cancel(path, job['job'])
+        thread.join()
+        assert_equal(result, [130])
+        assert_equal(stdout.getvalue(), 'interrupted\n')
+        with assert_raises(daemon.Error):
+            daemon.cancel(path, job['job'])
+
+def test_failure():
+    with running_daemon(FaultyDaemon) as (path, tmpdir):
+        with assert_raises(daemon.Error):
+            daemon.submit(path, ['fail'], tmpdir, stdin=io.StringIO(), stdout=io.StringIO())
+        for _ in range(2):
+            stdout = io.StringIO()
+            rc = daemon.submit(path, ['a'], tmpdir, stdin=io.StringIO('hello\n'), stdout=stdout)
+            assert_equal(rc, 1)
+            assert_equal(stdout.getvalue(), f"{os.path.basename(tmpdir)}: ['a'] hello\n")
+        assert_equal(daemon.list_jobs(path), [])
+
+def test_fork_server():
+    with running_daemon() as (path, tmpdir):
+        stdout = io.StringIO()
+        rc = daemon.submit(path, ['threads'], tmpdir, stdin=io.StringIO(), stdout=stdout)
+        assert_equal(rc, 0)
+        assert_equal(stdout.getvalue(), '1\n')
+
+def test_socket():
+    with running_daemon() as (path, tmpdir):
+        server = daemon.Daemon(path, run_job=run_job)
+        with assert_raises(daemon.Error):
+            server.serve_forever()
+        assert_equal(daemon.list_jobs(path), [])
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        path = os.path.join(tmpdir, 'socket')
+        # left behind by a daemon that was killed:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(path)
+        start_daemon(path)
+        assert_equal(daemon.list_jobs(path), [])
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_strip_client_args():
+    args = ['--submit', '-d', 'test', '--socket', 'x', '--socket=y', '--page-count=1']
+    assert_equal(daemon.strip_client_args(args), ['-d', 'test', '--page-count=1'])
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,79 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import os
+import shutil
+import struct
+import tempfile
+
+import PIL.Image
+
+from lib import derivatives
+
+from .tools import (
+    assert_equal,
+    assert_raises,
+    assert_true,
+)
+
+def test_spec():
+    spec = derivatives.Spec('preview=96dpi')
+    assert_equal((spec.name, spec.size, spec.unit), ('preview', 96, 'dpi'))
+    assert_equal(spec.get_size((2480, 3508), dpi=300), (794, 1123))
+    assert_equal(spec.get_size((100, 100), dpi=72), (100, 100))
+    with assert_raises(ValueError):
+        spec.get_size((2480, 3508))
+    spec = derivatives.Spec('thumb=256px')
+    assert_equal(spec.get_size((2480, 3508)), (181, 256))
+    for s in ['thumb', 'thumb=256', 'thumb=0px', '=256px', 'a/b=256px']:
+        with assert_raises(ValueError):
+            derivatives.Spec(s)
+
+def test_generate():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        image = PIL.Image.new('1', (2480, 3508), 1)
+        filename = os.path.join(tmpdir, 'p0001.png')
+        specs = [derivatives.Spec('thumb=256px'), derivatives.Spec('preview=96dpi')]
+        result = derivatives.generate(image, filename, specs, dpi=300)
+        assert_equal([d['name'] for d in result], ['thumb', 'preview'])
+        [thumb, preview] = result
+        assert_equal(thumb['filename'], os.path.join(tmpdir, 'p0001.thumb.jpg'))
+        with PIL.Image.open(thumb['filename']) as img:
+            assert_equal(img.format, 'JPEG')
+            assert_equal(img.size, (181, 256))
+            assert_equal(img.size, (thumb['width'], thumb['height']))
+        with PIL.Image.open(preview['filename']) as img:
+            assert_equal(img.size, (794, 1123))
+            assert_equal(img.info['dpi'], (96, 96))
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_generate_16bit():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        image = PIL.Image.new('I;16', (64, 64))
+        image.frombytes(struct.pack('<H', 40000) * (64 * 64))
+        filename = os.path.join(tmpdir, 'p0001.png')
+        [thumb] = derivatives.generate(image, filename, [derivatives.Spec('thumb=16px')])
+        with PIL.Image.open(thumb['filename']) as img:
+            assert_equal(img.mode, 'L')
+            (low, high) = img.getextrema()
+        # 40000 / 256 = 156, give or take JPEG rounding:
+        assert_true(154 <= low <= high <= 158)
+    finally:
+        shutil.rmtree(tmpdir)
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,68 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import os
+import shutil
+import stat
+import tempfile
+
+from lib import durability
+
+from .tools import (
+    assert_equal,
+    assert_raises,
+    fork_isolation,
+)
+
+@fork_isolation
+def test_get_umask():
+    os.umask(0o027)
+    assert_equal(durability._get_umask(), 0o027)  # pylint: disable=protected-access
+    # The umask is left intact:
+    assert_equal(os.umask(0o022), 0o027)
+
+def test_atomic_write():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        for fsync in False, True:
+            path = os.path.join(tmpdir, f'eggs-{fsync}')
+            with durability.atomic_write(path, fsync=fsync) as file:
+                file.write(b'ham')
+                assert_equal(os.path.exists(path), False)
+            with open(path, 'rb') as file:
+                assert_equal(file.read(), b'ham')
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+            assert_equal(mode, 0o666 & ~durability.umask)
+        assert_equal(sorted(os.listdir(tmpdir)), ['eggs-False', 'eggs-True'])
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_atomic_write_error():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        path = os.path.join(tmpdir, 'eggs')
+        with assert_raises(ZeroDivisionError):
+            with durability.atomic_write(path) as file:
+                file.write(b'ham')
+                1 / 0  # pylint: disable=pointless-statement
+        assert_equal(os.listdir(tmpdir), [])
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_syncer_bad_policy():
+    with assert_raises(ValueError):
+        durability.Syncer('always')
+
+# vim:ts=4 sts=4 sw=4 et
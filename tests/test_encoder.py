@@ -0,0 +1,115 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import os
+import shutil
+import struct
+import tempfile
+
+import PIL.Image
+
+from lib import encoder
+
+from .tools import (
+    assert_equal,
+    assert_false,
+    assert_raises,
+    assert_true,
+)
+
+def test_encode():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        source = os.path.join(tmpdir, 'p1.jpg.pnm')
+        target = os.path.join(tmpdir, 'p1.jpg')
+        PIL.Image.new('1', (20, 10)).save(source)
+        os.utime(source, (0, 1234567890))
+        encoder.encode(source, target, 'jpeg', dpi=300, quality=50, subsampling='4:4:4')
+        assert_false(os.path.exists(source))
+        assert_equal(os.stat(target).st_mtime, 1234567890)
+        with PIL.Image.open(target) as image:
+            assert_equal(image.format, 'JPEG')
+            assert_equal(image.mode, 'L')
+            assert_equal(image.info['dpi'], (300, 300))
+        PIL.Image.new('RGB', (20, 10), 'white').save(source)
+        page = encoder.encode(source, target, 'png', auto_mode=True)
+        assert_equal(page.properties, dict(color_mode='bilevel'))
+        with PIL.Image.open(target) as image:
+            assert_equal(image.mode, '1')
+        with assert_raises(encoder.Error):
+            encoder.encode(source, target, 'jpeg')
+        PIL.Image.new('L', (200, 200), 'white').save(source)
+        blank_directory = os.path.join(tmpdir, 'blank')
+        page = encoder.encode(source, 'p1.png', 'png', blank_threshold=0.1, blank_directory=blank_directory)
+        assert_true(page.blank)
+        assert_equal(page.filename, os.path.join(blank_directory, 'p1.png'))
+        assert_true(os.path.exists(page.filename))
+        PIL.Image.new('L', (200, 200), 'white').save(source)
+        page = encoder.encode(source, target, 'png', blank_threshold=0.1)
+        assert_true(page.blank)
+        assert_false(os.path.exists(source))
+        image = PIL.Image.new('L', (400, 400), 'white')
+        image.paste(0, (20, 20, 120, 120))
+        image.paste(0, (200, 200, 300, 300))
+        image.save(source)
+        page = encoder.encode(source, target, 'png', split_items=True)
+        assert_equal([item.filename for item in page.items], [
+            os.path.join(tmpdir, 'p1.item0.jpg'),
+            os.path.join(tmpdir, 'p1.item1.jpg'),
+        ])
+        for item in page.items:
+            with PIL.Image.open(item.filename) as image:
+                assert_equal(image.format, 'PNG')
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_encode_16bit():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        source = os.path.join(tmpdir, 'p1.jpg.pnm')
+        target = os.path.join(tmpdir, 'p1.jpg')
+        values = [0, 20000, 40000, 65535]
+        # 8x8 blocks of each value, so that JPEG compression doesn't blur them:
+        row = [v for v in values for _ in range(8)]
+        with open(source, 'wb') as file:
+            file.write(b'P5 32 8 65535\n')
+            file.write(struct.pack(f'>{len(row)}H', *row) * 8)
+        encoder.encode(source, target, 'jpeg', quality=95)
+        with PIL.Image.open(target) as image:
+            assert_equal(image.mode, 'L')
+            pixels = [image.getpixel((8 * i + 4, 4)) for i in range(4)]
+        for pixel, value in zip(pixels, values):
+            assert_true(abs(pixel - (value >> 8)) <= 2, f'{pixels} != {[v >> 8 for v in values]}')
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_encoder_order():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        pool = encoder.Encoder('jpeg', jobs=4)
+        (targets, futures) = ([], [])
+        for i in range(20):
+            source = os.path.join(tmpdir, f'p{i}.pnm')
+            targets += [os.path.join(tmpdir, f'p{i}.jpg')]
+            PIL.Image.new('RGB', (1000 - i * 40, 100)).save(source)
+            futures += [pool.start(source, targets[-1])]
+        done = [future.result() for future in futures]
+        pool.close()
+        assert_equal([page.filename for page in done], targets)
+        assert_equal(sorted(os.listdir(tmpdir)), sorted(os.path.basename(t) for t in targets))
+    finally:
+        shutil.rmtree(tmpdir)
+
+# vim:ts=4 sts=4 sw=4 et
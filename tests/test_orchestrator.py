@@ -0,0 +1,64 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import asyncio
+import io
+import os
+
+from lib import orchestrator
+
+from .tools import (
+    assert_equal,
+    assert_raises,
+)
+
+async def read_all(reader):
+    return [line async for line in reader]
+
+def test_line_reader():
+    (r, w) = os.pipe()
+    try:
+        os.write(w, 'eggs\r\nham\nsp\N{LATIN SMALL LETTER A WITH ACUTE}m'.encode('UTF-8'))
+        os.close(w)
+        reader = orchestrator.LineReader(r, 'UTF-8')
+        lines = orchestrator.run(read_all(reader))
+    finally:
+        os.close(r)
+    assert_equal(lines, ['eggs\n', 'ham\n', 'sp\N{LATIN SMALL LETTER A WITH ACUTE}m'])
+
+def test_read_line():
+    file = io.StringIO('eggs\n')
+    line = orchestrator.run(orchestrator.read_line(file))
+    assert_equal(line, 'eggs\n')
+    with assert_raises(EOFError):
+        orchestrator.run(orchestrator.read_line(file))
+
+def test_iterate():
+    log = []
+    async def agen():
+        try:
+            for i in range(3):
+                await asyncio.sleep(0)
+                yield i
+        finally:
+            await asyncio.sleep(0)
+            log.append('cleanup')
+    assert_equal(list(orchestrator.iterate(agen())), [0, 1, 2])
+    assert_equal(log, ['cleanup'])
+    first = next(iter(orchestrator.iterate(agen())))
+    assert_equal(first, 0)
+    assert_equal(log, ['cleanup', 'cleanup'])
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,107 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import os
+import shutil
+import tempfile
+import types
+
+import PIL.Image
+import PIL.PngImagePlugin
+
+from lib import pages
+
+from .tools import (
+    assert_equal,
+    assert_false,
+    assert_raises,
+    assert_true,
+)
+
+def test_is_image():
+    assert_true(pages.is_image('p0001.png'))
+    assert_true(pages.is_image('P0001.TIF'))
+    assert_false(pages.is_image('p0001.png.xmp'))
+    assert_false(pages.is_image('.p0001.png'))
+    assert_false(pages.is_image('p0001.png.part'))
+
+class FakeManifest:
+
+    def __init__(self):
+        self.entries = []
+
+    def add(self, filename):
+        self.entries += [(filename, None)]
+
+    def record(self, filename, digest):
+        self.entries += [(filename, digest)]
+
+def test_finish_file():
+    manifest = FakeManifest()
+    syncer = types.SimpleNamespace(add=lambda filename, synced: None)
+    options = types.SimpleNamespace(manifest=manifest, archive=None, mover=None, syncer=syncer)
+    pages.finish_file(options, 'p0001.png')
+    pages.finish_file(options, 'p0002.png', digest='0' * 64)
+    assert_equal(manifest.entries, [('p0001.png', None), ('p0002.png', '0' * 64)])
+
+def test_rename_item():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    cwd = os.getcwd()
+    try:
+        os.chdir(tmpdir)
+        for name in ['tmp-1.png', 'tmp-1.thumb.jpg', 'tmp-2.png', 'page-1.png']:
+            with open(name, 'w', encoding='ASCII') as file:
+                file.write(name)
+        derivative = dict(name='thumb', filename='tmp-1.thumb.jpg')
+        item = types.SimpleNamespace(filename='tmp-1.png', properties=dict(derivatives=[derivative]))
+        pages.rename_item(item, 'page-2.png')
+        assert_equal(item.filename, 'page-2.png')
+        assert_equal(derivative['filename'], 'page-2.thumb.jpg')
+        assert_equal(sorted(os.listdir()), ['page-1.png', 'page-2.png', 'page-2.thumb.jpg', 'tmp-2.png'])
+        item = types.SimpleNamespace(filename='tmp-2.png', properties={})
+        with assert_raises(FileExistsError):
+            pages.rename_item(item, 'page-1.png')
+        assert_equal(item.filename, 'tmp-2.png')
+        with open('page-1.png', encoding='ASCII') as file:
+            assert_equal(file.read(), 'page-1.png')
+        assert_equal(os.path.exists('tmp-2.png'), True)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmpdir)
+
+def test_write_xmp():
+    device = types.SimpleNamespace(vendor='Other', model='Other')
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        path = os.path.join(tmpdir, 'p.png')
+        info = PIL.PngImagePlugin.PngInfo()
+        info.add_text('Make', 'Acme')
+        info.add_text('Model', 'Scanner')
+        PIL.Image.new('L', (10, 10)).save(path, pnginfo=info)
+        options = types.SimpleNamespace(embed_xmp=False, override_xmp=dict(device_vendor='Emca'))
+        parameters = pages.write_xmp(options, device, path, dict(device_model='Frobnicator'), fsync=False)
+        assert_equal(parameters['device_vendor'], 'Emca')
+        assert_equal(parameters['device_model'], 'Frobnicator')
+        assert_true(os.path.exists(path + '.xmp'))
+        os.unlink(path + '.xmp')
+        options = types.SimpleNamespace(embed_xmp=True, override_xmp={})
+        parameters = pages.write_xmp(options, device, path, {}, fsync=False)
+        assert_equal(parameters['device_vendor'], 'Acme')
+        assert_equal(parameters['device_model'], 'Scanner')
+        assert_equal(os.listdir(tmpdir), ['p.png'])
+    finally:
+        shutil.rmtree(tmpdir)
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,190 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import os
+import re
+import shutil
+import struct
+import tempfile
+import zlib
+
+import PIL.Image
+
+from lib import pdf
+
+from .tools import (
+    assert_equal,
+    assert_in,
+    assert_raises,
+    interim,
+)
+
+def _check_xref(data):
+    '''
+    check that every cross-reference section points to the right objects
+    '''
+    for match in re.finditer(rb'startxref\n(\d+)\n%%EOF\n', data):
+        offset = int(match.group(1))
+        lines = data[offset:data.index(b'trailer', offset)].split(b'\n')
+        assert_equal(lines[0], b'xref')
+        i = 1
+        while lines[i]:
+            (first, count) = map(int, lines[i].split())
+            for n in range(first, first + count):
+                entry = lines[i + 1 + n - first]
+                if entry.endswith(b'n\r'):
+                    obj_offset = int(entry[:10])
+                    assert_equal(data[obj_offset:].split(b'\n', 1)[0], f'{n} 0 obj'.encode())
+            i += 1 + count
+
+def test_writer():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        image = PIL.Image.linear_gradient('L').resize((100, 60))
+        paths = {}
+        for ext in 'png', 'jpg', 'pgm', 'pbm', 'tif':
+            paths[ext] = os.path.join(tmpdir, f'page.{ext}')
+        image.save(paths['png'], dpi=(150, 150))
+        image.convert('RGB').save(paths['jpg'])
+        image.save(paths['pgm'])
+        image.convert('1').save(paths['pbm'])
+        image.save(paths['tif'])
+        path = os.path.join(tmpdir, 'document.pdf')
+        writer = pdf.Writer(path)
+        writer.add(paths['png'])
+        writer.add(paths['jpg'])
+        writer.close()
+        writer = pdf.Writer(path)
+        assert_equal(writer.n_pages, 2)
+        for ext in 'pgm', 'pbm', 'tif':
+            writer.add(paths[ext])
+        writer.flush()
+        # leftovers of an interrupted session:
+        writer.add(paths['png'])
+        writer.close()
+        with open(path, 'r+b') as file:
+            file.truncate(os.path.getsize(path) - 42)
+        writer = pdf.Writer(path)
+        assert_equal(writer.n_pages, 5)
+        writer.close()
+        with open(path, 'rb') as file:
+            data = file.read()
+        _check_xref(data)
+        assert_in(b'/Count 5 >>', data)
+        # PNG data is embedded as is:
+        assert_in(b'/Predictor 15', data)
+        # so is JPEG:
+        with open(paths['jpg'], 'rb') as file:
+            assert_in(file.read(), data)
+        assert_in(b'/MediaBox [0 0 48 28.8]', data)
+        # PGM data is only compressed:
+        match = re.search(rb'/BitsPerComponent 8 /Filter /FlateDecode /Length (\d+) 0 R >>\nstream\n', data)
+        assert_equal(zlib.decompressobj().decompress(data[match.end():]), image.tobytes())
+    finally:
+        shutil.rmtree(tmpdir)
+
+def _get_pages(data):
+    '''
+    return page object numbers, in the page tree order,
+    checking /Count and /Parent of the page tree nodes
+    '''
+    objects = {
+        int(match.group(1)): match.group(2)
+        for match in re.finditer(rb'(?m)^(\d+) 0 obj\n(<<.*>>)\nendobj$', data)
+    }
+    def walk(n, parent):
+        body = objects[n]
+        if parent is not None:
+            assert_in(f'/Parent {parent} 0 R'.encode(), body)
+        if b'/Type /Page ' in body:
+            return [n]
+        kids = re.search(rb'/Kids \[(.*?)\]', body).group(1)
+        result = []
+        for kid in re.findall(rb'(\d+) 0 R', kids):
+            result += walk(int(kid), n)
+        assert_in(f'/Count {len(result)}'.encode(), body)
+        return result
+    return walk(pdf.Writer.pages_id, None)
+
+def test_writer_page_tree():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        image_path = os.path.join(tmpdir, 'page.png')
+        PIL.Image.new('L', (10, 10)).save(image_path, dpi=(300, 300))
+        path = os.path.join(tmpdir, 'document.pdf')
+        with interim(pdf.Writer, fanout=2):
+            writer = pdf.Writer(path)
+            for _ in range(3):
+                writer.add(image_path)
+                writer.flush()
+            writer.close()
+            writer = pdf.Writer(path)
+            assert_equal(writer.n_pages, 3)
+            for _ in range(5):
+                writer.add(image_path)
+            writer.close()
+            writer = pdf.Writer(path)
+            with assert_raises(pdf.Error):
+                # 2 branches x 2 leaves x 2 pages
+                writer.add(image_path)
+            writer.close()
+        with open(path, 'rb') as file:
+            data = file.read()
+        _check_xref(data)
+        pages = _get_pages(data)
+        assert_equal(len(pages), 8)
+        assert_equal(pages, sorted(pages))
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_writer_resolution():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        image_path = os.path.join(tmpdir, 'page.pgm')
+        PIL.Image.new('L', (600, 300)).save(image_path)
+        path = os.path.join(tmpdir, 'document.pdf')
+        writer = pdf.Writer(path, resolution=300)
+        writer.add(image_path)
+        writer.close()
+        with open(path, 'rb') as file:
+            assert_in(b'/MediaBox [0 0 144 72]', file.read())
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_read_image_16bit():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        values = [0, 20000, 40000, 65535]
+        image = PIL.Image.new('I;16', (4, 1))
+        image.frombytes(struct.pack('<4H', *values))
+        path = os.path.join(tmpdir, 'page.tif')
+        def read():
+            with open(path, 'rb') as file:
+                page = pdf.read_image(file, path)
+                return (page, zlib.decompress(b''.join(page.data)))
+        # little-endian TIFF data is byte-swapped:
+        image.save(path)
+        (page, data) = read()
+        assert_in('/BitsPerComponent 16', page.dictionary)
+        assert_equal(data, struct.pack('>4H', *values))
+        # compressed TIFF is decoded, and scaled to 8 bits:
+        image.save(path, compression='tiff_deflate')
+        (page, data) = read()
+        assert_in('/BitsPerComponent 8', page.dictionary)
+        assert_equal(list(data), [v >> 8 for v in values])
+    finally:
+        shutil.rmtree(tmpdir)
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,66 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import io
+
+import PIL.Image
+import PIL.ImageDraw
+
+from lib import preview
+
+from .tools import (
+    assert_equal,
+    assert_raises,
+)
+
+def make_preview(dpi=(50, 50)):
+    # A4 flatbed at 50 dpi:
+    image = PIL.Image.new('L', (413, 585), 255)
+    PIL.ImageDraw.Draw(image).rectangle((0, 100, 199, 299), fill=0)
+    file = io.BytesIO()
+    image.save(file, 'TIFF', dpi=dpi)
+    file.seek(0)
+    return file
+
+def test_geometry():
+    geometry = preview.get_geometry(make_preview())
+    assert_equal(geometry, ['-l', '0.0', '-t', '48.8', '-x', '103.6', '-y', '105.6'])
+    geometry = preview.get_geometry(make_preview(dpi=(100, 100)))
+    assert_equal(geometry, ['-l', '0.0', '-t', '23.4', '-x', '52.8', '-y', '54.8'])
+    file = io.BytesIO()
+    PIL.Image.new('L', (100, 100), 255).save(file, 'TIFF', dpi=(50, 50))
+    file.seek(0)
+    assert_equal(preview.get_geometry(file), None)
+
+def test_geometry_origin():
+    geometry = preview.get_geometry(make_preview(), origin=(10.0, 20.0))
+    assert_equal(geometry, ['-l', '10.0', '-t', '68.8', '-x', '103.6', '-y', '105.6'])
+
+def test_origin():
+    assert_equal(preview.get_origin([]), (0.0, 0.0))
+    assert_equal(preview.get_origin(['--mode', 'Gray', '-x', '100']), (0.0, 0.0))
+    assert_equal(preview.get_origin(['-l', '10', '-t20']), (10.0, 20.0))
+    assert_equal(preview.get_origin(['-l=10.5mm', '-t', '1', '-t', '2']), (10.5, 2.0))
+    with assert_raises(ValueError):
+        preview.get_origin(['-l', '1in'])
+
+def test_unknown_resolution():
+    file = io.BytesIO()
+    PIL.Image.new('L', (100, 100), 255).save(file, 'PPM')
+    file.seek(0)
+    with assert_raises(ValueError):
+        preview.get_geometry(file)
+
+# vim:ts=4 sts=4 sw=4 et
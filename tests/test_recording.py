@@ -0,0 +1,84 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import json
+import os
+import shutil
+import tempfile
+
+from lib import recording
+
+from .tools import (
+    assert_equal,
+    assert_raises,
+)
+
+def _events():
+    return [
+        dict(
+            time=0, event='start', version=recording.format_version,
+            output_format='png', filename_template='p%04d.png',
+            batch_start=1, batch_count=None, batch_increment=1, batch_button=None,
+            page_count=1,
+        ),
+        dict(time=0.1, event='devices', devices=[['test:0', 'Noname', 'frontend-tester', 'virtual device']]),
+        dict(time=0.2, event='device', name='test:0', buttons=[]),
+        dict(time=0.3, event='wait', button=None, duration=0.1, eof=False),
+        dict(time=0.4, event='scanimage', args=[]),
+        dict(time=0.5, event='output', line='Scanned page 1. (scanner status = 5)\n'),
+        dict(time=0.6, event='exit', returncode=7),
+        dict(
+            time=0.7, event='page', filename='p0001.png', size=42,
+            format='PNG', mode='L', dimensions=[1, 1], dpi=None,
+        ),
+        dict(time=0.8, event='end'),
+    ]
+
+def test_load():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        path = os.path.join(tmpdir, 'session')
+        def write(events, tail=''):
+            with open(path, 'wt', encoding='UTF-8') as file:
+                for event in events:
+                    json.dump(event, file)
+                    file.write('\n')
+                file.write(tail)
+        write(_events())
+        assert_equal(len(recording.load(path)), 9)
+        player = recording.Player(path, speed=0)
+        assert_equal(player.get_devices(), [('test:0', 'Noname', 'frontend-tester', 'virtual device')])
+        def bad(events, tail=''):
+            write(events, tail)
+            with assert_raises(ValueError):
+                recording.Player(path)
+        bad([])
+        bad(_events()[1:])
+        bad(_events()[:-1])
+        bad(_events()[:-1], tail='{"time": 0.9, "ev')
+        bad(_events(), tail='[]\n')
+        bad([e for e in _events() if e['event'] != 'scanimage'])
+        for (n, event) in enumerate(_events()):
+            for key in event.keys() - {'event', 'args'}:
+                events = _events()
+                del events[n][key]
+                bad(events)
+        events = _events()
+        events[3]['event'] = 'eggs'
+        bad(events)
+    finally:
+        shutil.rmtree(tmpdir)
+
+# vim:ts=4 sts=4 sw=4 et
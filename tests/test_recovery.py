@@ -0,0 +1,62 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import os
+import shutil
+import tempfile
+
+from lib import recovery
+from lib.scanner import Status
+
+from .tools import (
+    assert_equal,
+    assert_false,
+    assert_raises,
+)
+
+def test_default_policy():
+    policy = recovery.Policy()
+    assert_equal(policy.get_action(Status.DEVICE_BUSY), None)
+    assert_equal(policy.get_action(Status.JAMMED), 'end-batch')
+    assert_equal(policy.get_action(Status.COVER_OPEN), 'end-batch')
+    assert_equal(policy.get_action(Status.IO_ERROR), None)
+
+def test_busy_retries():
+    policy = recovery.Policy(busy_retries=2, busy_delay=0.5)
+    assert_equal(policy.get_action(Status.DEVICE_BUSY, 0), 'retry')
+    assert_equal(policy.get_action(Status.DEVICE_BUSY, 1), 'retry')
+    assert_equal(policy.get_action(Status.DEVICE_BUSY, 2), None)
+    assert_equal([policy.get_delay(n) for n in range(3)], [0.5, 1.0, 2.0])
+
+def test_on_jam():
+    policy = recovery.Policy(on_jam='wait')
+    assert_equal(policy.get_action(Status.JAMMED), 'wait')
+    assert_equal(policy.get_action(Status.COVER_OPEN), 'wait')
+    with assert_raises(ValueError):
+        recovery.Policy(on_jam='eggs')
+
+def test_remove_partial_page():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        path = os.path.join(tmpdir, 'p0001.png')
+        with open(path + '.part', 'wb'):
+            pass
+        recovery.remove_partial_page(path)
+        assert_false(os.path.exists(path + '.part'))
+        recovery.remove_partial_page(path)
+    finally:
+        shutil.rmtree(tmpdir)
+
+# vim:ts=4 sts=4 sw=4 et
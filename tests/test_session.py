@@ -0,0 +1,205 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import asyncio
+import concurrent.futures
+import os
+import shutil
+import tempfile
+import time
+import types
+
+import lib.orchestrator as orchestrator
+import lib.scanimage as scanimage
+import lib.session as session
+
+from .test_cli import scan_config
+from .tools import (
+    assert_equal,
+    assert_false,
+    assert_raises,
+    interim,
+)
+
+def test_get_options():
+    options = session.get_options(['--resolution', '300'],
+        device='test:0',
+        page_count=2,
+        xmp=True,
+        derivatives=['thumb=64px'],
+        override_xmp=dict(device_model='Frobnicator'),
+    )
+    assert_equal(options.device, 'test:0')
+    assert_equal(options.page_count, 2)
+    assert_equal(options.xmp, True)
+    assert_equal([str(spec) for spec in options.derivatives], ['thumb=64px'])
+    assert_equal(options.override_xmp, dict(device_model='Frobnicator'))
+    assert_equal(options.extra_args, ['--resolution', '300'])
+    assert_equal(options.filename_template, 'p%04d.png')
+    assert_equal(options.scanimage_output, None)
+
+def test_get_options_errors():
+    with assert_raises(TypeError):
+        session.get_options(no_such_option=42)
+    with assert_raises(session.Error):
+        session.get_options(quality=101)
+    with assert_raises(session.Error):
+        session.get_options(deskew=True)
+
+def test_get_resume_point():
+    def t(numbers, start, increment, expected):
+        assert_equal(session.get_resume_point(dict.fromkeys(numbers), start, increment), expected)
+    t([], 1, 1, (None, 0))
+    t([1, 2, 3], 1, 1, (3, 3))
+    # gaps, e.g. deleted blank pages:
+    t([1, 2, 4], 1, 1, (4, 4))
+    t([1, 3, 5], 1, 2, (5, 3))
+    t([10, 9, 8, 7, 6], 10, -1, (6, 5))
+    t([10, 8], 10, -1, (8, 3))
+    # pages outside the sequence:
+    t([1, 2], 100, 1, (None, 0))
+    t([11, 12], 10, -1, (None, 0))
+
+def test_get_scan_order():
+    existing_pages = {n: f'p{n}.png' for n in [3, 1, 2]}
+    assert_equal(session.get_scan_order(existing_pages, 1), ['p1.png', 'p2.png', 'p3.png'])
+    assert_equal(session.get_scan_order(existing_pages, -1), ['p3.png', 'p2.png', 'p1.png'])
+    assert_equal(session.get_scan_order({}, 1), [])
+
+class FakeSyncer:
+
+    def flush(self):
+        pass
+
+def test_post_process_split_items():
+    options = types.SimpleNamespace(split_items=True,
+        archive=None, document=None, catalog=None, mover=None,
+        syncer=FakeSyncer(),
+    )
+    async def t(increment):
+        batch = session.Batch(10, increment)
+        batch.n_scanned = 2
+        numbers = [next(batch.numbers) for _ in range(3)]
+        await session.post_process(options, None, batch, None)
+        return (numbers, await batch.finished)
+    assert_equal(orchestrator.run(t(1)), ([10, 11, 12], 3))
+    assert_equal(orchestrator.run(t(-1)), ([10, 9, 8], 3))
+    assert_equal(orchestrator.run(t(0)), ([10, 10, 10], 3))
+
+class FakeEncoder:
+
+    max_backlog = 2
+
+    def start(self, source, target):
+        del source, target
+        return concurrent.futures.Future()
+
+def test_scan_pages_backlog():
+    options = session.get_options(output_format='jpeg')
+    options.encoder = FakeEncoder()
+    scanned = []
+    async def scan_batch(options, device, start, count, increment, geometry):
+        del options, device, geometry
+        for n in range(start, start + count * increment, increment):
+            scanned.append(n)
+            yield n
+    async def t():
+        batch = session.Batch(1, 1)
+        queue = asyncio.Queue(maxsize=options.encoder.max_backlog)
+        producer = asyncio.ensure_future(session.scan_pages(options, None, batch, 5, [], queue))
+        for _ in range(10):
+            await asyncio.sleep(0)
+        # The third page waits until there's room in the queue:
+        assert_equal(scanned, [1, 2, 3])
+        assert_false(producer.done())
+        items = [await queue.get() for _ in range(5)]
+        await producer
+        assert_equal([capture.number for (_, capture, _) in items], [1, 2, 3, 4, 5])
+    with interim(scanimage, scan_batch=scan_batch):
+        orchestrator.run(t())
+
+class FakeDevice:
+
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+def test_probe_error():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        device = FakeDevice()
+        def check_scanimage_version(options):
+            raise session.Error('scanimage is too old')
+        options = session.get_options(target_directory_prefix=os.path.join(tmpdir, 'scan'))
+        with interim(session, check_scanimage_version=check_scanimage_version, get_device=lambda options: device):
+            with assert_raises(session.Error):
+                orchestrator.run(session.probe(options))
+        assert_equal(device.closed, True)
+        assert_equal(os.listdir(tmpdir), [])
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_close_session():
+    finished = []
+    def finish_session(options):
+        time.sleep(0.1)
+        finished.append(options)
+    async def close():
+        task = asyncio.ensure_future(session.close_session(options))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        # The cancellation is refused, so this doesn't raise CancelledError:
+        await task
+    options = object()
+    with interim(session, finish_session=finish_session):
+        orchestrator.run(close())
+    assert_equal(finished, [options])
+
+async def no_wait(options, device):
+    del options, device
+
+def test_scan():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    cwd = os.getcwd()
+    try:
+        options = session.get_options(device='test:0', target_directory=tmpdir, page_count=2, xmp=True)
+        with scan_config():
+            pages = list(session.scan(options, wait=no_wait))
+        assert_equal(os.getcwd(), cwd)
+        assert_equal([page.number for page in pages], [1, 2])
+        for page in pages:
+            assert_equal(page.path, os.path.join(tmpdir, page.filename))
+            assert_equal(page.xmp_path, page.path + '.xmp')
+            assert os.path.exists(page.xmp_path)
+            (width, height) = page.size
+            assert width > 0 and height > 0
+            assert page.scan_time >= 0
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_scan_error():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        with open(os.path.join(tmpdir, 'p0001.png'), 'wb'):
+            pass
+        options = session.get_options(device='test:0', target_directory=tmpdir, page_count=1)
+        with scan_config():
+            with assert_raises(session.Error):
+                list(session.scan(options, wait=no_wait))
+    finally:
+        shutil.rmtree(tmpdir)
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,98 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+from lib import staging
+
+from .tools import (
+    assert_equal,
+    interim,
+)
+
+def test_mover():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    cwd = os.getcwd()
+    try:
+        staging_dir = os.path.join(tmpdir, 'staging')
+        target_dir = os.path.join(tmpdir, 'target')
+        os.mkdir(staging_dir)
+        os.mkdir(target_dir)
+        os.chdir(staging_dir)
+        moved = {}
+        def callback(filename, digest):
+            moved[filename] = digest
+        mover = staging.Mover(target_dir, max_backlog=1)
+        for name in 'p0001.png', 'p0001.png.xmp', 'p0002.png':
+            with open(name, 'wb') as file:
+                file.write(name.encode('ASCII'))
+            mover.submit(name, callback)
+        mover.drain()
+        assert_equal(os.listdir(staging_dir), [])
+        assert_equal(sorted(os.listdir(target_dir)), ['p0001.png', 'p0001.png.xmp', 'p0002.png'])
+        for name, digest in moved.items():
+            assert_equal(digest, hashlib.sha256(name.encode('ASCII')).hexdigest())
+        assert_equal(mover.failed, [])
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmpdir)
+
+def test_mover_failure():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    cwd = os.getcwd()
+    try:
+        os.chdir(tmpdir)
+        with open('p0001.png', 'wb'):
+            pass
+        target_dir = os.path.join(tmpdir, 'target')
+        with open(target_dir, 'wb'):
+            pass
+        mover = staging.Mover(target_dir)
+        with interim(mover, retries=1, retry_delay=0):
+            mover.submit('p0001.png')
+            mover.drain()
+        assert_equal(mover.failed, ['p0001.png'])
+        assert_equal(os.path.exists('p0001.png'), True)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmpdir)
+
+def test_mover_callback_failure():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    cwd = os.getcwd()
+    try:
+        os.chdir(tmpdir)
+        target_dir = os.path.join(tmpdir, 'target')
+        os.mkdir(target_dir)
+        def callback(filename, digest):
+            del digest
+            if filename == 'p0001.png':
+                raise OSError('eggs')
+        mover = staging.Mover(target_dir, max_backlog=1)
+        for name in 'p0001.png', 'p0002.png', 'p0003.png':
+            with open(name, 'wb'):
+                pass
+            mover.submit(name, callback)
+        mover.drain()
+        assert_equal(mover.failed, ['p0001.png'])
+        assert_equal(sorted(os.listdir(target_dir)), ['p0001.png', 'p0002.png', 'p0003.png'])
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmpdir)
+
+# vim:ts=4 sts=4 sw=4 et
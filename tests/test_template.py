@@ -0,0 +1,69 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+from lib import template
+
+from .tools import (
+    assert_equal,
+    assert_raises,
+)
+
+def test_format():
+    def t(tmpl, n, expected):
+        assert_equal(template.Template(tmpl).format(n), expected)
+    # expected results are from glibc's printf():
+    t('p%04d.png', 42, 'p0042.png')
+    t('p%d.png', 12345, 'p12345.png')
+    t('100%%-%-3d.tif', 7, '100%-7  .tif')
+    t('p%+d.pnm', 7, 'p+7.pnm')
+    t('p% d.pnm', 7, 'p 7.pnm')
+    t('p%+ d.pnm', 7, 'p+7.pnm')
+    t('p%05i.pnm', -7, 'p-0007.pnm')
+    t('p%.3d.pnm', 7, 'p007.pnm')
+    t('p%06.3d.pnm', 7, 'p   007.pnm')
+    t('p%-6.3d.pnm', -7, 'p-007  .pnm')
+    t('p%.0d.pnm', 0, 'p.pnm')
+    t('p%3.d.pnm', 0, 'p   .pnm')
+    t('p%+u.pnm', 7, 'p7.pnm')
+    t('p%u.pnm', -1, 'p4294967295.pnm')
+    t('p%#04d.pnm', 7, 'p0007.pnm')
+    t('sp\N{LATIN SMALL LETTER A WITH ACUTE}m%03d', 7, 'sp\N{LATIN SMALL LETTER A WITH ACUTE}m007')
+
+def test_format_batch():
+    tmpl = template.parse('p%04d.png')
+    assert_equal(tmpl.format_batch(1, 3, 2), ['p0001.png', 'p0003.png', 'p0005.png'])
+    tmpl = template.parse('p%.2u.png')
+    assert_equal(tmpl.format_batch(9, 2), ['p09.png', 'p10.png'])
+
+def test_invalid():
+    for tmpl in ['p.png', 'p%d%d.png', 'p%s.png', 'p%ld.png', 'p%*d.png', 'p%d%', 'p%5%d', 'p%{eggs}%d']:
+        with assert_raises(ValueError):
+            template.Template(tmpl)
+
+def test_fields():
+    tmpl = template.parse('%{date}/%{device}/p%04d.png')
+    assert_equal(tmpl.fields, ['date', 'device'])
+    with assert_raises(ValueError):
+        tmpl.format(1)
+    tmpl = tmpl.expand(date='2026-01-01', device='100%', session='')
+    assert_equal(tmpl.fields, [])
+    assert_equal(str(tmpl), '2026-01-01/100%%/p%04d.png')
+    assert_equal(tmpl.format(1), '2026-01-01/100%/p0001.png')
+
+def test_str():
+    for tmpl in ['p%04d.png', '100%%-%-3d.tif', '%{session}-%.3u']:
+        assert_equal(str(template.Template(tmpl)), tmpl)
+
+# vim:ts=4 sts=4 sw=4 et
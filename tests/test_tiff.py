@@ -0,0 +1,94 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import os
+import shutil
+import tempfile
+
+import PIL.Image
+import PIL.ImageChops
+
+from lib import tiff
+
+from .tools import (
+    assert_equal,
+)
+
+def test_writer():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        image = PIL.Image.linear_gradient('L').resize((100, 60))
+        images = [image, image.convert('RGB'), image.convert('1'), image.transpose(PIL.Image.Transpose.ROTATE_180)]
+        paths = []
+        for i, (img, ext) in enumerate(zip(images, ['tif', 'png', 'png', 'tif'])):
+            path = os.path.join(tmpdir, f'p{i}.{ext}')
+            img.save(path, dpi=(300, 300))
+            paths += [path]
+        path = os.path.join(tmpdir, 'document.tif')
+        writer = tiff.Writer(path)
+        for page in paths[:2]:
+            writer.add(page)
+        writer.close()
+        writer = tiff.Writer(path)
+        assert_equal(writer.n_pages, 2)
+        for page in paths[2:]:
+            writer.add(page)
+        writer.close()
+        with PIL.Image.open(path) as document:
+            assert_equal(document.n_frames, len(images))
+            for i, img in enumerate(images):
+                document.seek(i)
+                assert_equal(document.mode, img.mode)
+                assert_equal(document.info['dpi'], (300, 300))
+                assert_equal(PIL.ImageChops.difference(document, img).getbbox(), None)
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_ifd():
+    with tempfile.TemporaryFile() as file:
+        file.write(b'MM\0*\0\0\0\0')
+        ifd = tiff.IFD('>')
+        ifd.set(tiff.Tag.IMAGE_WIDTH, tiff.Type.SHORT, [42])
+        ifd.set(tiff.Tag.X_RESOLUTION, tiff.Type.RATIONAL, [(300, 1)])
+        ifd.set(tiff.Tag.XMP, tiff.Type.BYTE, b'<x:xmpmeta/>')
+        offset = tiff.write_ifd(file, ifd)
+        file.seek(4)
+        file.write(offset.to_bytes(4, 'big'))
+        [ifd] = tiff.read_ifds(file)
+        assert_equal(ifd[tiff.Tag.IMAGE_WIDTH], (42,))
+        assert_equal(ifd[tiff.Tag.X_RESOLUTION], ((300, 1),))
+        assert_equal(ifd[tiff.Tag.XMP], b'<x:xmpmeta/>')
+
+def test_embed_xmp():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        image = PIL.Image.linear_gradient('L').resize((100, 60))
+        path = os.path.join(tmpdir, 'p.tif')
+        image.save(path, save_all=True, append_images=[image.convert('RGB')])
+        for xmp_data in [b'<x:xmpmeta/>', b'<x:xmpmeta>eggs</x:xmpmeta>']:
+            with open(path, 'r+b') as file:
+                tiff.embed_xmp(file, xmp_data)
+            with open(path, 'rb') as file:
+                ifds = list(tiff.read_ifds(file))
+            assert_equal(len(ifds), 2)
+            assert_equal(ifds[0][tiff.Tag.XMP], xmp_data)
+        with PIL.Image.open(path) as img:
+            assert_equal(PIL.ImageChops.difference(img, image).getbbox(), None)
+            img.seek(1)
+            assert_equal(img.mode, 'RGB')
+    finally:
+        shutil.rmtree(tmpdir)
+
+# vim:ts=4 sts=4 sw=4 et
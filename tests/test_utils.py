@@ -13,8 +13,11 @@
 # FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
 # more details.
 
+import struct
 import sys
 
+import PIL.Image
+
 from lib import utils
 
 from .tools import (
@@ -65,4 +68,14 @@ class test_enhance_import:
                 'please install the PyNonexistent package <http://pynonexistent.example.net/>'
             )
 
+def test_to_8bit():
+    values = [0, 20000, 40000, 65535]
+    for mode, fmt in [('I;16', '<4H'), ('I;16B', '>4H'), ('I', '=4i')]:
+        image = PIL.Image.frombytes(mode, (4, 1), struct.pack(fmt, *values))
+        image = utils.to_8bit(image)
+        assert_equal(image.mode, 'L')
+        assert_equal(list(image.tobytes()), [v >> 8 for v in values])
+    image = PIL.Image.new('RGB', (1, 1))
+    assert_equal(utils.to_8bit(image), image)
+
 # vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,57 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import io
+import os
+import shutil
+import tempfile
+
+from lib import walk
+
+from .tools import (
+    assert_equal,
+)
+
+def test_read_paths():
+    def t(data, expected):
+        for block_size in 1, 3, 1 << 16:
+            paths = list(walk.read_paths(io.BytesIO(data), block_size=block_size))
+            assert_equal(paths, expected)
+    t(b'', [])
+    t(b'a.png\0b/c.png\0', ['a.png', 'b/c.png'])
+    t(b'a.png\0\0b c.png', ['a.png', 'b c.png'])
+    t(b'\xff.png\0', [os.fsdecode(b'\xff.png')])
+
+def test_iter_images():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        for path in ['a/p1.png', 'a/p1.png.xmp', 'a/b/p2.tif', 'a/.p3.png', 'a/notes.txt', 'skip/p4.png', 'p5.jpg']:
+            path = os.path.join(tmpdir, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb'):
+                pass
+        def t(paths, expected, **kwargs):
+            paths = [os.path.join(tmpdir, p) for p in paths]
+            found = walk.iter_images(paths, walk.Filter(**kwargs))
+            assert_equal([os.path.relpath(p, tmpdir) for p in found], expected)
+        t(['.'], ['a/b/p2.tif', 'a/p1.png', 'p5.jpg', 'skip/p4.png'])
+        t(['.'], ['a/b/p2.tif', 'a/p1.png'], exclude=['skip', '*.jpg'])
+        t(['.'], ['a/notes.txt'], include=['*.txt'])
+        # Explicitly given files are not filtered:
+        t(['a/notes.txt', 'a'], ['a/notes.txt', 'a/b/p2.tif', 'a/p1.png'], exclude=['*.txt'])
+    finally:
+        shutil.rmtree(tmpdir)
+
+# vim:ts=4 sts=4 sw=4 et
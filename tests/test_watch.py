@@ -0,0 +1,100 @@
+# encoding=UTF-8
+
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# This file is part of scanhelper.
+#
+# scanhelper is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 as published
+# by the Free Software Foundation.
+#
+# scanhelper is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
+# more details.
+
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+from lib import watch
+
+from .tools import (
+    assert_equal,
+    assert_true,
+)
+
+def test_watcher():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    handled = queue.Queue()
+    watcher = watch.Watcher(tmpdir, handled.put, jobs=2)
+    thread = threading.Thread(target=watcher.run)
+    thread.start()
+    try:
+        # Wait until the directory is watched:
+        probe = os.path.join(tmpdir, 'probe.png')
+        while True:
+            with open(probe, 'wb'):
+                pass
+            try:
+                handled.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            break
+        os.unlink(probe)
+        path = os.path.join(tmpdir, 'p0001.png')
+        with open(path, 'wb') as file:
+            file.write(b'eggs')
+        with open(path + '.xmp', 'wb'):
+            pass
+        with open(os.path.join(tmpdir, '.p0002.png'), 'wb'):
+            pass
+        os.rename(os.path.join(tmpdir, '.p0002.png'), os.path.join(tmpdir, 'p0002.png'))
+        paths = {handled.get(timeout=10), handled.get(timeout=10)}
+        assert_equal(paths, {path, os.path.join(tmpdir, 'p0002.png')})
+    finally:
+        watcher.stop()
+        thread.join()
+        shutil.rmtree(tmpdir)
+    assert_true(handled.empty())
+
+def test_coalescing():
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    started = threading.Event()
+    release = threading.Event()
+    handled = queue.Queue()
+    def handle(path):
+        started.set()
+        release.wait()
+        handled.put(path)
+    watcher = watch.Watcher(tmpdir, handle)
+    thread = threading.Thread(target=watcher.run)
+    thread.start()
+    try:
+        path = os.path.join(tmpdir, 'p0001.png')
+        while not started.wait(0.1):
+            with open(path, 'wb'):
+                pass
+        # The handler is running; more events cause a single extra call:
+        for _ in range(5):
+            with open(path, 'wb'):
+                pass
+        with open(os.path.join(tmpdir, 'sentinel.png'), 'wb'):
+            pass
+        # Events are processed in order, so once the sentinel is queued, all the events were seen:
+        while 'sentinel.png' not in str(watcher._states):  # pylint: disable=protected-access
+            time.sleep(0.01)
+        release.set()
+        paths = sorted(handled.get(timeout=10) for _ in range(3))
+        assert_equal(paths, [path, path, os.path.join(tmpdir, 'sentinel.png')])
+    finally:
+        release.set()
+        watcher.stop()
+        thread.join()
+        shutil.rmtree(tmpdir)
+    assert_true(handled.empty())
+
+# vim:ts=4 sts=4 sw=4 et
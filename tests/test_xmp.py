@@ -13,13 +13,22 @@
 # FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for
 # more details.
 
+import os
+import shutil
+import struct
+import tempfile
 import time
 
+import PIL.Image
+import PIL.ImageChops
+import PIL.PngImagePlugin
+
 from lib import xmp
 
 from .tools import (
     assert_equal,
     assert_not_equal,
+    assert_raises,
     assert_regex,
     assert_rfc3339_timestamp,
     fork_isolation,
@@ -71,7 +80,98 @@ def test_gen_uuid():
     assert_uuid_urn(uuid2)
     assert_not_equal(uuid1, uuid2)
 
+def test_read_tags():
+    @fork_isolation
+    def t(path, expected):
+        with interim_environ(TZ='UTC'):
+            time.tzset()
+            tags = {key: str(value) for key, value in xmp.read_tags(path).items()}
+        assert_equal(tags, expected)
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        image = PIL.Image.new('L', (10, 10))
+        path = os.path.join(tmpdir, 'p.png')
+        info = PIL.PngImagePlugin.PngInfo()
+        info.add_text('Make', 'Acme')
+        info.add_itxt('Model', 'Scanner \N{SNOWMAN}', zip=True)
+        info.add(b'tIME', struct.pack('>HBBBBB', 2026, 1, 2, 3, 4, 5))
+        image.save(path, pnginfo=info)
+        t(path, dict(
+            device_vendor='Acme',
+            device_model='Scanner \N{SNOWMAN}',
+            image_timestamp='2026-01-02T03:04:05+00:00',
+        ))
+        info = PIL.PngImagePlugin.PngInfo()
+        info.add_text('Source', 'Scanner')
+        info.add_text('Creation Time', 'Fri, 02 Jan 2026 04:04:05 +0100', zip=True)
+        image.save(path, pnginfo=info)
+        t(path, dict(device_model='Scanner', image_timestamp='2026-01-02T03:04:05+00:00'))
+        info = PIL.PngImagePlugin.PngInfo()
+        info.add(b'tIME', b'\x07\xea\x01')
+        image.save(path, pnginfo=info)
+        t(path, {})
+        path = os.path.join(tmpdir, 'p.tif')
+        image.save(path, tiffinfo={271: 'Acme', 272: 'Scanner', 306: '2026:01:02 03:04:05'})
+        t(path, dict(
+            device_vendor='Acme',
+            device_model='Scanner',
+            image_timestamp='2026-01-02T03:04:05+00:00',
+        ))
+        image.save(path, tiffinfo={306: 'yesterday'})
+        t(path, {})
+        path = os.path.join(tmpdir, 'p.jpg')
+        image.save(path)
+        t(path, {})
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_get_parameters():
+    class device:
+        @property
+        def vendor(self):
+            raise AssertionError
+        model = vendor
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        path = os.path.join(tmpdir, 'p.png')
+        PIL.Image.new('L', (10, 10)).save(path)
+        # The device is not looked at if vendor and model are known:
+        parameters = xmp.get_parameters(path, device(), dict(device_vendor='Acme', device_model='Scanner'))
+        assert_equal(parameters['device_vendor'], 'Acme')
+        assert_equal(parameters['device_model'], 'Scanner')
+    finally:
+        shutil.rmtree(tmpdir)
+
 # TODO: add test for write()
 # TODO: add test for print_doc()
 
+def test_embed():
+    class device:
+        vendor = 'Acme'
+        model = 'Scanner'
+    tmpdir = tempfile.mkdtemp(prefix='scanhelper.')
+    try:
+        image = PIL.Image.linear_gradient('L').resize((100, 60))
+        for ext in 'png', 'tif':
+            path = os.path.join(tmpdir, f'p.{ext}')
+            image.save(path)
+            stat = os.stat(path)
+            (xmp_data, parameters) = xmp.render(path, device, {})
+            assert_equal(parameters['width'], 100)
+            xmp.embed(path, xmp_data)
+            xmp.embed(path, xmp_data)
+            assert_equal(os.stat(path).st_mtime_ns, stat.st_mtime_ns)
+            with PIL.Image.open(path) as img:
+                assert_equal(PIL.ImageChops.difference(img, image).getbbox(), None)
+                if ext == 'png':
+                    assert_equal(img.info['XML:com.adobe.xmp'], xmp_data.decode('UTF-8'))
+                else:
+                    assert_equal(img.tag_v2[700], xmp_data)
+        path = os.path.join(tmpdir, 'p.jpg')
+        image.save(path)
+        with assert_raises(ValueError):
+            xmp.embed(path, xmp_data)
+    finally:
+        shutil.rmtree(tmpdir)
+
 # vim:ts=4 sts=4 sw=4 et
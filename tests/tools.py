@@ -23,8 +23,10 @@ import traceback
 from nose import SkipTest
 from nose.tools import (  # pylint: disable=no-name-in-module
     assert_equal,
+    assert_false,
     assert_greater,
     assert_greater_equal,
+    assert_in,
     assert_is_instance,
     assert_not_equal,
     assert_raises,
@@ -149,8 +151,10 @@ __all__ = [
     # nose:
     'SkipTest',
     'assert_equal',
+    'assert_false',
     'assert_greater',
     'assert_greater_equal',
+    'assert_in',
     'assert_is_instance',
     'assert_not_equal',
     'assert_raises',